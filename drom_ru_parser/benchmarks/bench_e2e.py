@@ -0,0 +1,291 @@
+"""
+СКВОЗНОЙ ПРОГОН ПАРСЕРОВ ПРОТИВ ЛОКАЛЬНОЙ ЗАГЛУШКИ DROM
+- Поднимает mock_drom_server.py отдельным процессом и по очереди запускает
+  database_parser.py, full_parser_with_retry.py и parse_skipped_models.py
+  без расхода бюджета запросов к настоящему сайту
+- Каждый скрипт работает в своей временной папке с копией src/: файлы
+  прогресса, реестры и результаты настоящих запусков не затрагиваются
+- Входные файлы генерируются под заглушку (--models, --listings)
+- Отчет: строк/сек, p50/p99 времени ответа заглушки, загрузка CPU
+  скрипта (с процессами разбора), статусы ответов
+
+Запуск: python benchmarks/bench_e2e.py --latency-ms 150 --rate-429 0.02 --rate-5xx 0.01
+        python benchmarks/bench_e2e.py --targets full_parser_with_retry --full-args "--parser selectolax"
+"""
+
+import argparse
+import glob
+import json
+import os
+import resource
+import shlex
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from typing import Any, Dict, List
+
+import pandas as pd
+
+from mock_drom_server import add_server_arguments
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+SRC_DIR = os.path.join(BENCH_DIR, '..', 'src')
+
+TARGETS = ('database_parser', 'full_parser_with_retry', 'parse_skipped_models')
+BRANDS = ('toyota', 'nissan', 'honda', 'mazda')
+CITIES = ('vladivostok', 'novosibirsk', 'irkutsk', 'habarovsk', 'krasnoyarsk')
+
+DEFAULT_MODELS = 8
+DEFAULT_LISTINGS = 300
+DEFAULT_TIMEOUT = 1800  # Потолок на один скрипт, сек
+SERVER_START_TIMEOUT = 30
+
+
+# ==================== Входные файлы ====================
+
+def models_frame(count: int) -> pd.DataFrame:
+    return pd.DataFrame([
+        {'brand': BRANDS[i % len(BRANDS)], 'model': f'model{i}', 'start_year': 2008 + i % 5, 'finish_year': 2015 + i % 5}
+        for i in range(count)
+    ])
+
+
+def listings_frame(count: int, base_url: str) -> pd.DataFrame:
+    rows = []
+    for i in range(count):
+        brand = BRANDS[i % len(BRANDS)]
+        model = f'model{i % 7}'
+        rows.append({
+            'brand': brand,
+            'model': model,
+            'status': 'Найдено',
+            'url': f'{base_url}/{CITIES[i % len(CITIES)]}/{brand}/{model}/{500_000_000 + i}.html',
+        })
+    return pd.DataFrame(rows)
+
+
+def prepare_database_parser(workdir: str, args: argparse.Namespace, base_url: str):
+    models_frame(args.models).to_excel(os.path.join(workdir, 'недостающие модели и поколения_updated2.xlsx'), index=False)
+
+
+def prepare_full_parser(workdir: str, args: argparse.Namespace, base_url: str):
+    listings_frame(args.listings, base_url).to_excel(os.path.join(workdir, 'drom_scraped_data_mock.xlsx'), index=False)
+
+
+def prepare_skipped_models(workdir: str, args: argparse.Namespace, base_url: str):
+    models_frame(args.models).to_excel(os.path.join(workdir, 'skipped_models.xlsx'), index=False)
+
+
+# ==================== Подсчет результата ====================
+
+def count_rows(pattern: str, column: str, value: Any = None) -> int:
+    """Строки результата во всех файлах по маске: непустой column (или равный value)"""
+    rows = 0
+    for path in glob.glob(pattern):
+        df = pd.read_excel(path)
+        if column not in df.columns:
+            continue
+        filled = df[column] == value if value is not None else df[column].notna() & (df[column].astype(str) != '')
+        rows += int(filled.sum())
+    return rows
+
+
+def count_parquet_rows(root: str) -> int:
+    """Строки результата в папке Parquet (full_parser_with_retry --parquet)"""
+    if not os.path.isdir(root):
+        return 0
+    import pyarrow.dataset as ds
+    return ds.dataset(root, format='parquet', partitioning='hive').count_rows()
+
+
+# Сценарий запуска каждого скрипта: входной файл, аргументы, какие строки считать результатом
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    'database_parser': {
+        'prepare': prepare_database_parser,
+        'argv': lambda args, base_url: ['--base-url', base_url, *shlex.split(args.database_args)],
+        'rows': lambda workdir: count_rows(os.path.join(workdir, 'drom_scraped_data_progress.xlsx'), 'status', 'Найдено'),
+    },
+    'full_parser_with_retry': {
+        'prepare': prepare_full_parser,
+        'argv': lambda args, base_url: ['--input', 'drom_scraped_data_mock.xlsx', *shlex.split(args.full_args)],
+        'rows': lambda workdir: (count_rows(os.path.join(workdir, 'drom_full_scraper_mock_*.xlsx'), 'bulletin_id')
+                                 + count_parquet_rows(os.path.join(workdir, 'drom_full_scraper_parquet'))),
+    },
+    'parse_skipped_models': {
+        'prepare': prepare_skipped_models,
+        'argv': lambda args, base_url: ['--base-url', base_url, *shlex.split(args.skipped_args)],
+        'rows': lambda workdir: count_rows(os.path.join(workdir, 'drom_full_scraper_5.xlsx'), 'bulletin_id'),
+    },
+}
+
+
+# ==================== Заглушка ====================
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def server_command(args: argparse.Namespace, port: int) -> List[str]:
+    """Командная строка заглушки из флагов add_server_arguments"""
+    command = [sys.executable, os.path.join(BENCH_DIR, 'mock_drom_server.py'), '--port', str(port)]
+    defaults = vars(server_defaults())
+    for name, default in defaults.items():
+        value = getattr(args, name)
+        if name != 'port' and value is not None and value != default:
+            command += [f"--{name.replace('_', '-')}", str(value)]
+    return command
+
+
+def server_defaults() -> argparse.Namespace:
+    parser = argparse.ArgumentParser()
+    add_server_arguments(parser)
+    return parser.parse_args([])
+
+
+def wait_for_server(base_url: str, process: subprocess.Popen):
+    deadline = time.time() + SERVER_START_TIMEOUT
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"заглушка завершилась с кодом {process.returncode}")
+        try:
+            urllib.request.urlopen(f'{base_url}/__stats', timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"заглушка не ответила за {SERVER_START_TIMEOUT}с")
+
+
+def fetch_stats(base_url: str, reset: bool = False) -> Dict[str, Any]:
+    with urllib.request.urlopen(f"{base_url}/__stats{'?reset=1' if reset else ''}", timeout=5) as response:
+        return json.load(response)
+
+
+# ==================== Прогон ====================
+
+def children_cpu() -> float:
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+def run_target(name: str, args: argparse.Namespace, base_url: str, root: str) -> Dict[str, Any]:
+    """Запускает скрипт в отдельной копии src/ и возвращает метрики прогона"""
+    scenario = SCENARIOS[name]
+    workdir = os.path.join(root, name)
+    shutil.copytree(SRC_DIR, workdir, ignore=shutil.ignore_patterns('__pycache__', '*.xlsx', '*.json', '*.jsonl',
+                                                                      '*.sqlite', '*.log', 'raw_html',
+                                                                      'drom_full_scraper_parquet', '.excel_cache'))
+    scenario['prepare'](workdir, args, base_url)
+
+    command = [sys.executable, os.path.join(workdir, f'{name}.py'), *scenario['argv'](args, base_url)]
+    log_path = os.path.join(workdir, f'{name}.log')
+    print(f"\n▶️  {name}: {' '.join(command[2:])}")
+
+    fetch_stats(base_url, reset=True)
+    cpu_before = children_cpu()
+    started = time.perf_counter()
+    with open(log_path, 'w', encoding='utf-8') as log_file:
+        process = subprocess.Popen(command, cwd=workdir, stdout=log_file, stderr=subprocess.STDOUT)
+        try:
+            exit_code = process.wait(timeout=args.timeout)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            exit_code = process.wait()
+            print(f"   ⏱️  Прервано по --timeout {args.timeout}с")
+    wall = time.perf_counter() - started
+    cpu = children_cpu() - cpu_before
+    stats = fetch_stats(base_url)
+
+    rows = scenario['rows'](workdir)
+    result = {
+        'exit_code': exit_code,
+        'wall_sec': round(wall, 2),
+        'rows': rows,
+        'rows_per_sec': round(rows / wall, 2),
+        'cpu_sec': round(cpu, 2),
+        'cpu_util': round(cpu / wall, 3),
+        'server': stats,
+        'log': log_path,
+    }
+    if exit_code == 0:
+        print(f"   ✅ {rows:,} строк за {wall:.1f}с")
+    else:
+        print(f"   ❌ Код выхода {exit_code}, лог: {log_path}")
+    return result
+
+
+def print_report(results: Dict[str, Dict[str, Any]]):
+    print(f"\n{'Скрипт':<24} {'строк':>7} {'строк/с':>9} {'запр/с':>8} {'p50 мс':>8} {'p99 мс':>8} "
+          f"{'CPU с':>7} {'CPU %':>6}  статусы")
+    print('-' * 100)
+    for name, result in results.items():
+        server = result['server']
+        statuses = ' '.join(f"{status}:{count}" for status, count in server['statuses'].items())
+        print(f"{name:<24} {result['rows']:>7,} {result['rows_per_sec']:>9.2f} {server['requests_per_sec']:>8.2f} "
+              f"{server['latency_ms']['p50']:>8.1f} {server['latency_ms']['p99']:>8.1f} "
+              f"{result['cpu_sec']:>7.1f} {result['cpu_util']:>6.0%}  {statuses}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Сквозной прогон парсеров против локальной заглушки drom')
+    parser.add_argument('--targets', default=','.join(TARGETS),
+                        help=f"скрипты через запятую (по умолчанию все: {','.join(TARGETS)})")
+    parser.add_argument('--models', type=int, default=DEFAULT_MODELS,
+                        help=f'моделей во входе database_parser и parse_skipped_models (по умолчанию {DEFAULT_MODELS})')
+    parser.add_argument('--listings', type=int, default=DEFAULT_LISTINGS,
+                        help=f'объявлений во входе full_parser_with_retry (по умолчанию {DEFAULT_LISTINGS})')
+    parser.add_argument('--database-args', default='--async', help='аргументы database_parser.py')
+    parser.add_argument('--full-args', default='', help='аргументы full_parser_with_retry.py')
+    parser.add_argument('--skipped-args', default='', help='аргументы parse_skipped_models.py')
+    parser.add_argument('--timeout', type=int, default=DEFAULT_TIMEOUT, help='потолок времени одного скрипта, сек')
+    parser.add_argument('--workdir', default=None, help='папка прогонов (по умолчанию временная, удаляется)')
+    parser.add_argument('--json', default=None, help='записать результаты в JSON-файл')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    targets = [name.strip() for name in args.targets.split(',') if name.strip()]
+    unknown = [name for name in targets if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"неизвестные скрипты: {', '.join(unknown)}")
+
+    if args.port == server_defaults().port:
+        args.port = free_port()
+    base_url = f'http://{args.host}:{args.port}'
+
+    root = args.workdir or tempfile.mkdtemp(prefix='drom_e2e_')
+    os.makedirs(root, exist_ok=True)
+
+    server_log = open(os.path.join(root, 'mock_drom_server.log'), 'w', encoding='utf-8')
+    server = subprocess.Popen(server_command(args, args.port), stdout=server_log, stderr=subprocess.STDOUT)
+    results: Dict[str, Dict[str, Any]] = {}
+    try:
+        wait_for_server(base_url, server)
+        print(f"🧪 Заглушка: {base_url} | папка прогонов: {root}")
+        for name in targets:
+            results[name] = run_target(name, args, base_url, root)
+    finally:
+        server.terminate()
+        server.wait()
+        server_log.close()
+
+    print_report(results)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'server_args': server_command(args, args.port)[2:], 'results': results},
+                      f, ensure_ascii=False, indent=2)
+        print(f"\n💾 Результаты: {args.json}")
+
+    if args.workdir is None and all(result['exit_code'] == 0 for result in results.values()):
+        shutil.rmtree(root, ignore_errors=True)
+
+    return max((result['exit_code'] for result in results.values()), default=0)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,270 @@
+"""
+МИКРОБЕНЧМАРК ПАРСЕРОВ НА ЗАМОРОЖЕННОМ КОРПУСЕ СТРАНИЦ
+- Работает без сети: страницы из fixtures/ (см. make_fixtures.py)
+- Перед замерами сверяет результат всех движков и режимов с эталоном
+  bs4 по всей странице - быстрый, но неверный парсер не пройдет
+- Для каждого замера: страниц/сек, мс/страница, пик памяти (tracemalloc)
+- Результаты сравниваются с baselines.json; --save-baseline обновляет его,
+  --check завершает с ошибкой при замедлении больше --max-regression
+
+Запуск: python benchmarks/bench_parsers.py [--rounds 5] [--filter lxml] [--check]
+"""
+
+import argparse
+import gc
+import gzip
+import io
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import brotli
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+
+from bs4 import BeautifulSoup  # noqa: E402
+
+import database_parser  # noqa: E402
+import detail_parser  # noqa: E402
+import parse_skipped_models  # noqa: E402
+
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures')
+BASELINE_FILE = os.path.join(BENCH_DIR, 'baselines.json')
+
+DEFAULT_ROUNDS = 5
+DEFAULT_MAX_REGRESSION = 0.25  # Допустимое замедление относительно базы (25%)
+
+
+def load_corpus() -> Tuple[List[str], List[str]]:
+    """Детальные страницы и страницы выдачи из fixtures/"""
+    with open(os.path.join(FIXTURES_DIR, 'manifest.json'), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    details, searches = [], []
+    for entry in manifest:
+        with gzip.open(os.path.join(FIXTURES_DIR, entry['file']), 'rb') as f:
+            page = f.read().decode('utf-8')
+        (details if entry['kind'] == 'detail' else searches).append(page)
+    return details, searches
+
+
+class FakeResponse:
+    """То, что decode_response читает у ответа requests: заголовки и сырой поток"""
+
+    def __init__(self, body: bytes, encoding: str):
+        self.headers = {'Content-Encoding': encoding, 'Content-Type': 'text/html; charset=windows-1251'}
+        self._body = body
+        self.raw = io.BytesIO(body)
+
+    def rewind(self):
+        self.raw = io.BytesIO(self._body)
+
+
+def encoded_responses(pages: List[str]) -> Dict[str, List[FakeResponse]]:
+    """Страницы так, как их отдает drom: windows-1251, сжатые br/gzip или без сжатия"""
+    bodies = [page.encode('windows-1251') for page in pages]
+    return {
+        'br': [FakeResponse(brotli.compress(body), 'br') for body in bodies],
+        'gzip': [FakeResponse(gzip.compress(body), 'gzip') for body in bodies],
+        'identity': [FakeResponse(body, '') for body in bodies],
+    }
+
+
+# ==================== Замеры ====================
+
+class Benchmark:
+    """
+    Один замер: run(item) для каждого элемента inputs.
+    prepare() - неизмеряемая подготовка каждого прохода (например, свежий soup)
+    """
+
+    def __init__(self, name: str, inputs: List[Any], run: Callable[[Any], Any],
+                 prepare: Optional[Callable[[List[Any]], List[Any]]] = None):
+        self.name = name
+        self.inputs = inputs
+        self.run = run
+        self.prepare = prepare
+
+    def _items(self) -> List[Any]:
+        return self.prepare(self.inputs) if self.prepare else self.inputs
+
+    def measure(self, rounds: int) -> Dict[str, float]:
+        # Лучший проход из rounds: меньше всего шума от остальной системы
+        best = float('inf')
+        for _ in range(rounds):
+            items = self._items()
+            gc.collect()
+            start = time.perf_counter()
+            for item in items:
+                self.run(item)
+            best = min(best, time.perf_counter() - start)
+
+        # Пик памяти на одну страницу (максимум по корпусу)
+        peak = 0
+        for item in self._items():
+            gc.collect()
+            tracemalloc.start()
+            self.run(item)
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+        pages = len(self.inputs)
+        return {
+            'pages_per_sec': round(pages / best, 1),
+            'ms_per_page': round(best / pages * 1000, 3),
+            'peak_kib': round(peak / 1024, 1),
+        }
+
+
+def fresh_soups(pages: List[str]) -> List[BeautifulSoup]:
+    # Функции bs4 меняют дерево (decompose, replace_with) - каждому проходу свой soup
+    return [BeautifulSoup(page, 'html.parser') for page in pages]
+
+
+def rewound(responses: List[FakeResponse]) -> List[FakeResponse]:
+    for response in responses:
+        response.rewind()
+    return responses
+
+
+def build_benchmarks(details: List[str], searches: List[str]) -> List[Benchmark]:
+    benchmarks = [
+        Benchmark('bs4.soup_html.parser', details, lambda page: BeautifulSoup(page, 'html.parser')),
+        Benchmark('bs4.parse_specifications_table', details, detail_parser.parse_specifications_table, fresh_soups),
+        Benchmark('bs4.parse_vin_report', details, detail_parser.parse_vin_report, fresh_soups),
+        Benchmark('bs4.parse_description', details, detail_parser.parse_description, fresh_soups),
+        Benchmark('bs4.parse_bulletin_info', details, detail_parser.parse_bulletin_info, fresh_soups),
+        Benchmark('slice_detail_regions', details, detail_parser.slice_detail_regions),
+        Benchmark('state.parse_sections_state', details, detail_parser.parse_sections_state),
+    ]
+
+    for backend in detail_parser.PARSER_BACKENDS:
+        if backend == 'selectolax' and detail_parser.LexborHTMLParser is None:
+            print("⚠️  selectolax не установлен - замеры selectolax пропущены")
+            continue
+        for extract in detail_parser.EXTRACT_MODES:
+            benchmarks.append(Benchmark(
+                f'parse_detail_page[{backend},{extract}]', details,
+                lambda page, backend=backend, extract=extract: detail_parser.parse_detail_page(page, backend, extract)
+            ))
+
+    benchmarks += [
+        Benchmark('parse_json_ld_listings', searches, database_parser.parse_json_ld_listings),
+        Benchmark('parse_listing_cards (bs4)', searches, parse_skipped_models.parse_listing_cards),
+        Benchmark('parse_total_count', searches, database_parser.parse_total_count),
+    ]
+
+    for encoding, responses in encoded_responses(details).items():
+        benchmarks.append(Benchmark(f'decode_response[{encoding}]', responses, database_parser.decode_response, rewound))
+
+    return benchmarks
+
+
+def check_parity(details: List[str]) -> bool:
+    """Все движки и режимы дают тот же результат, что bs4 по всей странице"""
+    ok = True
+    for i, page in enumerate(details):
+        reference = detail_parser.parse_detail_page(page, 'bs4', 'full')
+        for backend in detail_parser.PARSER_BACKENDS:
+            if backend == 'selectolax' and detail_parser.LexborHTMLParser is None:
+                continue
+            for extract in detail_parser.EXTRACT_MODES:
+                result = detail_parser.parse_detail_page(page, backend, extract)
+                if result != reference:
+                    diff = [key for key in reference if result.get(key) != reference[key]]
+                    print(f"❌ Страница {i}: {backend}/{extract} расходится с bs4 в полях {diff}")
+                    ok = False
+    return ok
+
+
+# ==================== Базовые значения ====================
+
+def machine_info() -> Dict[str, Any]:
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+    }
+
+
+def load_baseline() -> Dict[str, Any]:
+    if not os.path.exists(BASELINE_FILE):
+        return {}
+    with open(BASELINE_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(results: Dict[str, Dict[str, float]]):
+    baseline = load_baseline()
+    baseline.setdefault('results', {}).update(results)
+    baseline['machine'] = machine_info()
+    baseline['updated_at'] = time.strftime('%Y-%m-%d %H:%M:%S')
+    with open(BASELINE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(baseline, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write('\n')
+    print(f"\n💾 База сохранена: {BASELINE_FILE}")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Микробенчмарк парсеров drom на корпусе fixtures/')
+    parser.add_argument('--rounds', type=int, default=DEFAULT_ROUNDS, help='проходов по корпусу, берется лучший')
+    parser.add_argument('--filter', default='', help='только замеры, в имени которых есть эта подстрока')
+    parser.add_argument('--save-baseline', action='store_true', help='записать результаты в baselines.json')
+    parser.add_argument('--check', action='store_true', help='код выхода 1 при замедлении относительно базы')
+    parser.add_argument('--max-regression', type=float, default=DEFAULT_MAX_REGRESSION,
+                        help=f'допустимое замедление для --check, доля (по умолчанию {DEFAULT_MAX_REGRESSION})')
+    args = parser.parse_args()
+
+    details, searches = load_corpus()
+    print(f"📦 Корпус: {len(details)} детальных страниц, {len(searches)} страниц выдачи")
+
+    if not check_parity(details):
+        print("❌ Движки расходятся с эталоном - замеры не имеют смысла")
+        return 1
+    print("✅ Все движки и режимы совпадают с эталоном bs4")
+
+    baseline = load_baseline().get('results', {})
+    if baseline and load_baseline().get('machine') != machine_info():
+        print("⚠️  База снята на другой машине - сравнение ориентировочное")
+
+    print(f"\n{'Замер':<44} {'стр/сек':>10} {'мс/стр':>9} {'пик КиБ':>9} {'к базе':>8}")
+    print('-' * 84)
+
+    results = {}
+    regressions = []
+    for benchmark in build_benchmarks(details, searches):
+        if args.filter and args.filter not in benchmark.name:
+            continue
+
+        result = benchmark.measure(args.rounds)
+        results[benchmark.name] = result
+
+        delta = ''
+        base = baseline.get(benchmark.name)
+        if base:
+            ratio = result['pages_per_sec'] / base['pages_per_sec']
+            delta = f"{ratio - 1:+.0%}"
+            if ratio < 1 - args.max_regression:
+                regressions.append(benchmark.name)
+
+        print(f"{benchmark.name:<44} {result['pages_per_sec']:>10,.1f} {result['ms_per_page']:>9.3f} "
+              f"{result['peak_kib']:>9,.1f} {delta:>8}")
+
+    if args.save_baseline:
+        save_baseline(results)
+
+    if regressions:
+        print(f"\n⚠️  Медленнее базы больше чем на {args.max_regression:.0%}: {', '.join(regressions)}")
+        if args.check:
+            return 1
+
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
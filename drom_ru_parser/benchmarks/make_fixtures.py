@@ -0,0 +1,237 @@
+"""
+ГЕНЕРАТОР КОРПУСА HTML-СТРАНИЦ ДЛЯ БЕНЧМАРКОВ
+- Страницы СКОНСТРУИРОВАНЫ, а не скачаны: данные объявлений берутся из
+  examples/sample_output.xlsx, разметка повторяет блоки drom, которые читают
+  парсеры (data-ftid, gibdd_report, css-* классы), плюс "шум" реальной
+  страницы: шапка, галерея, инлайн-скрипты и стили
+- Результат детерминирован (фиксированный seed) и лежит в fixtures/ в gzip;
+  перегенерировать нужно только при изменении разметки
+- Половина детальных страниц несет JSON-состояние (для --extract state)
+
+Запуск: python benchmarks/make_fixtures.py
+"""
+
+import gzip
+import html
+import json
+import os
+import random
+import sys
+
+import pandas as pd
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures')
+SAMPLE_FILE = os.path.join(BENCH_DIR, '..', 'examples', 'sample_output.xlsx')
+
+SEED = 20251129
+SEARCH_PAGES = 5
+CARDS_PER_SEARCH_PAGE = 20
+
+# Строки таблицы характеристик: (подпись, колонка)
+SPEC_ROWS = [
+    ('Двигатель', 'engine'),
+    ('Мощность', 'power'),
+    ('Коробка передач', 'transmission'),
+    ('Привод', 'drive'),
+    ('Тип кузова', 'body_type'),
+    ('Цвет', 'color'),
+    ('Пробег', 'mileage_detail'),
+    ('Владельцы', 'owners'),
+    ('Руль', 'wheel'),
+    ('Поколение', 'generation'),
+    ('Комплектация', 'complectation'),
+]
+
+
+def text(value) -> str:
+    """Значение ячейки как строка ('' для пустых, 1.0 -> 1)"""
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def esc(value) -> str:
+    """Текст для HTML; символы вне windows-1251 - числовыми ссылками, как отдает drom"""
+    return html.escape(text(value), quote=True).encode('windows-1251', 'xmlcharrefreplace').decode('windows-1251')
+
+
+def js(data) -> str:
+    """JSON для инлайн-скрипта; символы вне windows-1251 - через \\uXXXX"""
+    encoded = json.dumps(data, ensure_ascii=False).replace('</', '<\\/')
+    return ''.join(ch if ch.encode('windows-1251', 'ignore') else json.dumps(ch)[1:-1] for ch in encoded)
+
+
+def filler_script(rng: random.Random, size: int) -> str:
+    """Инлайн-скрипт, похожий на бандл аналитики/рекламы"""
+    parts = []
+    total = 0
+    while total < size:
+        name = ''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(8))
+        chunk = (f'function {name}(e,t){{var n=e.{name}||{{}};for(var r=0;r<t.length;r++)'
+                 f'{{n[t[r]]="<div class=\\"css-{rng.randrange(16**6):06x}\\">"+r+"</div>"}}return n}};')
+        parts.append(chunk)
+        total += len(chunk)
+    return ''.join(parts)
+
+
+def filler_css(rng: random.Random, rules: int) -> str:
+    return ''.join(f'.css-{rng.randrange(16**6):06x}{{margin:{rng.randrange(32)}px;color:#{rng.randrange(16**6):06x}}}'
+                   for _ in range(rules))
+
+
+def header(rng: random.Random, title: str) -> str:
+    links = ''.join(f'<li class="css-{rng.randrange(16**6):06x}"><a href="/catalog/{i}/">Раздел {i}</a></li>'
+                    for i in range(60))
+    return (
+        '<!DOCTYPE html>\n<html lang="ru"><head><meta charset="windows-1251">'
+        f'<title>{esc(title)}</title>'
+        '<link rel="stylesheet" href="https://s.auto.drom.ru/main.css">'
+        f'<style>{filler_css(rng, 400)}</style>'
+        f'<script>{filler_script(rng, 60000)}</script>'
+        '</head><body>'
+        f'<header class="css-1h0wq3g"><nav><ul>{links}</ul></nav></header>'
+    )
+
+
+def footer(rng: random.Random) -> str:
+    links = ''.join(f'<a class="css-{rng.randrange(16**6):06x}" href="/info/{i}/">Ссылка {i}</a>' for i in range(40))
+    return f'<footer>{links}</footer><script>{filler_script(rng, 20000)}</script></body></html>'
+
+
+def spec_value_html(column: str, value: str) -> str:
+    """Ячейка значения в разных вариантах разметки drom"""
+    if column == 'power' and value:
+        number, _, rest = value.partition('л')
+        return f'{esc(number)}<span>л{esc(rest)}</span><button class="css-1ob2bsc">налог</button>'
+    if column == 'mileage_detail' and value.endswith('км'):
+        return f'{esc(value[:-2])}<span>км</span>'
+    if column in ('generation', 'complectation') and value:
+        return f'<a class="css-1kb7l9z" href="/catalog/{column}/">{esc(value)}</a>'
+    return f'<span>{esc(value)}</span>'
+
+
+def detail_page(rng: random.Random, row: pd.Series, with_state: bool) -> str:
+    car_name = text(row['car_name'])
+    parts = [header(rng, f'Продажа {car_name}')]
+
+    gallery = ''.join(f'<div class="css-{rng.randrange(16**6):06x}"><img src="https://s.auto.drom.ru/i24/{i}.jpg" '
+                      f'alt="{esc(car_name)}"></div>' for i in range(30))
+    parts.append(f'<div class="css-0 e1"><h1 class="css-1tjirrw"><span>Продажа {esc(car_name)}</span></h1>'
+                 f'<div class="css-eazmxc">{esc(row["price"])}&nbsp;&#8381;</div><div class="css-gallery">{gallery}</div>')
+
+    rows = []
+    for title, column in SPEC_ROWS:
+        value = text(row[column])
+        if value:
+            rows.append(f'<tr><th class="css-16lvhul" data-ftid="property">{title}</th>'
+                        f'<td class="css-1la7f7n" data-ftid="value">{spec_value_html(column, value)}</td></tr>')
+    parts.append(f'<table class="css-xalqz7 i2nf564" data-ftid="bulletin-specifications"><tbody>{"".join(rows)}</tbody></table>')
+
+    vin_items = [item for item in text(row['vin_report_items']).split(' | ') if item]
+    if text(row['vin_full']):
+        items = ''.join(f'<div class="css-13qo6o5 e1mhp2ux0"><button class="css-1q6ds1f">{esc(item)}</button></div>'
+                        for item in vin_items)
+        parts.append(f'<div class="css-1j8ksy7" data-ga-stats-name="gibdd_report">'
+                     f'<div class="css-o8yr01 e1b1mn0">{esc(row["vin_full"])}</div>{items}</div>')
+
+    description = '<br>'.join(esc(line) for line in text(row['full_description']).split('\n'))
+    trade = (f'<div data-ftid="trade"><span class="css-1jygg09">Обмен:</span>'
+             f'<span data-ftid="value">{esc(row["exchange_possible"])}</span></div>') if text(row['exchange_possible']) else ''
+    parts.append(f'<div class="css-inmjwf" data-ftid="bulletin-description">'
+                 f'<div data-ftid="info-full"><span data-ftid="value">{description}</span></div>{trade}'
+                 f'<div data-ftid="city"><span class="css-1jygg09">Город:</span>'
+                 f'<span data-ftid="value">{esc(row["city_from_description"])}</span></div></div>')
+
+    parts.append(f'<div class="css-1b1bflj" data-ftid="bull-page_bull-views">'
+                 f'<div class="css-pxeubi">Объявление {esc(row["bulletin_id"])} от {esc(row["bulletin_date"])}</div>'
+                 f'<div class="css-14wh0pm"><svg class="css-1m1bstl"></svg>{esc(row["views_count"])}</div></div></div>')
+
+    if with_state:
+        day, month, year = text(row['bulletin_date']).split('.')
+        state = {'bull': {
+            'bullInfo': {'id': int(row['bulletin_id']), 'date': f'{year}-{month}-{day}T12:00:00',
+                         'viewsCount': int(row['views_count'])},
+            'specifications': [{'title': title, 'value': text(row[column])}
+                               for title, column in SPEC_ROWS if text(row[column])],
+            'gibddReport': {'vin': text(row['vin_full']), 'items': [{'title': item} for item in vin_items]},
+            'bullDescription': {'text': text(row['full_description']), 'trade': text(row['exchange_possible']),
+                                'city': text(row['city_from_description'])},
+        }}
+        parts.append(f'<script>window.__PRELOADED_STATE__ = {js(state)};</script>')
+
+    parts.append(footer(rng))
+    return ''.join(parts)
+
+
+def search_page(rng: random.Random, rows: pd.DataFrame, page: int, total: int) -> str:
+    first = rows.iloc[0]
+    parts = [header(rng, f'Купить {text(first["brand"]).title()} — {total} объявлений')]
+
+    cards = []
+    for _, row in rows.iterrows():
+        listing = {
+            '@context': 'https://schema.org', '@type': 'Car', 'name': text(row['car_name']),
+            'brand': {'@type': 'Brand', 'name': text(row['brand']).title()},
+            'model': text(row['model']), 'vehicleModelDate': int(row['year']),
+            'offers': {'@type': 'Offer', 'price': int(row['price']), 'priceCurrency': 'RUB', 'url': text(row['url'])},
+            'image': {'@type': 'ImageObject', 'url': f'https://s.auto.drom.ru/i24/{row["bulletin_id"]}.jpg'},
+            'mileageFromOdometer': {'@type': 'QuantitativeValue', 'value': int(text(row['mileage']).replace(' ', '').replace('км', '') or 0)},
+            'vehicleIdentificationNumber': '',
+        }
+        price = f'{int(row["price"]):,}'.replace(',', ' ')
+        cards.append(
+            f'<div data-ftid="bulls-list_bull" class="css-1f68fiz"><a href="{esc(row["url"])}" class="css-4zflqt">'
+            f'<img data-ftid="bull_img" src="https://s.auto.drom.ru/i24/{row["bulletin_id"]}.jpg"></a>'
+            f'<a data-ftid="bull_title" href="{esc(row["url"])}"><h3>{esc(row["car_name"])}</h3></a>'
+            f'<div class="css-1fe6w6s"><span>{esc(row["engine"])}</span><span>{esc(row["transmission"])}</span>'
+            f'<span>{esc(row["mileage"])}</span></div>'
+            f'<span data-ftid="bull_price">{price}&nbsp;&#8381;</span>'
+            f'<script type="application/ld+json">{js(listing)}</script></div>'
+        )
+    parts.append(f'<div data-bulletin-list="true" class="css-1nvf6xk">{"".join(cards)}</div>')
+    parts.append(f'<script>window.__SEARCH_STATE__ = {{"page":{page},"bullsCount":{total}}};</script>')
+    parts.append(footer(rng))
+    return ''.join(parts)
+
+
+def write_fixture(name: str, content: str) -> int:
+    # Страницы drom отдаются в windows-1251 - проверяем, что текст в нее укладывается
+    content.encode('windows-1251')
+    data = content.encode('utf-8')
+    with gzip.GzipFile(os.path.join(FIXTURES_DIR, name), 'wb', mtime=0) as f:
+        f.write(data)
+    return len(data)
+
+
+def main():
+    rng = random.Random(SEED)
+    sample = pd.read_excel(SAMPLE_FILE)
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+
+    manifest = []
+    for i, row in sample.iterrows():
+        with_state = i % 2 == 1
+        name = f'detail_{i:02d}.html.gz'
+        size = write_fixture(name, detail_page(rng, row, with_state))
+        manifest.append({'file': name, 'kind': 'detail', 'url': text(row['url']), 'state': with_state, 'bytes': size})
+
+    total = SEARCH_PAGES * CARDS_PER_SEARCH_PAGE
+    search_url = text(sample.iloc[0]['search_url'])
+    for page in range(1, SEARCH_PAGES + 1):
+        rows = sample.sample(n=CARDS_PER_SEARCH_PAGE, replace=True, random_state=SEED + page)
+        name = f'search_{page:02d}.html.gz'
+        url = search_url if page == 1 else search_url.replace('/?', f'/page{page}/?')
+        size = write_fixture(name, search_page(rng, rows, page, total))
+        manifest.append({'file': name, 'kind': 'search', 'url': url, 'state': True, 'bytes': size})
+
+    with open(os.path.join(FIXTURES_DIR, 'manifest.json'), 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+    print(f"✅ {len(manifest)} страниц в {FIXTURES_DIR}")
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,328 @@
+"""
+ЛОКАЛЬНАЯ ЗАГЛУШКА auto.drom.ru ДЛЯ НАГРУЗОЧНЫХ ПРОГОНОВ
+- Отдает страницы выдачи и детальные страницы по тем же путям, что drom:
+  /{brand}/, /{brand}/{model}/page{N}/, /{city}/{brand}/{model}/{id}.html
+- Страницы берутся из хранилища сырых ответов (--recorded, формат
+  response_store: то, что записал --store-html) или из корпуса fixtures/
+- Ссылки на объявления переписываются на адрес заглушки; у каждой модели
+  и страницы свои id объявлений, поэтому дедупликация парсеров работает как на сайте
+- Ответы как у drom: windows-1251, сжатие br/gzip по Accept-Encoding
+- Настраиваются задержка ответа (распределение), доля 429/5xx и потолок
+  запросов в секунду, сверх которого сервер отвечает 429 с Retry-After
+- GET /__stats - счетчики статусов и перцентили времени ответа;
+  /__stats?reset=1 - отдать и обнулить (так делает bench_e2e.py между прогонами)
+
+Запуск: python benchmarks/mock_drom_server.py --port 8765 --latency-ms 150 --rate-429 0.02
+"""
+
+import argparse
+import asyncio
+import gzip
+import json
+import os
+import random
+import re
+import sys
+import time
+import zlib
+from typing import Dict, List, Optional, Tuple
+
+import brotli
+from aiohttp import web
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..', 'src'))
+
+from response_store import ResponseStore  # noqa: E402
+
+FIXTURES_DIR = os.path.join(BENCH_DIR, 'fixtures')
+DROM_BASE_URL = 'https://auto.drom.ru'
+
+DEFAULT_PORT = 8765
+DEFAULT_LATENCY_MS = 120.0
+DEFAULT_PAGES_PER_MODEL = 3
+DEFAULT_BROTLI_QUALITY = 5  # Динамическое сжатие: качество 11 стоило бы сотни мс на страницу
+
+LATENCY_DISTRIBUTIONS = ('fixed', 'uniform', 'lognormal')
+ENCODINGS = ('auto', 'br', 'gzip', 'identity')
+SERVER_ERROR_STATUSES = (500, 502, 503)
+
+PAGE_RE = re.compile(r'^page(\d+)$')
+DETAIL_PATH_RE = re.compile(r'^/([\w-]+)/([\w-]+)/([\w-]+)/(\d+)\.html$')
+LISTING_URL_RE = re.compile(r'https://auto\.drom\.ru/([\w-]+)/[\w-]+/[\w-]+/(\d+)\.html')
+BULLS_COUNT_RE = re.compile(r'"bullsCount":\d+')
+TITLE_COUNT_RE = re.compile(r'— \d+ объявлений')
+CARD_MARKER = '<div data-ftid="bulls-list_bull"'
+BULLETIN_LIST_RE = re.compile(r'<div data-bulletin-list="true".*?(?=<script>window\.__SEARCH_STATE__)', re.S)
+
+CONTENT_TYPE = 'text/html; charset=windows-1251'
+
+
+def load_fixtures() -> Tuple[List[str], List[str]]:
+    """Детальные страницы и страницы выдачи корпуса fixtures/ (см. make_fixtures.py)"""
+    with open(os.path.join(FIXTURES_DIR, 'manifest.json'), 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    details, searches = [], []
+    for entry in manifest:
+        with gzip.open(os.path.join(FIXTURES_DIR, entry['file']), 'rb') as f:
+            page = f.read().decode('utf-8')
+        (details if entry['kind'] == 'detail' else searches).append(page)
+    return details, searches
+
+
+def listing_id(*parts) -> int:
+    """Стабильный 9-значный id объявления для пути заглушки"""
+    return 100_000_000 + zlib.crc32('/'.join(map(str, parts)).encode('utf-8')) % 900_000_000
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+class RequestStats:
+    """Счетчики ответов и время обработки запроса на стороне сервера"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.started_at = time.time()
+        self.statuses: Dict[int, int] = {}
+        self.latencies_ms: List[float] = []
+        self.bytes_sent = 0
+
+    def record(self, status: int, latency_ms: float, size: int):
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.latencies_ms.append(latency_ms)
+        self.bytes_sent += size
+
+    def summary(self) -> Dict[str, object]:
+        elapsed = max(time.time() - self.started_at, 1e-9)
+        requests = len(self.latencies_ms)
+        return {
+            'requests': requests,
+            'statuses': {str(status): count for status, count in sorted(self.statuses.items())},
+            'requests_per_sec': round(requests / elapsed, 2),
+            'bytes_sent': self.bytes_sent,
+            'latency_ms': {
+                'p50': round(percentile(self.latencies_ms, 0.50), 1),
+                'p90': round(percentile(self.latencies_ms, 0.90), 1),
+                'p99': round(percentile(self.latencies_ms, 0.99), 1),
+                'max': round(max(self.latencies_ms, default=0.0), 1),
+            },
+        }
+
+
+class RequestBudget:
+    """Потолок запросов в секунду, как у сайта: сверх него - 429 (0 - без потолка)"""
+
+    def __init__(self, rate: float):
+        self.rate = rate
+        self.tokens = rate
+        self.updated_at = time.monotonic()
+
+    def take(self) -> bool:
+        if self.rate <= 0:
+            return True
+
+        now = time.monotonic()
+        self.tokens = min(self.rate, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class MockDrom:
+    """Страницы, ошибки и задержки заглушки"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.details, self.searches = load_fixtures()
+        self.empty_search = BULLETIN_LIST_RE.sub('', self.searches[0])
+        self.recorded = ResponseStore(args.recorded, replay=True) if args.recorded else None
+        self.budget = RequestBudget(args.max_rps)
+        self.stats = RequestStats()
+        self.base_url = f'http://{args.host}:{args.port}'
+        # (путь, кодировка) -> сжатое тело; повторные запросы не пережимают страницу
+        self._bodies: Dict[Tuple[str, str], bytes] = {}
+
+    # ---------- Страницы ----------
+
+    def search_page(self, brand: str, model: str, page: int) -> str:
+        """Страница выдачи модели (model='' - выдача бренда)"""
+        if page > self.args.pages_per_model:
+            return self.empty_search
+
+        html = self.searches[(page - 1) % len(self.searches)]
+        total = self.args.pages_per_model * 20
+        html = BULLS_COUNT_RE.sub(f'"bullsCount":{total}', html)
+        html = TITLE_COUNT_RE.sub(f'— {total} объявлений', html)
+
+        # У каждой карточки свой id: в корпусе объявления повторяются между карточками,
+        # а парсеры считают страницу с меньше чем 20 уникальными объявлениями последней
+        cards = html.split(CARD_MARKER)
+        for position in range(1, len(cards)):
+            def rewrite(match: re.Match) -> str:
+                city, original_id = match.groups()
+                listing_model = model or f'model{int(original_id) % 7}'
+                new_id = listing_id(brand, model, page, position)
+                return f'{self.base_url}/{city}/{brand}/{listing_model}/{new_id}.html'
+
+            cards[position] = LISTING_URL_RE.sub(rewrite, cards[position])
+        return CARD_MARKER.join(cards)
+
+    def detail_page(self, bulletin_id: int) -> str:
+        return self.details[bulletin_id % len(self.details)]
+
+    def page_for(self, request: web.Request) -> Tuple[int, str]:
+        """(status, html) для пути запроса"""
+        if self.recorded is not None:
+            recorded = self.recorded.get(f'{DROM_BASE_URL}{request.path_qs}')
+            if recorded is not None:
+                status, html = recorded
+                return status, html.replace(DROM_BASE_URL, self.base_url)
+
+        detail = DETAIL_PATH_RE.match(request.path)
+        if detail:
+            return 200, self.detail_page(int(detail.group(4)))
+
+        parts = [part for part in request.path.split('/') if part]
+        page = 1
+        if parts and PAGE_RE.match(parts[-1]):
+            page = int(PAGE_RE.match(parts.pop()).group(1))
+
+        if len(parts) == 1:
+            return 200, self.search_page(parts[0], '', page)
+        if len(parts) == 2:
+            return 200, self.search_page(parts[0], parts[1], page)
+        return 404, ''
+
+    def encoding_for(self, request: web.Request) -> str:
+        if self.args.encoding != 'auto':
+            return self.args.encoding
+
+        accepted = request.headers.get('Accept-Encoding', '')
+        if 'br' in accepted:
+            return 'br'
+        if 'gzip' in accepted:
+            return 'gzip'
+        return 'identity'
+
+    def encode(self, key: str, html: str, encoding: str) -> bytes:
+        cached = self._bodies.get((key, encoding))
+        if cached is not None:
+            return cached
+
+        body = html.encode('windows-1251', 'xmlcharrefreplace')
+        if encoding == 'br':
+            body = brotli.compress(body, quality=self.args.brotli_quality)
+        elif encoding == 'gzip':
+            body = gzip.compress(body, compresslevel=6)
+        self._bodies[(key, encoding)] = body
+        return body
+
+    # ---------- Ошибки и задержки ----------
+
+    def latency(self) -> float:
+        """Задержка ответа в секундах по выбранному распределению"""
+        base = self.args.latency_ms / 1000
+        spread = self.args.latency_spread
+        if self.args.latency == 'uniform':
+            return max(0.0, self.rng.uniform(base * (1 - spread), base * (1 + spread)))
+        if self.args.latency == 'lognormal':
+            # latency_ms - медиана, spread - sigma: длинный хвост, как у живого сайта
+            return self.rng.lognormvariate(0, spread) * base
+        return base
+
+    def injected_error(self) -> Optional[int]:
+        if not self.budget.take():
+            return 429
+
+        roll = self.rng.random()
+        if roll < self.args.rate_429:
+            return 429
+        if roll < self.args.rate_429 + self.args.rate_5xx:
+            return self.rng.choice(SERVER_ERROR_STATUSES)
+        return None
+
+    # ---------- Обработчики ----------
+
+    async def handle(self, request: web.Request) -> web.Response:
+        started = time.perf_counter()
+        await asyncio.sleep(self.latency())
+
+        error = self.injected_error()
+        if error == 429:
+            response = web.Response(status=429, headers={'Retry-After': str(self.args.retry_after)})
+        elif error is not None:
+            response = web.Response(status=error, text='Service unavailable')
+        else:
+            status, html = self.page_for(request)
+            encoding = self.encoding_for(request)
+            headers = {'Content-Type': CONTENT_TYPE}
+            if encoding != 'identity':
+                headers['Content-Encoding'] = encoding
+            response = web.Response(status=status, body=self.encode(request.path_qs, html, encoding), headers=headers)
+
+        self.stats.record(response.status, (time.perf_counter() - started) * 1000, response.content_length or 0)
+        return response
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        summary = self.stats.summary()
+        if request.query.get('reset'):
+            self.stats.reset()
+        return web.json_response(summary)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_get('/__stats', self.handle_stats)
+        app.router.add_get('/{tail:.*}', self.handle)
+        return app
+
+
+def add_server_arguments(parser: argparse.ArgumentParser):
+    """Флаги заглушки (их же принимает bench_e2e.py и передает серверу)"""
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--latency', choices=LATENCY_DISTRIBUTIONS, default='lognormal',
+                        help='распределение задержки ответа (по умолчанию lognormal)')
+    parser.add_argument('--latency-ms', type=float, default=DEFAULT_LATENCY_MS,
+                        help=f'задержка ответа, мс: медиана для lognormal (по умолчанию {DEFAULT_LATENCY_MS})')
+    parser.add_argument('--latency-spread', type=float, default=0.5,
+                        help='разброс задержки: sigma для lognormal, доля для uniform')
+    parser.add_argument('--rate-429', type=float, default=0.0, help='доля ответов 429')
+    parser.add_argument('--rate-5xx', type=float, default=0.0, help='доля ответов 500/502/503')
+    parser.add_argument('--max-rps', type=float, default=0.0,
+                        help='потолок запросов в секунду, сверх него 429 (0 - без потолка)')
+    parser.add_argument('--retry-after', type=int, default=1, help='Retry-After в ответах 429, сек')
+    parser.add_argument('--encoding', choices=ENCODINGS, default='auto',
+                        help='сжатие ответов (auto - по Accept-Encoding, br в приоритете)')
+    parser.add_argument('--brotli-quality', type=int, default=DEFAULT_BROTLI_QUALITY)
+    parser.add_argument('--pages-per-model', type=int, default=DEFAULT_PAGES_PER_MODEL,
+                        help=f'страниц выдачи у каждой модели, по 20 объявлений (по умолчанию {DEFAULT_PAGES_PER_MODEL})')
+    parser.add_argument('--recorded', default=None,
+                        help='хранилище сырых ответов (raw_html/ от --store-html); чего там нет - из fixtures/')
+    parser.add_argument('--seed', type=int, default=None, help='seed для задержек и ошибок')
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Локальная заглушка auto.drom.ru')
+    add_server_arguments(parser)
+    args = parser.parse_args()
+
+    mock = MockDrom(args)
+    print(f"🧪 Заглушка drom: {mock.base_url} | задержка {args.latency} {args.latency_ms:.0f} мс | "
+          f"429: {args.rate_429:.0%} | 5xx: {args.rate_5xx:.0%} | потолок: {args.max_rps or '-'} req/s", flush=True)
+    web.run_app(mock.app(), host=args.host, port=args.port, print=None, access_log=None)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -36,7 +36,7 @@ try:
     failed = progress.get('failed', 0)
     skipped = progress.get('skipped', 0)
     failed_indices = progress.get('failed_indices', [])
-    retry_attempt = progress.get('retry_attempt', 1)
+    retry_queue = progress.get('retry_queue', [])
 
     total_processed = successful + failed
     progress_pct = (last_index / total_rows) * 100 if total_rows > 0 else 0
@@ -50,13 +50,25 @@ try:
     print(f"○ Пропущено:                   {skipped:,}")
     print(f"Success Rate:                  {success_rate:.1f}%")
     print(f"")
-    print(f"🔄 Попытка обработки:           {retry_attempt}/3")
+    print(f"🔁 В очереди повторов:          {len(retry_queue):,}")
 
-    if retry_attempt > 1:
+    concurrency = progress.get('concurrency')
+    if concurrency:
+        print(f"🎚️  Окно параллельности:         {concurrency['window']} ({concurrency['min_limit']}-{concurrency['max_limit']})")
+        for decision in concurrency.get('decisions', [])[-3:]:
+            print(f"   {decision['time']}: {decision['from']} → {decision['to']} ({decision['reason']})")
+
+    if retry_queue:
+        import time
+        next_retry = min(item['due_at'] for item in retry_queue)
+        by_attempt = {}
+        for item in retry_queue:
+            by_attempt[item['attempts']] = by_attempt.get(item['attempts'], 0) + 1
         print(f"")
-        print(f"📊 РЕЖИМ ПОВТОРНОЙ ОБРАБОТКИ ОШИБОК АКТИВЕН")
-        print(f"   Обрабатывается попытка #{retry_attempt}")
-        print(f"   Осталось ошибок для обработки: {len(failed_indices):,}")
+        print(f"📊 ОЧЕРЕДЬ ПОВТОРОВ")
+        print(f"   Ближайший повтор через: {max(0, next_retry - time.time()):.0f}с")
+        for attempts, count in sorted(by_attempt.items()):
+            print(f"   После {attempts} неудачных попыток: {count:,}")
 
 except Exception as e:
     print(f"Ошибка чтения прогресса: {e}")
@@ -0,0 +1,82 @@
+"""
+LRU-КЭШ ФАЙЛОВ РЕЗУЛЬТАТОВ (CHUNK)
+- Держит в памяти несколько последних таблиц drom_full_scraper_N.xlsx:
+  повторная сборка того же файла (следующий диапазон аренды, повторы,
+  --materialize в том же процессе) не читает XLSX заново
+- Измененные таблицы помечаются (mark_dirty) и записываются на диск при
+  вытеснении из кэша и на контрольной точке (flush)
+- Если файл на диске изменил кто-то другой (другой процесс --lease),
+  таблица в памяти устарела и читается заново
+"""
+
+import os
+from collections import OrderedDict
+from typing import Callable, Optional, Set, Tuple
+
+import pandas as pd
+
+DEFAULT_CAPACITY = 3  # Таблиц в памяти (50 000 строк каждая)
+
+
+def _file_mtime(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_mtime_ns
+    except OSError:
+        return None
+
+
+class ChunkCache:
+    """Таблицы файлов результатов по номеру файла, с вытеснением давно не использованных"""
+
+    def __init__(self, load: Callable[[int], pd.DataFrame], save: Callable[[int, pd.DataFrame], None],
+                 path: Callable[[int], str], capacity: int = DEFAULT_CAPACITY):
+        self._load = load
+        self._save = save
+        self._path = path
+        self.capacity = capacity
+
+        # Номер файла -> (таблица, mtime файла на момент чтения/записи)
+        self._frames: 'OrderedDict[int, Tuple[pd.DataFrame, Optional[int]]]' = OrderedDict()
+        self._dirty: Set[int] = set()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, file_number: int) -> pd.DataFrame:
+        """Таблица файла: из памяти, если файл не менялся, иначе с диска"""
+        cached = self._frames.get(file_number)
+        if cached is not None:
+            frame, mtime = cached
+            if file_number in self._dirty or mtime == _file_mtime(self._path(file_number)):
+                self._frames.move_to_end(file_number)
+                self.hits += 1
+                return frame
+            del self._frames[file_number]
+
+        self.misses += 1
+        frame = self._load(file_number)
+        self._frames[file_number] = (frame, _file_mtime(self._path(file_number)))
+        self._evict()
+        return frame
+
+    def mark_dirty(self, file_number: int):
+        self._dirty.add(file_number)
+
+    def _write(self, file_number: int):
+        frame, _ = self._frames[file_number]
+        self._save(file_number, frame)
+        self._frames[file_number] = (frame, _file_mtime(self._path(file_number)))
+        self._dirty.discard(file_number)
+
+    def _evict(self):
+        while len(self._frames) > self.capacity:
+            file_number = next(iter(self._frames))
+            if file_number in self._dirty:
+                self._write(file_number)
+            del self._frames[file_number]
+
+    def flush(self) -> int:
+        """Записывает все измененные таблицы (контрольная точка). Возвращает их число"""
+        dirty = sorted(self._dirty)
+        for file_number in dirty:
+            self._write(file_number)
+        return len(dirty)
@@ -0,0 +1,172 @@
+"""
+АДАПТИВНЫЙ КОНТРОЛЛЕР ПАРАЛЛЕЛЬНОСТИ (AIMD)
+- Плавно увеличивает число одновременных запросов, пока задержки и ошибки в норме
+- Резко уменьшает окно при 429/5xx, сетевых ошибках или росте p95 задержки
+- Хранит текущее окно и журнал решений для логов и файла прогресса
+"""
+
+import asyncio
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+import aiohttp
+
+
+class AIMDController:
+    """
+    Окно параллельности по схеме AIMD (additive increase / multiplicative decrease).
+
+    Воркеры берут слот через acquire()/release(), а результаты запросов
+    попадают в record() - напрямую или через trace_config() сессии aiohttp.
+    Решение принимается раз в окно завершенных запросов.
+    """
+
+    def __init__(
+        self,
+        initial: int = 5,
+        min_limit: int = 1,
+        max_limit: int = 20,
+        increase_step: int = 1,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 1.5,
+        cooldown: float = 5.0,
+        history_size: int = 50,
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.increase_step = increase_step
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.cooldown = cooldown
+
+        self.window = max(min_limit, min(initial, max_limit))
+        self.in_use = 0
+        self.baseline_p95: Optional[float] = None
+        self.decisions: Deque[Dict[str, Any]] = deque(maxlen=history_size)
+
+        self._latencies: List[float] = []
+        self._errors = 0
+        self._last_decrease = 0.0
+        self._condition: Optional[asyncio.Condition] = None
+
+    # ---------- слоты ----------
+
+    def _get_condition(self) -> asyncio.Condition:
+        # Создаем лениво, чтобы привязаться к текущему event loop
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        return self._condition
+
+    async def acquire(self):
+        """Ждет свободный слот в текущем окне"""
+        condition = self._get_condition()
+        async with condition:
+            await condition.wait_for(lambda: self.in_use < self.window)
+            self.in_use += 1
+
+    async def release(self):
+        """Освобождает слот"""
+        condition = self._get_condition()
+        async with condition:
+            self.in_use -= 1
+            condition.notify_all()
+
+    # ---------- обратная связь ----------
+
+    def record(self, status: Optional[int], latency: float):
+        """
+        Учитывает завершенный запрос. status=None означает сетевую ошибку
+        или таймаут.
+        """
+        if status is None or status == 429 or status >= 500:
+            self._errors += 1
+        else:
+            self._latencies.append(latency)
+
+        if self._errors and time.monotonic() - self._last_decrease >= self.cooldown:
+            self._decrease(f"ошибки/429: {self._errors}")
+            return
+
+        if len(self._latencies) + self._errors >= self.window:
+            self._evaluate()
+
+    def _evaluate(self):
+        latencies = sorted(self._latencies)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0
+
+        if self.baseline_p95 is None:
+            self.baseline_p95 = p95
+
+        if p95 > self.baseline_p95 * self.latency_tolerance:
+            if time.monotonic() - self._last_decrease >= self.cooldown:
+                self._decrease(f"p95 {p95:.2f}с > {self.baseline_p95 * self.latency_tolerance:.2f}с")
+                return
+        else:
+            # Базовая линия медленно подстраивается под здоровые интервалы
+            self.baseline_p95 = 0.9 * self.baseline_p95 + 0.1 * p95
+            if self.window < self.max_limit:
+                self._set_window(self.window + self.increase_step, f"p95 {p95:.2f}с в норме")
+
+        self._reset_interval()
+
+    def _decrease(self, reason: str):
+        self._last_decrease = time.monotonic()
+        new_window = max(self.min_limit, int(self.window * self.decrease_factor))
+        self._set_window(new_window, reason)
+        self._reset_interval()
+
+    def _reset_interval(self):
+        self._latencies = []
+        self._errors = 0
+
+    def _set_window(self, new_window: int, reason: str):
+        new_window = max(self.min_limit, min(new_window, self.max_limit))
+        old_window = self.window
+        self.window = new_window
+        self.decisions.append({
+            'time': time.strftime('%H:%M:%S'),
+            'from': old_window,
+            'to': new_window,
+            'reason': reason,
+        })
+
+        if new_window != old_window:
+            arrow = '↑' if new_window > old_window else '↓'
+            print(f"    🎚️  Параллельность {arrow} {old_window} → {new_window} ({reason})")
+
+        # Расширение окна должно разбудить ожидающих воркеров
+        if new_window > old_window and self._condition is not None:
+            asyncio.ensure_future(self._wake_waiters())
+
+    async def _wake_waiters(self):
+        async with self._get_condition():
+            self._condition.notify_all()
+
+    def trace_config(self) -> aiohttp.TraceConfig:
+        """TraceConfig для aiohttp: каждый запрос сессии попадает в record()"""
+        trace_config = aiohttp.TraceConfig()
+
+        async def on_request_start(session, ctx, params):
+            ctx.start = time.monotonic()
+
+        async def on_request_end(session, ctx, params):
+            self.record(params.response.status, time.monotonic() - ctx.start)
+
+        async def on_request_exception(session, ctx, params):
+            self.record(None, time.monotonic() - ctx.start)
+
+        trace_config.on_request_start.append(on_request_start)
+        trace_config.on_request_end.append(on_request_end)
+        trace_config.on_request_exception.append(on_request_exception)
+        return trace_config
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Текущее состояние контроллера для сохранения в прогресс"""
+        return {
+            'window': self.window,
+            'min_limit': self.min_limit,
+            'max_limit': self.max_limit,
+            'baseline_p95': round(self.baseline_p95, 3) if self.baseline_p95 is not None else None,
+            'decisions': list(self.decisions)[-10:],
+        }
@@ -1,20 +1,44 @@
 """
 ПАРСЕР DROM.RU
 Скрапит объявления автомобилей с сайта auto.drom.ru
+- По умолчанию обходит модели последовательно через requests
+- С флагом --async обходит несколько брендов и моделей параллельно через aiohttp
+- С флагом --incremental собирает только новые объявления (дельту к прошлым запускам)
+- С флагом --db дополнительно пишет объявления и статусы моделей в SQLite (listing_db.py)
+- Прогресс: небольшой заголовок .json (индекс, статистика) и дописываемые журналы
+  результатов и кэша брендов; XLSX собирается в конце прогона или по --materialize
 """
 
+import argparse
+import asyncio
+import aiohttp
+import glob
 import pandas as pd
 import requests
-from bs4 import BeautifulSoup
 import json
+import math
 import time
-from typing import List, Dict, Any, Set, Optional
+from datetime import datetime
+from typing import List, Dict, Any, Set, Optional, Tuple
 import random
 import os
 import re
+from itertools import islice
 from requests.adapters import HTTPAdapter
 from urllib3.util.retry import Retry
 
+from concurrency_controller import AIMDController
+from embedded_state import find_state_value, is_count
+from excel_cache import read_excel_cached
+from failure_ledger import DeadLedger, Failure, failure_from_exception, failure_from_status, load_ledger
+from json_ld import parse_car_listings
+from known_listings import KnownListings, load_known_listings
+from listing_db import ListingDB, add_db_arguments, db_from_args
+from rate_limiter import HostRateLimiter
+from response_store import ResponseStore, add_store_arguments, store_from_args
+from result_journal import ResultJournal, latest_entries
+from work_plan import ModelPlan
+
 # Проверяем наличие brotli
 try:
     import brotli
@@ -27,15 +51,101 @@ except ImportError:
 # Получаем директорию, где находится скрипт
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# Адрес сайта (--base-url переключает на локальную заглушку benchmarks/mock_drom_server.py)
+DROM_BASE_URL = 'https://auto.drom.ru'
+
 # НАСТРОЙКА: порог для "малого" количества объявлений
 SMALL_BRAND_THRESHOLD = 20
 
+# Объявлений на одной странице выдачи и сколько страниц выдачи грузить одновременно
+# (страницы дальше предела догружаются по одной до пустой)
+LISTINGS_PER_PAGE = 20
+MAX_PARALLEL_PAGES = 100
+
+# НАСТРОЙКА: бюджет запросов к auto.drom.ru (запросов/сек, размер всплеска)
+REQUESTS_PER_SECOND = 4.0
+REQUESTS_BURST = 4
+
+# НАСТРОЙКА: асинхронный режим (--async)
+ASYNC_BRANDS = 3  # Брендов одновременно
+ASYNC_MODELS_PER_BRAND = 4  # Моделей одного бренда одновременно
+ASYNC_INITIAL_REQUESTS = 4  # Стартовое окно одновременных запросов
+ASYNC_MAX_REQUESTS = 10  # Верхняя граница окна (AIMD)
+
+# Общий ограничитель для всех запросов скрипта: вместо пауз на 5 минут
+# после 429 на паузу встает только хост, вернувший 429
+rate_limiter = HostRateLimiter(rate=REQUESTS_PER_SECOND, burst=REQUESTS_BURST)
+
+# Хранилище сырых страниц (--store-html / --replay), настраивается в main()
+response_store: Optional[ResponseStore] = None
+
+# Имя файлов прогресса/результатов (.json/.xlsx); в --incremental пишем дельту отдельно
+OUTPUT_NAME = 'drom_scraped_data_progress'
+
+# Объявления прошлых запусков (только в --incremental)
+known_listings: Optional[KnownListings] = None
+
+# Реестр удаленных моделей (404/410), общий для всех парсеров; открывается в main()
+dead_ledger: Optional[DeadLedger] = None
+
+# База объявлений (--db) и сколько results уже в нее записано
+listing_db: Optional[ListingDB] = None
+db_saved_results = 0
+
+# Журналы прогресса (открываются в init_state): results по номеру, кэш брендов по имени
+# и statistics['errors'] по номеру. Чекпоинт дописывает в них только новое, поэтому
+# его цена не растет к концу прогона
+results_journal: Optional[ResultJournal] = None
+brands_journal: Optional[ResultJournal] = None
+errors_journal: Optional[ResultJournal] = None
+journal_saved_results = 0
+journal_saved_brands = 0
+journal_saved_errors = 0
+
 
 # ========== ФУНКЦИИ ДЛЯ РАБОТЫ С ПРОГРЕССОМ ==========
 
+def get_journal_paths() -> Tuple[str, str, str]:
+    """Журналы прогресса: результаты моделей, кэш брендов и ошибки"""
+    return (os.path.join(SCRIPT_DIR, f'{OUTPUT_NAME}_results.jsonl'),
+            os.path.join(SCRIPT_DIR, f'{OUTPUT_NAME}_brands.jsonl'),
+            os.path.join(SCRIPT_DIR, f'{OUTPUT_NAME}_errors.jsonl'))
+
+
+def progress_complete(progress_file: str) -> bool:
+    """Прогон, записавший этот файл прогресса, дошел до последней строки (битый файл - тоже конец)"""
+    try:
+        with open(progress_file, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        return data['last_index'] + 1 >= data['statistics']['total_rows']
+    except (OSError, ValueError, KeyError, TypeError):
+        return True
+
+
+def incremental_output_name() -> str:
+    """
+    Имя дельты --incremental: незавершенный сегодняшний прогон продолжается,
+    после завершенного начинается новый - со временем запуска в имени
+    """
+    now = datetime.now()
+    base = f"drom_scraped_data_delta_{now:%Y%m%d}"
+    progress_files = glob.glob(os.path.join(SCRIPT_DIR, f'{base}.json'))
+    progress_files += glob.glob(os.path.join(SCRIPT_DIR, f'{base}_*.json'))
+    if not progress_files:
+        return base
+
+    latest = max(progress_files, key=os.path.getmtime)
+    if not progress_complete(latest):
+        return os.path.splitext(os.path.basename(latest))[0]
+    return f"{base}_{now:%H%M%S}"
+
+
 def load_progress():
-    """Загружает прогресс из файла"""
-    progress_file = os.path.join(SCRIPT_DIR, 'drom_scraped_data_progress.json')
+    """
+    Загружает прогресс: заголовок .json, results/brand_cache и ошибки из журналов.
+    Файл прогресса старого формата (results или ошибки внутри .json) читается как есть
+    """
+    progress_file = os.path.join(SCRIPT_DIR, f'{OUTPUT_NAME}.json')
     if os.path.exists(progress_file):
         try:
             with open(progress_file, 'r', encoding='utf-8') as f:
@@ -51,12 +161,28 @@ def load_progress():
                     print(f"⚠️  Файл прогресса поврежден")
                     return None
 
-                print(f"\n📂 НАЙДЕН ФАЙЛ ПРОГРЕССА")
-                print(f"   Последняя обработанная строка: {data.get('last_index', -1) + 1}")
-                print(f"   Успешно: {data['statistics'].get('successful', 0)}")
-                print(f"   Ошибок: {data['statistics'].get('failed', 0)}")
-                print(f"   Без результатов: {data['statistics'].get('no_results', 0)}")
-                return data
+            if 'results' not in data:
+                # Журналы могут быть длиннее заголовка (остановка между записью журнала
+                # и заголовка): берем ровно results_count результатов
+                results_path, brands_path, _ = get_journal_paths()
+                entries = latest_entries(results_path)
+                data['results'] = [entries[i] for i in range(data.get('results_count', 0)) if i in entries]
+                data['brand_cache'] = latest_entries(brands_path)
+                if len(data['results']) < data.get('results_count', 0):
+                    print(f"⚠️  Журнал результатов неполный: {len(data['results'])} из {data['results_count']}")
+                    return None
+
+            if 'errors_count' in data:
+                # Ошибки дописываются раньше заголовка - лишние строки журнала отбрасываем
+                entries = latest_entries(get_journal_paths()[2])
+                data['statistics']['errors'] = [entries[i] for i in range(data['errors_count']) if i in entries]
+
+            print(f"\n📂 НАЙДЕН ФАЙЛ ПРОГРЕССА")
+            print(f"   Последняя обработанная строка: {data.get('last_index', -1) + 1}")
+            print(f"   Успешно: {data['statistics'].get('successful', 0)}")
+            print(f"   Ошибок: {data['statistics'].get('failed', 0)}")
+            print(f"   Без результатов: {data['statistics'].get('no_results', 0)}")
+            return data
         except json.JSONDecodeError as e:
             print(f"⚠️  Ошибка парсинга JSON: {e}")
             return None
@@ -66,50 +192,92 @@ def load_progress():
     return None
 
 
-# Загружаем данные из файла
-excel_file = os.path.join(SCRIPT_DIR, 'недостающие модели и поколения_updated2.xlsx')
-df = pd.read_excel(excel_file)
-
-# Загружаем прогресс
-progress_data = load_progress()
-
-if progress_data:
-    start_index = progress_data.get('last_index', -1) + 1
-    results = progress_data.get('results', [])
-    statistics = progress_data.get('statistics', {
-        'total_rows': len(df),
-        'successful': 0,
-        'failed': 0,
-        'no_results': 0,
-        'total_ads_found': 0,
-        'skipped_brands': 0,
-        'errors': []
-    })
-    brand_cache = progress_data.get('brand_cache', {})
-    request_count = progress_data.get('request_count', 0)
-
-    print(f"🔄 ПРОДОЛЖАЕМ С СТРОКИ {start_index + 1} из {len(df)}")
-    print(f"   Прогресс: {start_index}/{len(df)} ({start_index / len(df) * 100:.1f}%)")
-    print(f"   Выполнено запросов: {request_count}")
-    print(f"{'=' * 70}\n")
-else:
-    start_index = 0
-    results = []
-    statistics = {
-        'total_rows': len(df),
-        'successful': 0,
-        'failed': 0,
-        'no_results': 0,
-        'total_ads_found': 0,
-        'skipped_brands': 0,
-        'errors': []
-    }
-    brand_cache = {}
-    request_count = 0
+# Состояние парсера (заполняется в init_state)
+df: Optional[pd.DataFrame] = None
+plan: Optional[ModelPlan] = None
+start_index = 0
+results: List[Dict[str, Any]] = []
+statistics: Dict[str, Any] = {}
+brand_cache: Dict[str, Dict[str, Any]] = {}
+request_count = 0
+
+
+def init_state():
+    """Загружает список моделей и прогресс прошлого запуска"""
+    global df, plan, start_index, results, statistics, brand_cache, request_count
+    global results_journal, brands_journal, errors_journal
+    global journal_saved_results, journal_saved_brands, journal_saved_errors
+
+    # Загружаем данные из файла
+    excel_file = os.path.join(SCRIPT_DIR, 'недостающие модели и поколения_updated2.xlsx')
+    df = read_excel_cached(excel_file)
+    plan = ModelPlan(df)
+
+    # Загружаем прогресс
+    progress_data = load_progress()
+
+    if progress_data:
+        start_index = progress_data.get('last_index', -1) + 1
+        results = progress_data.get('results', [])
+        statistics = progress_data.get('statistics', {
+            'total_rows': len(df),
+            'successful': 0,
+            'failed': 0,
+            'no_results': 0,
+            'total_ads_found': 0,
+            'skipped_brands': 0,
+            'errors': []
+        })
+        statistics.setdefault('errors', [])
+        brand_cache = progress_data.get('brand_cache', {})
+        request_count = progress_data.get('request_count', 0)
+
+        print(f"🔄 ПРОДОЛЖАЕМ С СТРОКИ {start_index + 1} из {len(df)}")
+        print(f"   Прогресс: {start_index}/{len(df)} ({start_index / len(df) * 100:.1f}%)")
+        print(f"   Выполнено запросов: {request_count}")
+        print(f"{'=' * 70}\n")
+    else:
+        start_index = 0
+        results = []
+        statistics = {
+            'total_rows': len(df),
+            'successful': 0,
+            'failed': 0,
+            'no_results': 0,
+            'total_ads_found': 0,
+            'skipped_brands': 0,
+            'errors': []
+        }
+        brand_cache = {}
+        request_count = 0
+
+        print(f"🆕 НАЧИНАЕМ С НАЧАЛА")
+        print(f"   Всего строк: {len(df)}")
+        print(f"{'=' * 70}\n")
+
+    # Прогресс старого формата переносится в журналы первым же сохранением
+    results_path, brands_path, errors_path = get_journal_paths()
+    results_journal = ResultJournal(results_path)
+    brands_journal = ResultJournal(brands_path)
+    errors_journal = ResultJournal(errors_path)
+    if progress_data and 'results_count' in progress_data:
+        journal_saved_results = len(results)
+        journal_saved_brands = len(brand_cache)
+    else:
+        if progress_data:
+            print(f"📦 Прогресс старого формата: {len(results)} результатов перенесутся в журналы при первом сохранении\n")
+        results_journal.reset()
+        brands_journal.reset()
+        journal_saved_results = 0
+        journal_saved_brands = 0
+
+    # Ошибки внутри заголовка (прежний формат) так же переезжают в журнал
+    if progress_data and 'errors_count' in progress_data:
+        journal_saved_errors = len(statistics['errors'])
+    else:
+        errors_journal.reset()
+        journal_saved_errors = 0
 
-    print(f"🆕 НАЧИНАЕМ С НАЧАЛА")
-    print(f"   Всего строк: {len(df)}")
-    print(f"{'=' * 70}\n")
 
 # User-Agent список
 USER_AGENTS = [
@@ -123,10 +291,11 @@ USER_AGENTS = [
 def create_session():
     """Создает сессию с повторными попытками"""
     session = requests.Session()
+    # 429 не повторяем на уровне urllib3 - его обрабатывает rate_limiter
     retry_strategy = Retry(
         total=5,
         backoff_factor=2,
-        status_forcelist=[429, 500, 502, 503, 504],
+        status_forcelist=[500, 502, 503, 504],
         allowed_methods=["GET"]
     )
     adapter = HTTPAdapter(max_retries=retry_strategy)
@@ -182,165 +351,242 @@ def decode_response(response):
 
 def adaptive_delay(request_count, base_min=0.5, base_max=1):
     """Адаптивная пауза - минимальные значения для drom.ru"""
+    if response_store is not None and response_store.replay:
+        return 0.0
+
     multiplier = 1 + (request_count // 50) * 0.1
     min_delay = min(base_min * multiplier, 3)
     max_delay = min(base_max * multiplier, 5)
     return random.uniform(min_delay, max_delay)
 
 
-def long_break_check(request_count, break_every=200, break_duration=30):
-    """Длинная пауза каждые N запросов - редко и коротко"""
-    if request_count > 0 and request_count % break_every == 0:
-        print(f"\n    ⏸️  ДЛИННАЯ ПАУЗА после {request_count} запросов")
-        print(f"    ⏸️  Ждём {break_duration} секунд...")
-        time.sleep(break_duration)
-        return True
-    return False
+def rate_limited_get(session, url: str):
+    """GET через общий rate_limiter; на 429 ставит хост на паузу по Retry-After"""
+    global request_count
+
+    rate_limiter.wait(url)
+    response = session.get(url, headers=get_headers(), timeout=45, stream=True)
+    request_count += 1
+
+    if response.status_code == 429:
+        cooldown = rate_limiter.penalize(url, response.headers.get('Retry-After'))
+        print(f"    ⚠️ Код 429, пауза хоста {cooldown:.0f}с...")
+    elif response.status_code == 200:
+        rate_limiter.record_success(url)
+
+    return response
+
+
+def status_error(status: Optional[int]) -> str:
+    """Текст ошибки для неуспешного статуса (None - страницы нет в хранилище при --replay)"""
+    return failure_from_status(status).reason
+
+
+def fetch_html(session, url: str) -> Tuple[Optional[int], str]:
+    """Возвращает (status, html): из хранилища при --replay, иначе через rate_limited_get"""
+    if response_store is not None and response_store.replay:
+        return response_store.get(url) or (None, '')
+
+    response = rate_limited_get(session, url)
+    if response.status_code == 429:
+        return 429, ''
+
+    html = decode_response(response) if response.status_code == 200 else ''
+    # 5xx не сохраняем: это временная ошибка, а не содержимое страницы
+    if response_store is not None and response.status_code < 500:
+        response_store.put(url, response.status_code, html)
+    return response.status_code, html
+
+
+def result_rows(result: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Строки выходной таблицы для результата модели: по строке на объявление или одна строка статуса"""
+    if result['total_ads'] == 0:
+        return [{
+            'brand': result['brand'],
+            'model': result['model'],
+            'start_year': result['start_year'],
+            'finish_year': result['finish_year'],
+            'search_url': result['search_url'],
+            'status': result['error'] or 'Нет объявлений',
+            'car_name': '',
+            'year': '',
+            'price': '',
+            'currency': '',
+            'url': '',
+            'mileage': '',
+            'vin': '',
+            'image_url': ''
+        }]
+
+    return [{
+        'brand': result['brand'],
+        'model': result['model'],
+        'start_year': result['start_year'],
+        'finish_year': result['finish_year'],
+        'search_url': result['search_url'],
+        'status': 'Найдено',
+        'car_name': listing.get('name', ''),
+        'year': listing.get('year', ''),
+        'price': listing.get('price', ''),
+        'currency': listing.get('currency', 'RUB'),
+        'url': listing.get('url', ''),
+        'mileage': listing.get('mileage', ''),
+        'vin': listing.get('vin', ''),
+        'image_url': listing.get('image', '')
+    } for listing in result['listings']]
+
+
+def save_results_to_db():
+    """Дописывает в базу результаты, появившиеся после прошлого сохранения (одна транзакция на таблицу)"""
+    global db_saved_results
+
+    new_results = results[db_saved_results:]
+    if not new_results:
+        return
+
+    listing_db.upsert_listings(row for result in new_results if result['total_ads'] for row in result_rows(result))
+    listing_db.upsert_models({
+        'search_url': result['search_url'],
+        'brand': result['brand'],
+        'model': result['model'],
+        'start_year': result['start_year'],
+        'finish_year': result['finish_year'],
+        'status': 'Найдено' if result['total_ads'] else (result['error'] or 'Нет объявлений'),
+        'total_ads': result['total_ads'],
+    } for result in new_results)
+    db_saved_results = len(results)
 
 
 def save_progress(current_index):
-    """Сохраняет текущий прогресс"""
-    progress_file = os.path.join(SCRIPT_DIR, 'drom_scraped_data_progress.json')
+    """
+    Сохраняет прогресс: дописывает в журналы результаты, бренды и ошибки,
+    появившиеся после прошлого сохранения, затем атомарно заменяет заголовок
+    .json (в нем только счетчики, без списков)
+    """
+    global journal_saved_results, journal_saved_brands, journal_saved_errors
 
-    # Резервная копия
-    if os.path.exists(progress_file):
-        backup_file = os.path.join(SCRIPT_DIR, 'drom_scraped_data_progress.json.backup')
-        try:
-            import shutil
-            shutil.copy2(progress_file, backup_file)
-        except:
-            pass
-
-    # Сохраняем прогресс
-    progress_data = {
-        'last_index': current_index,
-        'statistics': statistics,
-        'results': results,
-        'brand_cache': brand_cache,
-        'request_count': request_count
-    }
+    progress_file = os.path.join(SCRIPT_DIR, f'{OUTPUT_NAME}.json')
 
     try:
-        with open(progress_file, 'w', encoding='utf-8') as f:
-            json.dump(progress_data, f, ensure_ascii=False, indent=2)
+        # Сначала журналы на диск: заголовок не должен ссылаться на незаписанное
+        for i in range(journal_saved_results, len(results)):
+            results_journal.append(i, results[i])
+        for brand, brand_data in islice(brand_cache.items(), journal_saved_brands, None):
+            brands_journal.append(brand, brand_data)
+        errors = statistics['errors']
+        for i in range(journal_saved_errors, len(errors)):
+            errors_journal.append(i, errors[i])
+        results_journal.sync()
+        brands_journal.sync()
+        errors_journal.sync()
+        journal_saved_results = len(results)
+        journal_saved_brands = len(brand_cache)
+        journal_saved_errors = len(errors)
+
+        progress_data = {
+            'last_index': current_index,
+            'statistics': {key: value for key, value in statistics.items() if key != 'errors'},
+            'request_count': request_count,
+            'results_count': journal_saved_results,
+            'errors_count': journal_saved_errors,
+        }
+        tmp_file = f'{progress_file}.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(progress_data, f, ensure_ascii=False)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_file, progress_file)
     except Exception as e:
         print(f"    ❌ ОШИБКА сохранения прогресса: {e}")
         return
 
-    if results:
-        excel_data = []
-        for result in results:
-            if result['total_ads'] == 0:
-                excel_data.append({
-                    'brand': result['brand'],
-                    'model': result['model'],
-                    'start_year': result['start_year'],
-                    'finish_year': result['finish_year'],
-                    'search_url': result['search_url'],
-                    'status': result['error'] or 'Нет объявлений',
-                    'car_name': '',
-                    'year': '',
-                    'price': '',
-                    'currency': '',
-                    'url': '',
-                    'mileage': '',
-                    'vin': '',
-                    'image_url': ''
-                })
-            else:
-                for listing in result['listings']:
-                    excel_data.append({
-                        'brand': result['brand'],
-                        'model': result['model'],
-                        'start_year': result['start_year'],
-                        'finish_year': result['finish_year'],
-                        'search_url': result['search_url'],
-                        'status': 'Найдено',
-                        'car_name': listing.get('name', ''),
-                        'year': listing.get('year', ''),
-                        'price': listing.get('price', ''),
-                        'currency': listing.get('currency', 'RUB'),
-                        'url': listing.get('url', ''),
-                        'mileage': listing.get('mileage', ''),
-                        'vin': listing.get('vin', ''),
-                        'image_url': listing.get('image', '')
-                    })
-
-        results_file = os.path.join(SCRIPT_DIR, 'drom_scraped_data_progress.xlsx')
+    if listing_db is not None:
         try:
-            pd.DataFrame(excel_data).to_excel(results_file, index=False)
+            save_results_to_db()
         except Exception as e:
-            print(f"    ❌ ОШИБКА сохранения Excel: {e}")
-            return
+            print(f"    ❌ ОШИБКА записи в базу: {e}")
 
     print("    💾 Прогресс сохранен")
 
 
+def save_results_excel() -> Optional[str]:
+    """Собирает XLSX из всех результатов (один раз в конце прогона или по --materialize)"""
+    if not results:
+        return None
+
+    excel_data = [row for result in results for row in result_rows(result)]
+    results_file = os.path.join(SCRIPT_DIR, f'{OUTPUT_NAME}.xlsx')
+    try:
+        pd.DataFrame(excel_data).to_excel(results_file, index=False)
+    except Exception as e:
+        print(f"❌ ОШИБКА сохранения Excel: {e}")
+        return None
+
+    print(f"📗 Результаты сохранены в {OUTPUT_NAME}.xlsx ({len(excel_data):,} строк)")
+    return results_file
+
+
 def parse_json_ld_listings(html: str) -> List[Dict[str, Any]]:
-    """Парсит JSON-LD объявления из HTML"""
-    soup = BeautifulSoup(html, 'html.parser')
-    listings = []
+    """Парсит JSON-LD объявления из HTML (поиском блоков по строке, без DOM)"""
+    return parse_car_listings(html)
 
-    json_ld_scripts = soup.find_all('script', {'type': 'application/ld+json'})
 
-    for script in json_ld_scripts:
-        if not script.string:
-            continue
+# Общее число объявлений: в состоянии страницы или в заголовке "... 1 234 объявления"
+TOTAL_COUNT_STATE_KEYS = ('bullsCount', 'totalCount', 'bullsTotal')
+TITLE_RE = re.compile(r'<title[^>]*>(.*?)</title>', re.IGNORECASE | re.DOTALL)
+TOTAL_COUNT_TEXT_RE = re.compile(r'(\d[\d\s\xa0]*)\s+объявлени', re.IGNORECASE)
+
+
+def parse_total_count(html: str) -> Optional[int]:
+    """Извлекает общее число найденных объявлений со страницы выдачи"""
+    total = find_state_value(html, TOTAL_COUNT_STATE_KEYS, is_count)
+    if total is not None:
+        return total
+
+    title = TITLE_RE.search(html)
+    if title:
+        match = TOTAL_COUNT_TEXT_RE.search(title.group(1))
+        if match:
+            return int(re.sub(r'\D', '', match.group(1)))
+
+    return None
 
-        try:
-            data = json.loads(script.string)
-
-            if isinstance(data, dict) and data.get('@type') == 'Car':
-                # Извлекаем нужные поля
-                listing = {
-                    'name': data.get('name', ''),
-                    'brand': data.get('brand', {}).get('name', ''),
-                    'model': data.get('model', ''),
-                    'year': data.get('vehicleModelDate', ''),
-                    'price': data.get('offers', {}).get('price'),
-                    'currency': data.get('offers', {}).get('priceCurrency', 'RUB'),
-                    'url': data.get('offers', {}).get('url', ''),
-                    'image': data.get('image', {}).get('url', ''),
-                    'mileage': data.get('mileageFromOdometer', {}).get('value'),
-                    'vin': data.get('vehicleIdentificationNumber', ''),
-                }
-                listings.append(listing)
-        except:
-            pass
-
-    return listings
+
+def page_count_from_total(total: int) -> int:
+    """Сколько страниц выдачи занимают total объявлений"""
+    return max(1, math.ceil(total / LISTINGS_PER_PAGE))
 
 
 def fetch_brand_listings(brand: str, session, max_pages: int = 3) -> Dict[str, Any]:
     """Получает объявления для бренда"""
-    global request_count
-
-    url = f"https://auto.drom.ru/{brand}/"
+    url = f"{DROM_BASE_URL}/{brand}/"
     all_listings = []
     seen_urls = set()
 
     print(f"    🔍 Проверка бренда: {url}")
 
-    for page in range(1, max_pages + 1):
+    page = 1
+    throttled = 0
+    while page <= max_pages:
         try:
             if page > 1:
                 current_url = f"{url}page{page}/"
             else:
                 current_url = url
 
-            response = session.get(current_url, headers=get_headers(), timeout=45, stream=True)
-            request_count += 1
+            status, html = fetch_html(session, current_url)
 
-            if response.status_code == 429:
-                print(f"    ⚠️ Код 429, пауза 5 минут...")
-                time.sleep(300)
+            if status == 429:
+                # Повторяем ту же страницу после паузы хоста
+                throttled += 1
+                if throttled >= 5:
+                    break
                 continue
 
-            if response.status_code != 200:
-                print(f"    ⚠ Статус {response.status_code}")
+            if status != 200:
+                print(f"    ⚠ {status_error(status)}")
                 break
 
-            html = decode_response(response)
             page_listings = parse_json_ld_listings(html)
 
             if not page_listings:
@@ -359,8 +605,7 @@ def fetch_brand_listings(brand: str, session, max_pages: int = 3) -> Dict[str, A
 
             print(f"    Стр.{page}: найдено {len(page_listings)} (новых: {new_count})")
 
-            if page < max_pages and new_count > 0:
-                time.sleep(random.uniform(0.3, 0.5))
+            page += 1
 
         except Exception as e:
             print(f"    ⚠ Ошибка на странице {page}: {e}")
@@ -408,11 +653,31 @@ def filter_listings_by_model(listings: List[Dict], model: str, start_year: Any =
     return filtered
 
 
+def dead_model_error(brand: str, model: str) -> Optional[str]:
+    """Причина из реестра, если модель уже признана удаленной (запрос не нужен)"""
+    if dead_ledger is None:
+        return None
+    entry = dead_ledger.model_entry(brand, model)
+    return entry['reason'] if entry else None
+
+
+def mark_dead_model(brand: str, model: str, failure: Failure):
+    """404/410 на первой странице выдачи - модель удалена, записываем в реестр"""
+    if dead_ledger is not None and failure.is_permanent:
+        dead_ledger.mark_model(brand, model, failure)
+        print(f"    🪦 {brand}/{model} добавлена в реестр удаленных ({failure.reason})")
+
+
+def new_only(listings: List[Dict]) -> List[Dict]:
+    """В --incremental оставляет только объявления, которых не было в прошлых запусках"""
+    if known_listings is None:
+        return listings
+    return known_listings.filter_new(listings)
+
+
 def scrape_brand_model(brand: str, model: str, start_year: Any, finish_year: Any, session) -> Dict[str, Any]:
     """Скрапит данные для конкретной модели"""
-    global request_count
-
-    base_url = f"https://auto.drom.ru/{brand}/{model}/"
+    base_url = f"{DROM_BASE_URL}/{brand}/{model}/"
 
     if pd.notna(start_year) and pd.notna(finish_year):
         search_url = f"{base_url}?minyear={int(start_year)}&maxyear={int(finish_year)}"
@@ -431,12 +696,25 @@ def scrape_brand_model(brand: str, model: str, start_year: Any, finish_year: Any
     }
 
     page = 1
+    last_page: Optional[int] = None
+    last_page_size = 0
     consecutive_failures = 0
     seen_urls: Set[str] = set()
 
     print(f"    🔗 {search_url}")
 
+    dead_reason = dead_model_error(brand, model)
+    if dead_reason:
+        print(f"    🪦 Модель в реестре удаленных, пропускаем")
+        result['error'] = dead_reason
+        return result
+
     while True:  # Парсим пока есть объявления
+        # Число страниц известно из первой страницы - лишний запрос за пустой не нужен.
+        # Полная последняя страница - число могло устареть, проверяем следующую
+        if last_page is not None and page > last_page and last_page_size < LISTINGS_PER_PAGE:
+            break
+
         try:
             if page > 1:
                 if pd.notna(start_year) and pd.notna(finish_year):
@@ -446,21 +724,30 @@ def scrape_brand_model(brand: str, model: str, start_year: Any, finish_year: Any
             else:
                 current_url = search_url
 
-            response = session.get(current_url, headers=get_headers(), timeout=45, stream=True)
-            request_count += 1
+            status, html = fetch_html(session, current_url)
 
-            if response.status_code == 429:
-                print(f"    ⚠️ Код 429")
-                time.sleep(300)
+            if status == 429:
                 consecutive_failures += 1
+                if consecutive_failures >= 5:
+                    result['error'] = "HTTP 429"
+                    break
                 continue
 
-            if response.status_code != 200:
-                result['error'] = f"HTTP {response.status_code}"
+            if status != 200:
+                failure = failure_from_status(status)
+                if page == 1:
+                    mark_dead_model(brand, model, failure)
+                result['error'] = failure.reason
                 break
 
-            html = decode_response(response)
             page_listings = parse_json_ld_listings(html)
+            last_page_size = len(page_listings)
+
+            if page == 1:
+                total = parse_total_count(html)
+                if total is not None:
+                    last_page = page_count_from_total(total)
+                    print(f"    📄 Всего объявлений: {total} (страниц: {last_page})")
 
             if not page_listings:
                 print(f"    Стр.{page}: объявлений не найдено (конец)")
@@ -477,27 +764,30 @@ def scrape_brand_model(brand: str, model: str, start_year: Any, finish_year: Any
                 print(f"    Стр.{page}: все дубликаты (конец)")
                 break
 
-            result['listings'].extend(new_listings)
-            result['total_ads'] += len(new_listings)
+            # Выдача идет от новых к старым: страница из одних известных - дальше только старые
+            unseen_listings = new_only(new_listings)
+            if not unseen_listings:
+                print(f"    Стр.{page}: все объявления уже известны (конец)")
+                break
+
+            result['listings'].extend(unseen_listings)
+            result['total_ads'] += len(unseen_listings)
 
             duplicates = len(page_listings) - len(new_listings)
-            if duplicates > 0:
-                print(f"    Стр.{page}: {len(new_listings)} новых + {duplicates} дубликатов")
+            known = len(new_listings) - len(unseen_listings)
+            if duplicates > 0 or known > 0:
+                print(f"    Стр.{page}: {len(unseen_listings)} новых + {duplicates} дубликатов + {known} известных")
             else:
                 print(f"    Стр.{page}: {len(new_listings)} объявлений")
 
             # ОПТИМИЗАЦИЯ: если на первой странице меньше 20 объявлений, значит это последняя
-            if page == 1 and len(new_listings) < 20:
+            if page == 1 and len(new_listings) < LISTINGS_PER_PAGE:
                 print(f"    💡 На первой странице меньше 20 объявлений - это последняя страница")
                 break
 
             consecutive_failures = 0
             page += 1
 
-            # Минимальная пауза между страницами
-            page_delay = random.uniform(0.3, 0.5)
-            time.sleep(page_delay)
-
         except Exception as e:
             consecutive_failures += 1
             print(f"    ⚠ Ошибка на стр.{page}: {e}")
@@ -511,220 +801,671 @@ def scrape_brand_model(brand: str, model: str, start_year: Any, finish_year: Any
 
 # ========== ОСНОВНОЙ ЦИКЛ ==========
 
-session = create_session()
+def run_sync():
+    """Последовательный обход моделей через requests.Session"""
+    session = create_session()
 
-try:
-    current_brand = None
-    brand_models_list = []
-    skip_to_index = None
-    idx = start_index
-
-    while idx < len(df):
-        # Пропуск после обработки малого бренда
-        if skip_to_index is not None:
-            idx = skip_to_index
-            skip_to_index = None
-            current_brand = None
-            continue
+    try:
+        current_brand = None
+        brand_models_list = []
+        skip_to_index = None
+        idx = start_index
+
+        while idx < len(df):
+            # Пропуск после обработки малого бренда
+            if skip_to_index is not None:
+                idx = skip_to_index
+                skip_to_index = None
+                current_brand = None
+                continue
+
+            row = plan.rows[idx]
+
+            brand = row['brand']
+            model = row['model']
+            start_year = row.get('start_year', None)
+            finish_year = row.get('finish_year', None)
+
+            # Смена бренда
+            if brand != current_brand:
+                current_brand = brand
+
+                # Модели бренда - от текущей строки до конца его блока
+                brand_models_list = plan.brand_rows(idx)
+
+                print(f"\n{'=' * 70}")
+                print(f"🔍 НОВЫЙ БРЕНД: {brand.upper()}")
+                print(f"   Моделей для обработки: {len(brand_models_list)}")
+                print('=' * 70)
+
+                if brand not in brand_cache:
+                    brand_data = fetch_brand_listings(brand, session, max_pages=3)
+                    brand_cache[brand] = brand_data
 
-        row = df.iloc[idx]
+                    print(f"    📊 Найдено объявлений бренда: {brand_data['count']}")
+                    # Базовая пауза 0.5-1с; при --replay (без сети) adaptive_delay дает 0
+                    time.sleep(adaptive_delay(0))
+                else:
+                    brand_data = brand_cache[brand]
+                    print(f"    💾 Используем кеш: {brand_data['count']} объявлений")
 
-        brand = row['brand']
-        model = row['model']
-        start_year = row.get('start_year', None)
-        finish_year = row.get('finish_year', None)
+                # Бренд без объявлений
+                if brand_data['count'] == 0:
+                    print(f"    ⊗ У бренда {brand.upper()} нет объявлений")
+                    print(f"    ⊗ Пропускаем все {len(brand_models_list)} моделей...")
 
-        long_break_check(request_count, break_every=200, break_duration=30)
+                    for model_row in brand_models_list:
+                        results.append({
+                            'brand': brand,
+                            'model': model_row['model'],
+                            'start_year': model_row.get('start_year'),
+                            'finish_year': model_row.get('finish_year'),
+                            'search_url': f"{DROM_BASE_URL}/{brand}/{model_row['model']}/",
+                            'total_ads': 0,
+                            'listings': [],
+                            'error': f"Бренд {brand} - нет объявлений"
+                        })
+                        statistics['no_results'] += 1
 
-        # Смена бренда
-        if brand != current_brand:
-            current_brand = brand
+                    statistics['skipped_brands'] += 1
+                    last_brand_idx = idx + len(brand_models_list) - 1
+                    save_progress(last_brand_idx)
+
+                    skip_to_index = last_brand_idx + 1
+                    continue
+
+                # Малый бренд
+                elif brand_data['count'] <= SMALL_BRAND_THRESHOLD:
+                    print(f"    💡 МАЛЫЙ БРЕНД ({brand_data['count']} объявлений)")
+                    print(f"    💡 Используем фильтрацию из общего списка")
+
+                    for model_row in brand_models_list:
+                        model_name = model_row['model']
+                        model_start = model_row.get('start_year')
+                        model_finish = model_row.get('finish_year')
+
+                        print(f"\n    ➜ Модель: {model_name}")
+
+                        filtered = new_only(filter_listings_by_model(
+                            brand_data['listings'],
+                            model_name,
+                            model_start,
+                            model_finish
+                        ))
+
+                        if filtered:
+                            print(f"      ✓ Найдено: {len(filtered)} объявлений")
+                            results.append({
+                                'brand': brand,
+                                'model': model_name,
+                                'start_year': model_start,
+                                'finish_year': model_finish,
+                                'search_url': f"{DROM_BASE_URL}/{brand}/{model_name}/",
+                                'total_ads': len(filtered),
+                                'listings': filtered,
+                                'error': None
+                            })
+                            statistics['successful'] += 1
+                            statistics['total_ads_found'] += len(filtered)
+                        else:
+                            print(f"      ○ Не найдено")
+                            results.append({
+                                'brand': brand,
+                                'model': model_name,
+                                'start_year': model_start,
+                                'finish_year': model_finish,
+                                'search_url': f"{DROM_BASE_URL}/{brand}/{model_name}/",
+                                'total_ads': 0,
+                                'listings': [],
+                                'error': None
+                            })
+                            statistics['no_results'] += 1
+
+                    last_brand_idx = idx + len(brand_models_list) - 1
+                    save_progress(last_brand_idx)
+
+                    print(f"\n    ✅ Обработано {len(brand_models_list)} моделей бренда {brand.upper()}")
+
+                    skip_to_index = last_brand_idx + 1
+
+                    if skip_to_index < len(df):
+                        delay = adaptive_delay(request_count, base_min=0.5, base_max=1)
+                        print(f"    ⏳ Пауза перед новым брендом {delay:.1f}с...")
+                        time.sleep(delay)
+
+                    continue
 
-            brand_models_list = df[df['brand'] == brand].to_dict('records')
+                else:
+                    print(f"    ✓ БОЛЬШОЙ БРЕНД ({brand_data['count']} объявлений)")
+                    print(f"    ✓ Используем стандартную стратегию")
 
+            # Стандартная обработка
             print(f"\n{'=' * 70}")
-            print(f"🔍 НОВЫЙ БРЕНД: {brand.upper()}")
-            print(f"   Моделей для обработки: {len(brand_models_list)}")
+            print(f"[{idx + 1}/{len(df)}] {brand.upper()} {model.upper()} ({start_year}-{finish_year})")
+            print(f"📊 Выполнено запросов: {request_count}")
             print('=' * 70)
 
-            if brand not in brand_cache:
-                brand_data = fetch_brand_listings(brand, session, max_pages=3)
-                brand_cache[brand] = brand_data
+            result = scrape_brand_model(brand, model, start_year, finish_year, session)
+            results.append(result)
+
+            if result['error']:
+                statistics['failed'] += 1
+                statistics['errors'].append({
+                    'brand': brand,
+                    'model': model,
+                    'url': result['search_url'],
+                    'error': result['error']
+                })
+                print(f"    ✗ ОШИБКА: {result['error']}")
+            elif result['total_ads'] == 0:
+                statistics['no_results'] += 1
+                print(f"    ○ Объявлений не найдено")
+            else:
+                statistics['successful'] += 1
+                statistics['total_ads_found'] += result['total_ads']
+                print(f"    ✓ УСПЕШНО: {result['total_ads']} объявлений")
+
+            save_progress(idx)
+
+            if idx < len(df) - 1:
+                delay = adaptive_delay(request_count, base_min=0.5, base_max=1)
+                print(f"    ⏳ Адаптивная пауза {delay:.1f}с... (запросов: {request_count})")
+                time.sleep(delay)
+
+            idx += 1
+
+    except KeyboardInterrupt:
+        print("\n\n⚠ ПРЕРВАНО ПОЛЬЗОВАТЕЛЕМ")
+        if 'idx' in locals():
+            save_progress(idx)
+    except Exception as e:
+        print(f"\n\n⚠ КРИТИЧЕСКАЯ ОШИБКА: {e}")
+        import traceback
+        traceback.print_exc()
+        if 'idx' in locals():
+            save_progress(idx)
+        raise
+    finally:
+        session.close()
+
+    if 'idx' in locals():
+        save_progress(idx)
+    else:
+        save_progress(len(df) - 1)
+
+
+# ========== АСИНХРОННЫЙ РЕЖИМ ==========
+
+def decode_body(body: bytes, charset: Optional[str]) -> str:
+    """Декодирует тело ответа aiohttp (brotli/gzip aiohttp снимает сам)"""
+    try:
+        return body.decode(charset or 'windows-1251')
+    except (UnicodeDecodeError, LookupError):
+        return body.decode('windows-1251', errors='replace')
+
+
+async def fetch_page_async(session: aiohttp.ClientSession, url: str,
+                           controller: AIMDController) -> Tuple[Optional[int], str]:
+    """GET в рамках общего бюджета: rate_limiter по хосту + окно AIMD на все запросы"""
+    global request_count
 
-                print(f"    📊 Найдено объявлений бренда: {brand_data['count']}")
-                time.sleep(random.uniform(0.5, 1))
+    if response_store is not None and response_store.replay:
+        return response_store.get(url) or (None, '')
+
+    # Сначала место в окне, потом токен: токен, взятый в очереди за местом, сгорел бы
+    # впустую, а ждавшие задачи разом превысили бы бюджет хоста, когда окно откроется
+    await controller.acquire()
+    try:
+        await rate_limiter.wait_async(url)
+        async with session.get(url, headers=get_headers(), timeout=aiohttp.ClientTimeout(total=45)) as response:
+            request_count += 1
+
+            if response.status == 429:
+                cooldown = rate_limiter.penalize(url, response.headers.get('Retry-After'))
+                print(f"    ⚠️ Код 429, пауза хоста {cooldown:.0f}с...")
+                return response.status, ''
+
+            if response.status != 200:
+                if response_store is not None and response.status < 500:
+                    response_store.put(url, response.status)
+                return response.status, ''
+
+            rate_limiter.record_success(url)
+            html = decode_body(await response.read(), response.charset)
+            if response_store is not None:
+                response_store.put(url, response.status, html)
+            return response.status, html
+    finally:
+        await controller.release()
+
+
+async def fetch_brand_listings_async(brand: str, session: aiohttp.ClientSession, controller: AIMDController,
+                                     max_pages: int = 3) -> Dict[str, Any]:
+    """Асинхронная версия fetch_brand_listings"""
+    url = f"{DROM_BASE_URL}/{brand}/"
+    all_listings = []
+    seen_urls = set()
+
+    print(f"    🔍 [{brand}] Проверка бренда: {url}")
+
+    page = 1
+    throttled = 0
+    while page <= max_pages:
+        current_url = f"{url}page{page}/" if page > 1 else url
+
+        try:
+            status, html = await fetch_page_async(session, current_url, controller)
+        except Exception as e:
+            print(f"    ⚠ [{brand}] Ошибка на странице {page}: {e}")
+            break
+
+        if status == 429:
+            throttled += 1
+            if throttled >= 5:
+                break
+            continue
+
+        if status != 200:
+            print(f"    ⚠ [{brand}] {status_error(status)}")
+            break
+
+        page_listings = parse_json_ld_listings(html)
+
+        if not page_listings:
+            if page == 1:
+                print(f"    ⚠ [{brand}] Объявления не найдены")
+            break
+
+        new_count = 0
+        for listing in page_listings:
+            url_key = listing.get('url', '')
+            if url_key and url_key not in seen_urls:
+                seen_urls.add(url_key)
+                all_listings.append(listing)
+                new_count += 1
+
+        print(f"    [{brand}] Стр.{page}: найдено {len(page_listings)} (новых: {new_count})")
+        page += 1
+
+    return {
+        'count': len(all_listings),
+        'listings': all_listings
+    }
+
+
+async def fetch_search_page_async(session: aiohttp.ClientSession, url: str,
+                                  controller: AIMDController) -> Tuple[Optional[str], Optional[Failure]]:
+    """Загружает страницу выдачи с повторами при 429/сетевых ошибках. Возвращает (html, ошибка)"""
+    failures = 0
+    while True:
+        try:
+            status, html = await fetch_page_async(session, url, controller)
+        except Exception as e:
+            failures += 1
+            if failures >= 5:
+                return None, failure_from_exception(e)
+            await asyncio.sleep(random.uniform(10, 20))
+            continue
+
+        if status == 429:
+            failures += 1
+            if failures >= 5:
+                return None, failure_from_status(status)
+            continue
+
+        if status != 200:
+            return None, failure_from_status(status)
+
+        return html, None
+
+
+async def scrape_brand_model_async(brand: str, model: str, start_year: Any, finish_year: Any,
+                                   session: aiohttp.ClientSession, controller: AIMDController) -> Dict[str, Any]:
+    """
+    Асинхронная версия scrape_brand_model. Число страниц берется из общего
+    количества объявлений на первой странице, остальные страницы (до
+    MAX_PARALLEL_PAGES) грузятся параллельно. Если количество не найдено
+    (или режим --incremental), страниц больше предела или последняя страница
+    полная - дальше обход по одной странице до пустой.
+    """
+    base_url = f"{DROM_BASE_URL}/{brand}/{model}/"
+
+    if pd.notna(start_year) and pd.notna(finish_year):
+        year_query = f"?minyear={int(start_year)}&maxyear={int(finish_year)}"
+    else:
+        year_query = ''
+    search_url = f"{base_url}{year_query}"
+
+    def page_url(page: int) -> str:
+        return f"{base_url}page{page}/{year_query}" if page > 1 else search_url
+
+    result = {
+        'brand': brand,
+        'model': model,
+        'start_year': start_year,
+        'finish_year': finish_year,
+        'search_url': search_url,
+        'total_ads': 0,
+        'listings': [],
+        'error': None
+    }
+
+    seen_urls: Set[str] = set()
+    tag = f"[{brand}/{model}]"
+    last_page_size = 0
+
+    def add_page(page: int, html: str) -> bool:
+        """Добавляет новые объявления страницы; False - выдача закончилась"""
+        nonlocal last_page_size
+        page_listings = parse_json_ld_listings(html)
+        last_page_size = len(page_listings)
+
+        if not page_listings:
+            print(f"    {tag} Стр.{page}: объявлений не найдено (конец)")
+            return False
+
+        new_listings = []
+        for listing in page_listings:
+            url_key = listing.get('url', '')
+            if url_key and url_key not in seen_urls:
+                seen_urls.add(url_key)
+                new_listings.append(listing)
+
+        if not new_listings:
+            print(f"    {tag} Стр.{page}: все дубликаты (конец)")
+            return False
+
+        unseen_listings = new_only(new_listings)
+        if not unseen_listings:
+            print(f"    {tag} Стр.{page}: все объявления уже известны (конец)")
+            return False
+
+        result['listings'].extend(unseen_listings)
+        result['total_ads'] += len(unseen_listings)
+        print(f"    {tag} Стр.{page}: {len(unseen_listings)} новых из {len(page_listings)}")
+
+        # Если на первой странице меньше 20 объявлений, значит это последняя
+        return not (page == 1 and len(new_listings) < LISTINGS_PER_PAGE)
+
+    dead_reason = dead_model_error(brand, model)
+    if dead_reason:
+        print(f"    🪦 {tag} Модель в реестре удаленных, пропускаем")
+        result['error'] = dead_reason
+        return result
+
+    first_html, failure = await fetch_search_page_async(session, search_url, controller)
+    if failure:
+        mark_dead_model(brand, model, failure)
+        result['error'] = failure.reason
+        return result
+
+    if not add_page(1, first_html):
+        return result
+
+    total = parse_total_count(first_html)
+    page = 2
+
+    # В --incremental страницы грузим по одной: обычно хватает первых, параллельная
+    # загрузка всей выдачи потратила бы запросы на заведомо известные объявления
+    if total is not None and known_listings is None:
+        last_page = page_count_from_total(total)
+        parallel_last = min(last_page, MAX_PARALLEL_PAGES)
+        print(f"    📄 {tag} Всего объявлений: {total} (страниц: {last_page})")
+
+        # Остальные страницы параллельно, бюджет держат rate_limiter и окно AIMD
+        pages = await asyncio.gather(*[
+            fetch_search_page_async(session, page_url(page), controller)
+            for page in range(2, parallel_last + 1)
+        ])
+
+        # Разбираем строго по порядку, чтобы дедупликация совпадала с последовательным обходом
+        for page, (html, failure) in enumerate(pages, start=2):
+            if failure:
+                result['error'] = failure.reason
+                return result
+            if not add_page(page, html):
+                return result
+
+        # Выдача закончилась на неполной странице - дальше пусто
+        if parallel_last == last_page and last_page_size < LISTINGS_PER_PAGE:
+            return result
+
+        # Страниц больше предела или число устарело: дальше по одной до пустой
+        page = parallel_last + 1
+
+    while True:
+        html, failure = await fetch_search_page_async(session, page_url(page), controller)
+        if failure:
+            result['error'] = failure.reason
+            break
+        if not add_page(page, html):
+            break
+        page += 1
+
+    return result
+
+
+async def run_async():
+    """
+    Параллельный обход: несколько брендов и несколько моделей бренда одновременно.
+    Результаты фиксируются в порядке строк df, поэтому last_index в прогрессе
+    означает, что все строки до него обработаны.
+    """
+    # Непрерывные группы строк одного бренда
+    brand_groups = plan.brand_groups(start_index)
+
+    print(f"⚡ Асинхронный режим: брендов {len(brand_groups)}, "
+          f"одновременно брендов {ASYNC_BRANDS}, моделей на бренд {ASYNC_MODELS_PER_BRAND}, "
+          f"запросов до {ASYNC_MAX_REQUESTS}")
+
+    pending: Dict[int, Tuple[Dict[str, Any], str]] = {}
+    next_index = start_index
+
+    def commit(idx: int, result: Dict[str, Any], outcome: str):
+        """Копит результаты и переносит в results непрерывный префикс строк"""
+        nonlocal next_index
+
+        pending[idx] = (result, outcome)
+        if idx != next_index:
+            return
+
+        while next_index in pending:
+            ready_result, ready_outcome = pending.pop(next_index)
+            results.append(ready_result)
+
+            if ready_outcome == 'failed':
+                statistics['failed'] += 1
+                statistics['errors'].append({
+                    'brand': ready_result['brand'],
+                    'model': ready_result['model'],
+                    'url': ready_result['search_url'],
+                    'error': ready_result['error']
+                })
+            elif ready_outcome == 'successful':
+                statistics['successful'] += 1
+                statistics['total_ads_found'] += ready_result['total_ads']
             else:
-                brand_data = brand_cache[brand]
-                print(f"    💾 Используем кеш: {brand_data['count']} объявлений")
+                statistics['no_results'] += 1
+
+            next_index += 1
+
+        save_progress(next_index - 1)
+
+    controller = AIMDController(
+        initial=ASYNC_INITIAL_REQUESTS,
+        min_limit=1,
+        max_limit=ASYNC_MAX_REQUESTS,
+    )
+    brand_semaphore = asyncio.Semaphore(ASYNC_BRANDS)
+
+    async def process_brand(brand: str, group: List[Tuple[int, Dict[str, Any]]],
+                            session: aiohttp.ClientSession):
+        async with brand_semaphore:
+            print(f"\n🔍 НОВЫЙ БРЕНД: {brand.upper()} (моделей: {len(group)})")
+
+            if brand not in brand_cache:
+                brand_cache[brand] = await fetch_brand_listings_async(brand, session, controller, max_pages=3)
+                print(f"    📊 [{brand}] Найдено объявлений бренда: {brand_cache[brand]['count']}")
+            brand_data = brand_cache[brand]
 
             # Бренд без объявлений
             if brand_data['count'] == 0:
-                print(f"    ⊗ У бренда {brand.upper()} нет объявлений")
-                print(f"    ⊗ Пропускаем все {len(brand_models_list)} моделей...")
-
-                for model_row in brand_models_list:
-                    results.append({
+                print(f"    ⊗ [{brand}] Нет объявлений, пропускаем {len(group)} моделей")
+                statistics['skipped_brands'] += 1
+                for idx, model_row in group:
+                    commit(idx, {
                         'brand': brand,
                         'model': model_row['model'],
                         'start_year': model_row.get('start_year'),
                         'finish_year': model_row.get('finish_year'),
-                        'search_url': f"https://auto.drom.ru/{brand}/{model_row['model']}/",
+                        'search_url': f"{DROM_BASE_URL}/{brand}/{model_row['model']}/",
                         'total_ads': 0,
                         'listings': [],
                         'error': f"Бренд {brand} - нет объявлений"
-                    })
-                    statistics['no_results'] += 1
-
-                statistics['skipped_brands'] += 1
-                last_brand_idx = idx + len(brand_models_list) - 1
-                save_progress(last_brand_idx)
-
-                skip_to_index = last_brand_idx + 1
-                continue
-
-            # Малый бренд
-            elif brand_data['count'] <= SMALL_BRAND_THRESHOLD:
-                print(f"    💡 МАЛЫЙ БРЕНД ({brand_data['count']} объявлений)")
-                print(f"    💡 Используем фильтрацию из общего списка")
-
-                for model_row in brand_models_list:
-                    model_name = model_row['model']
-                    model_start = model_row.get('start_year')
-                    model_finish = model_row.get('finish_year')
-
-                    print(f"\n    ➜ Модель: {model_name}")
-
-                    filtered = filter_listings_by_model(
+                    }, 'no_results')
+                return
+
+            # Малый бренд: фильтруем общий список без запросов по моделям
+            if brand_data['count'] <= SMALL_BRAND_THRESHOLD:
+                print(f"    💡 [{brand}] МАЛЫЙ БРЕНД ({brand_data['count']} объявлений), фильтруем общий список")
+                for idx, model_row in group:
+                    filtered = new_only(filter_listings_by_model(
                         brand_data['listings'],
-                        model_name,
-                        model_start,
-                        model_finish
+                        model_row['model'],
+                        model_row.get('start_year'),
+                        model_row.get('finish_year')
+                    ))
+                    commit(idx, {
+                        'brand': brand,
+                        'model': model_row['model'],
+                        'start_year': model_row.get('start_year'),
+                        'finish_year': model_row.get('finish_year'),
+                        'search_url': f"{DROM_BASE_URL}/{brand}/{model_row['model']}/",
+                        'total_ads': len(filtered),
+                        'listings': filtered,
+                        'error': None
+                    }, 'successful' if filtered else 'no_results')
+                return
+
+            model_semaphore = asyncio.Semaphore(ASYNC_MODELS_PER_BRAND)
+
+            async def process_model(idx: int, model_row: Dict[str, Any]):
+                async with model_semaphore:
+                    result = await scrape_brand_model_async(
+                        brand, model_row['model'], model_row.get('start_year'), model_row.get('finish_year'),
+                        session, controller
                     )
 
-                    if filtered:
-                        print(f"      ✓ Найдено: {len(filtered)} объявлений")
-                        results.append({
-                            'brand': brand,
-                            'model': model_name,
-                            'start_year': model_start,
-                            'finish_year': model_finish,
-                            'search_url': f"https://auto.drom.ru/{brand}/{model_name}/",
-                            'total_ads': len(filtered),
-                            'listings': filtered,
-                            'error': None
-                        })
-                        statistics['successful'] += 1
-                        statistics['total_ads_found'] += len(filtered)
-                    else:
-                        print(f"      ○ Не найдено")
-                        results.append({
-                            'brand': brand,
-                            'model': model_name,
-                            'start_year': model_start,
-                            'finish_year': model_finish,
-                            'search_url': f"https://auto.drom.ru/{brand}/{model_name}/",
-                            'total_ads': 0,
-                            'listings': [],
-                            'error': None
-                        })
-                        statistics['no_results'] += 1
-
-                last_brand_idx = idx + len(brand_models_list) - 1
-                save_progress(last_brand_idx)
+                if result['error']:
+                    print(f"    ✗ [{idx + 1}/{len(df)}] {brand} {model_row['model']}: {result['error']}")
+                    commit(idx, result, 'failed')
+                elif result['total_ads'] == 0:
+                    print(f"    ○ [{idx + 1}/{len(df)}] {brand} {model_row['model']}: объявлений не найдено")
+                    commit(idx, result, 'no_results')
+                else:
+                    print(f"    ✓ [{idx + 1}/{len(df)}] {brand} {model_row['model']}: {result['total_ads']} объявлений")
+                    commit(idx, result, 'successful')
 
-                print(f"\n    ✅ Обработано {len(brand_models_list)} моделей бренда {brand.upper()}")
+            await asyncio.gather(*[process_model(idx, model_row) for idx, model_row in group])
 
-                skip_to_index = last_brand_idx + 1
+    connector = aiohttp.TCPConnector(limit=ASYNC_MAX_REQUESTS, limit_per_host=ASYNC_MAX_REQUESTS)
 
-                if skip_to_index < len(df):
-                    delay = adaptive_delay(request_count, base_min=0.5, base_max=1)
-                    print(f"    ⏳ Пауза перед новым брендом {delay:.1f}с...")
-                    time.sleep(delay)
+    try:
+        async with aiohttp.ClientSession(connector=connector, trace_configs=[controller.trace_config()]) as session:
+            await asyncio.gather(*[process_brand(brand, group, session) for brand, group in brand_groups])
+    finally:
+        save_progress(next_index - 1)
+
+
+def print_summary():
+    """Выводит итоговую статистику"""
+    print(f"\n{'=' * 70}")
+    print("ИТОГОВАЯ СТАТИСТИКА")
+    print('=' * 70)
+    print(f"Всего обработано строк:    {statistics['total_rows']}")
+    print(f"Всего запросов:            {request_count}")
+    print(f"✓ Успешно найдены:         {statistics['successful']}")
+    print(f"  Всего объявлений:        {statistics['total_ads_found']}")
+    print(f"○ Без результатов:         {statistics['no_results']}")
+    print(f"⊗ Пропущено брендов:       {statistics['skipped_brands']}")
+    print(f"✗ Ошибки:                  {statistics['failed']}")
+
+    if statistics['errors']:
+        print(f"\n{'-' * 70}")
+        print("СПИСОК ОШИБОК:")
+        print('-' * 70)
+        for error in statistics['errors'][:10]:
+            print(f"  • {error['brand']} {error['model']}")
+            print(f"    {error['url']}")
+            print(f"    Ошибка: {error['error']}")
+        if len(statistics['errors']) > 10:
+            print(f"  ... и еще {len(statistics['errors']) - 10} ошибок")
+
+    print(f"\n{'=' * 70}")
+    print("Файлы сохранены:")
+    print(f"  • {OUTPUT_NAME}.json")
+    print(f"  • {OUTPUT_NAME}.xlsx")
+    print('=' * 70)
+
+
+def main():
+    global response_store, known_listings, dead_ledger, listing_db, OUTPUT_NAME, DROM_BASE_URL
+
+    parser = argparse.ArgumentParser(description='Парсер объявлений auto.drom.ru')
+    parser.add_argument('--async', dest='use_async', action='store_true',
+                        help='обходить бренды и модели параллельно через aiohttp')
+    parser.add_argument('--incremental', action='store_true',
+                        help='собирать только объявления, которых нет в результатах прошлых запусков')
+    parser.add_argument('--base-url', default=DROM_BASE_URL,
+                        help=f'адрес сайта (по умолчанию {DROM_BASE_URL})')
+    parser.add_argument('--materialize', action='store_true',
+                        help='собрать XLSX из сохраненного прогресса и выйти (можно во время обхода)')
+    add_store_arguments(parser)
+    add_db_arguments(parser)
+    args = parser.parse_args()
+
+    DROM_BASE_URL = args.base_url.rstrip('/')
+    response_store = store_from_args(args, SCRIPT_DIR)
+    dead_ledger = load_ledger(SCRIPT_DIR)
+    listing_db = db_from_args(args, SCRIPT_DIR)
+
+    if args.incremental:
+        OUTPUT_NAME = incremental_output_name()
+
+        print(f"\n📚 ИНКРЕМЕНТАЛЬНЫЙ РЕЖИМ: загружаем известные объявления")
+        if listing_db is not None:
+            # В базе все прошлые запуски (XLSX старых запусков переносит listing_db.py import)
+            known_listings = listing_db.known_listings()
+        else:
+            known_listings = load_known_listings(SCRIPT_DIR, exclude=[os.path.join(SCRIPT_DIR, f'{OUTPUT_NAME}.xlsx')])
+        print(f"   Известно объявлений: {len(known_listings):,}")
+        print(f"   Новые объявления пишем в {OUTPUT_NAME}.xlsx")
+
+    if args.materialize:
+        progress_data = load_progress()
+        if progress_data:
+            results.extend(progress_data['results'])
+            save_results_excel()
+        return
 
-                continue
+    init_state()
 
-            else:
-                print(f"    ✓ БОЛЬШОЙ БРЕНД ({brand_data['count']} объявлений)")
-                print(f"    ✓ Используем стандартную стратегию")
-
-        # Стандартная обработка
-        print(f"\n{'=' * 70}")
-        print(f"[{idx + 1}/{len(df)}] {brand.upper()} {model.upper()} ({start_year}-{finish_year})")
-        print(f"📊 Выполнено запросов: {request_count}")
-        print('=' * 70)
-
-        result = scrape_brand_model(brand, model, start_year, finish_year, session)
-        results.append(result)
-
-        if result['error']:
-            statistics['failed'] += 1
-            statistics['errors'].append({
-                'brand': brand,
-                'model': model,
-                'url': result['search_url'],
-                'error': result['error']
-            })
-            print(f"    ✗ ОШИБКА: {result['error']}")
-        elif result['total_ads'] == 0:
-            statistics['no_results'] += 1
-            print(f"    ○ Объявлений не найдено")
+    try:
+        if args.use_async:
+            asyncio.run(run_async())
         else:
-            statistics['successful'] += 1
-            statistics['total_ads_found'] += result['total_ads']
-            print(f"    ✓ УСПЕШНО: {result['total_ads']} объявлений")
-
-        save_progress(idx)
+            run_sync()
+    finally:
+        # Прогресс уже в журналах; таблица целиком пишется один раз
+        save_results_excel()
+        results_journal.close()
+        brands_journal.close()
+        errors_journal.close()
+        if listing_db is not None:
+            listing_db.close()
 
-        if idx < len(df) - 1:
-            delay = adaptive_delay(request_count, base_min=0.5, base_max=1)
-            print(f"    ⏳ Адаптивная пауза {delay:.1f}с... (запросов: {request_count})")
-            time.sleep(delay)
+    print_summary()
 
-        idx += 1
 
-except KeyboardInterrupt:
-    print("\n\n⚠ ПРЕРВАНО ПОЛЬЗОВАТЕЛЕМ")
-    if 'idx' in locals():
-        save_progress(idx)
-except Exception as e:
-    print(f"\n\n⚠ КРИТИЧЕСКАЯ ОШИБКА: {e}")
-    import traceback
-    traceback.print_exc()
-    if 'idx' in locals():
-        save_progress(idx)
-    raise
-finally:
-    session.close()
-
-if 'idx' in locals():
-    save_progress(idx)
-else:
-    save_progress(len(df) - 1)
-
-print(f"\n{'=' * 70}")
-print("ИТОГОВАЯ СТАТИСТИКА")
-print('=' * 70)
-print(f"Всего обработано строк:    {statistics['total_rows']}")
-print(f"Всего запросов:            {request_count}")
-print(f"✓ Успешно найдены:         {statistics['successful']}")
-print(f"  Всего объявлений:        {statistics['total_ads_found']}")
-print(f"○ Без результатов:         {statistics['no_results']}")
-print(f"⊗ Пропущено брендов:       {statistics['skipped_brands']}")
-print(f"✗ Ошибки:                  {statistics['failed']}")
-
-if statistics['errors']:
-    print(f"\n{'-' * 70}")
-    print("СПИСОК ОШИБОК:")
-    print('-' * 70)
-    for error in statistics['errors'][:10]:
-        print(f"  • {error['brand']} {error['model']}")
-        print(f"    {error['url']}")
-        print(f"    Ошибка: {error['error']}")
-    if len(statistics['errors']) > 10:
-        print(f"  ... и еще {len(statistics['errors']) - 10} ошибок")
-
-print(f"\n{'=' * 70}")
-print("Файлы сохранены:")
-print("  • drom_scraped_data_progress.json")
-print("  • drom_scraped_data_progress.xlsx")
-print('=' * 70)
\ No newline at end of file
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,754 @@
+"""
+РАЗБОР ДЕТАЛЬНОЙ СТРАНИЦЫ ОБЪЯВЛЕНИЯ
+- Общий для full_parser_with_retry и parse_skipped_models: HTML -> плоский словарь для Excel
+- Несколько движков разбора с одинаковым результатом (флаг --parser):
+  bs4        - BeautifulSoup + html.parser (исходный вариант, самый медленный)
+  lxml       - lxml.html + скомпилированные XPath (по умолчанию)
+  selectolax - Lexbor через selectolax, если библиотека установлена
+- Все движки повторяют семантику bs4: get_text(strip=True) склеивает
+  обрезанные текстовые узлы, комментарии и <script>/<style> не входят в текст
+- Нужны только 4 блока страницы. В режиме targeted (по умолчанию) быстрый
+  просмотр строки вырезает эти блоки, и дерево строится только из них;
+  если блок не удалось вырезать, разбирается вся страница
+- В режиме state (только по флагу --extract state) разделы сначала берутся
+  из JSON-состояния страницы (embedded_state); DOM разбирается, только если
+  какого-то раздела в состоянии нет. Ключи состояния не сверены с живыми
+  страницами drom, поэтому промахи считаются и пишутся в лог
+- Разбор может идти в пуле процессов (--parse-workers, по умолчанию
+  выключен), чтобы event loop не простаивал на CPU и загрузка страниц шла
+  параллельно с разбором
+"""
+
+import asyncio
+import bisect
+import multiprocessing
+import re
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from bs4 import BeautifulSoup
+import lxml.html
+from lxml import etree
+
+from embedded_state import find_state_value, is_count
+
+try:
+    from selectolax.lexbor import LexborHTMLParser
+except ImportError:
+    LexborHTMLParser = None
+
+PARSER_BACKENDS = ('bs4', 'lxml', 'selectolax')
+DEFAULT_PARSER_BACKEND = 'lxml'
+
+EXTRACT_MODES = ('state', 'targeted', 'full')
+DEFAULT_EXTRACT_MODE = 'targeted'
+
+# Обход упирается в сеть, а не в CPU: по умолчанию разбираем в основном процессе
+DEFAULT_PARSE_WORKERS = 0
+
+# Регулярки, общие для всех движков
+VIN_ITEM_CLASS_RE = re.compile(r'css-13qo6o5|css-z05wok')
+BULLETIN_RE = re.compile(r'Объявление\s+(\d+)\s+от\s+([\d.]+)')
+VIEWS_RE = re.compile(r'(\d+)')
+SPACES_RE = re.compile(r'\s+')
+EMPTY_LINES_RE = re.compile(r'\n\s*\n')
+
+# Содержимое этих тегов bs4 не считает текстом
+NON_TEXT_TAGS = {'script', 'style', 'template'}
+
+# Блоки страницы, которые читают парсеры: (тег, атрибут, значение, обязательный класс)
+DETAIL_REGIONS = [
+    ('table', 'data-ftid', 'bulletin-specifications', 'i2nf564'),
+    ('div', 'data-ga-stats-name', 'gibdd_report', None),
+    ('div', 'data-ftid', 'bulletin-description', None),
+    ('div', 'data-ftid', 'bull-page_bull-views', None),
+]
+
+# Куски, где разметка - не теги: скрипты, стили, комментарии (начало и парный конец)
+OPAQUE_START_RE = re.compile(r'<(script|style)\b|<!--', re.I)
+OPAQUE_END_RES = {
+    'script': re.compile(r'</script\s*>', re.I),
+    'style': re.compile(r'</style\s*>', re.I),
+}
+CLASS_ATTR_RE = re.compile(r'\bclass\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.I)
+
+# Четыре части страницы, из которых собирается результат
+Sections = Tuple[Dict[str, str], Dict[str, Any], Dict[str, str], Dict[str, str]]
+
+
+def empty_vin_report() -> Dict[str, Any]:
+    return {'vin_full': None, 'report_items': []}
+
+
+def empty_description() -> Dict[str, str]:
+    return {'full_description': '', 'exchange_possible': '', 'city_from_description': ''}
+
+
+def empty_bulletin_info() -> Dict[str, str]:
+    return {'bulletin_id': '', 'bulletin_date': '', 'views_count': ''}
+
+
+def clean_description(text: str) -> str:
+    """Убирает пустые строки в описании"""
+    return EMPTY_LINES_RE.sub('\n', text).strip()
+
+
+def fill_bulletin_info(bulletin_info: Dict[str, str], bulletin_text: Optional[str], views_text: Optional[str]):
+    """Номер, дата и просмотры из текста блока bull-page_bull-views"""
+    if bulletin_text is not None:
+        match = BULLETIN_RE.search(bulletin_text)
+        if match:
+            bulletin_info['bulletin_id'] = match.group(1)
+            bulletin_info['bulletin_date'] = match.group(2)
+
+    if views_text is not None:
+        views_match = VIEWS_RE.search(views_text)
+        if views_match:
+            bulletin_info['views_count'] = views_match.group(1)
+
+
+# ==================== Вырезание блоков ====================
+
+def _opaque_spans(html: str) -> List[Tuple[int, int]]:
+    """
+    Границы скриптов, стилей и комментариев. Конец ищется отдельным поиском:
+    ленивое .*? по скрипту в десятки КБ на порядок медленнее
+    """
+    spans = []
+    match = OPAQUE_START_RE.search(html)
+    while match:
+        tag = match.group(1)
+        if tag is None:
+            end = html.find('-->', match.end())
+            end = len(html) if end == -1 else end + 3
+        else:
+            end_match = OPAQUE_END_RES[tag.lower()].search(html, match.end())
+            end = len(html) if end_match is None else end_match.end()
+        spans.append((match.start(), end))
+        match = OPAQUE_START_RE.search(html, end)
+    return spans
+
+
+def _inside(spans: List[Tuple[int, int]], starts: List[int], pos: int) -> bool:
+    """pos попадает в один из отсортированных непересекающихся кусков spans"""
+    i = bisect.bisect_right(starts, pos) - 1
+    return i >= 0 and pos < spans[i][1]
+
+
+def _region_bounds(html: str, opaque: List[Tuple[int, int]], tag: str, attr: str,
+                   value: str, required_class: Optional[str]) -> Optional[Tuple[int, Optional[int]]]:
+    """
+    Границы первого элемента <tag attr="value"> вместе с закрывающим тегом.
+    None - такого элемента нет; (start, None) - элемент не закрыт.
+    """
+    open_re = re.compile(
+        rf'<{tag}\b[^>]*?\b{attr}\s*=\s*["\']?{re.escape(value)}["\'\s/>]', re.I)
+    tags_re = re.compile(rf'<(/?){tag}\b[^>]*>', re.I)
+    starts = [span[0] for span in opaque]
+
+    pos = html.find(value)
+    while pos != -1:
+        start = html.rfind('<', 0, pos)
+        match = open_re.match(html, start) if start != -1 else None
+        if match and not _inside(opaque, starts, start):
+            class_match = CLASS_ATTR_RE.search(html, start, html.find('>', start))
+            classes = ''.join(class_match.groups('')).split() if class_match else []
+            if required_class is None or required_class in classes:
+                # Ищем парный закрывающий тег с учетом вложенных
+                depth = 0
+                for tag_match in tags_re.finditer(html, start):
+                    if _inside(opaque, starts, tag_match.start()):
+                        continue
+                    depth += -1 if tag_match.group(1) else 1
+                    if depth == 0:
+                        return start, tag_match.end()
+                return start, None
+        pos = html.find(value, pos + len(value))
+
+    return None
+
+
+def slice_detail_regions(html: str) -> Optional[str]:
+    """
+    Вырезает из страницы только блоки DETAIL_REGIONS и собирает из них маленький документ.
+    None - какой-то блок не удалось вырезать корректно, нужна вся страница.
+    """
+    opaque = _opaque_spans(html)
+
+    regions = []
+    for tag, attr, value, required_class in DETAIL_REGIONS:
+        bounds = _region_bounds(html, opaque, tag, attr, value, required_class)
+        if bounds is None:
+            continue
+        if bounds[1] is None:
+            # Блок есть, но не закрыт - дерево по такой разметке строим из всей страницы
+            return None
+        regions.append(bounds)
+
+    # Блоки в порядке документа; вложенный блок уже входит во внешний
+    parts = []
+    covered_until = -1
+    for start, end in sorted(regions):
+        if start >= covered_until:
+            parts.append(html[start:end])
+            covered_until = end
+
+    return '<html><body>' + ''.join(parts) + '</body></html>'
+
+
+# ==================== bs4 ====================
+
+def parse_specifications_table(soup: BeautifulSoup) -> Dict[str, str]:
+    """Парсит таблицу характеристик"""
+    specs = {}
+    table = soup.find('table', {'class': 'i2nf564', 'data-ftid': 'bulletin-specifications'})
+
+    if not table:
+        return specs
+
+    rows = table.find_all('tr')
+    for row in rows:
+        property_cell = row.find('th', {'data-ftid': 'property'})
+        value_cell = row.find('td', {'data-ftid': 'value'})
+
+        if property_cell and value_cell:
+            property_name = property_cell.get_text(strip=True)
+
+            # Удаляем кнопку "налог"
+            button = value_cell.find('button')
+            if button:
+                button.decompose()
+
+            # Заменяем ссылки на текст
+            for link in value_cell.find_all('a'):
+                link.replace_with(link.get_text(strip=True))
+
+            value_text = value_cell.get_text(strip=True)
+            value_text = SPACES_RE.sub(' ', value_text)
+
+            specs[property_name] = value_text
+
+    return specs
+
+
+def parse_vin_report(soup: BeautifulSoup) -> Dict[str, Any]:
+    """Парсит блок отчета по VIN"""
+    vin_info = empty_vin_report()
+
+    vin_block = soup.find('div', {'data-ga-stats-name': 'gibdd_report'})
+
+    if not vin_block:
+        return vin_info
+
+    # VIN номер
+    vin_div = vin_block.find('div', class_='css-o8yr01')
+    if vin_div:
+        vin_info['vin_full'] = vin_div.get_text(strip=True)
+
+    # Пункты отчета
+    report_items_divs = vin_block.find_all('div', class_=VIN_ITEM_CLASS_RE)
+
+    for item_div in report_items_divs:
+        button = item_div.find('button')
+        if button:
+            text = button.get_text(strip=True)
+        else:
+            text = item_div.get_text(strip=True)
+
+        if text and len(text) > 3:
+            vin_info['report_items'].append(text)
+
+    return vin_info
+
+
+def parse_description(soup: BeautifulSoup) -> Dict[str, str]:
+    """Парсит описание объявления"""
+    description_data = empty_description()
+
+    desc_block = soup.find('div', {'data-ftid': 'bulletin-description'})
+
+    if not desc_block:
+        return description_data
+
+    # Полное описание
+    full_desc_div = desc_block.find('div', {'data-ftid': 'info-full'})
+    if full_desc_div:
+        value_span = full_desc_div.find('span', {'data-ftid': 'value'})
+        if value_span:
+            for br in value_span.find_all('br'):
+                br.replace_with('\n')
+
+            description_data['full_description'] = clean_description(value_span.get_text(strip=False))
+
+    # Обмен
+    trade_div = desc_block.find('div', {'data-ftid': 'trade'})
+    if trade_div:
+        value_span = trade_div.find('span', {'data-ftid': 'value'})
+        if value_span:
+            description_data['exchange_possible'] = value_span.get_text(strip=True)
+
+    # Город
+    city_div = desc_block.find('div', {'data-ftid': 'city'})
+    if city_div:
+        value_span = city_div.find('span', {'data-ftid': 'value'})
+        if value_span:
+            description_data['city_from_description'] = value_span.get_text(strip=True)
+
+    return description_data
+
+
+def parse_bulletin_info(soup: BeautifulSoup) -> Dict[str, str]:
+    """Парсит информацию об объявлении"""
+    bulletin_info = empty_bulletin_info()
+
+    info_block = soup.find('div', {'data-ftid': 'bull-page_bull-views'})
+
+    if not info_block:
+        return bulletin_info
+
+    bulletin_text_div = info_block.find('div', class_='css-pxeubi')
+    views_div = info_block.find('div', class_='css-14wh0pm')
+    fill_bulletin_info(
+        bulletin_info,
+        bulletin_text_div.get_text(strip=True) if bulletin_text_div else None,
+        views_div.get_text(strip=True) if views_div else None,
+    )
+
+    return bulletin_info
+
+
+def parse_sections_bs4(html: str) -> Sections:
+    soup = BeautifulSoup(html, 'html.parser')
+    return (parse_specifications_table(soup), parse_vin_report(soup),
+            parse_description(soup), parse_bulletin_info(soup))
+
+
+# ==================== lxml ====================
+
+def _has_class(name: str) -> str:
+    """XPath-условие "есть класс name" (как class_=name в bs4)"""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+XP_SPECS_TABLE = etree.XPath(f"//table[@data-ftid='bulletin-specifications' and {_has_class('i2nf564')}]")
+XP_ROWS = etree.XPath(".//tr")
+XP_PROPERTY = etree.XPath(".//th[@data-ftid='property']")
+XP_VALUE_TD = etree.XPath(".//td[@data-ftid='value']")
+XP_BUTTON = etree.XPath(".//button")
+XP_VIN_BLOCK = etree.XPath("//div[@data-ga-stats-name='gibdd_report']")
+XP_VIN = etree.XPath(f".//div[{_has_class('css-o8yr01')}]")
+XP_VIN_ITEMS = etree.XPath(".//div[contains(@class, 'css-13qo6o5') or contains(@class, 'css-z05wok')]")
+XP_DESC_BLOCK = etree.XPath("//div[@data-ftid='bulletin-description']")
+XP_INFO_FULL = etree.XPath(".//div[@data-ftid='info-full']")
+XP_TRADE = etree.XPath(".//div[@data-ftid='trade']")
+XP_CITY = etree.XPath(".//div[@data-ftid='city']")
+XP_VALUE_SPAN = etree.XPath(".//span[@data-ftid='value']")
+XP_INFO_BLOCK = etree.XPath("//div[@data-ftid='bull-page_bull-views']")
+XP_BULLETIN_TEXT = etree.XPath(f".//div[{_has_class('css-pxeubi')}]")
+XP_VIEWS = etree.XPath(f".//div[{_has_class('css-14wh0pm')}]")
+
+
+def _first(xpath: etree.XPath, element) -> Optional[Any]:
+    found = xpath(element)
+    return found[0] if found else None
+
+
+def _lxml_strings(element, skip=None, br: Optional[str] = None) -> Iterator[str]:
+    """
+    Текстовые узлы поддерева в порядке документа (как .strings в bs4).
+    skip - элемент, который не входит в текст; br - чем заменять <br>.
+    """
+    if element.text and element.tag not in NON_TEXT_TAGS:
+        yield element.text
+    for child in element:
+        # У комментариев tag - функция, текст комментария пропускаем, хвост оставляем
+        if isinstance(child.tag, str) and child is not skip:
+            if child.tag == 'br' and br is not None:
+                yield br
+            else:
+                yield from _lxml_strings(child, skip, br)
+        if child.tail:
+            yield child.tail
+
+
+def _lxml_text(element, skip=None) -> str:
+    """Аналог get_text(strip=True)"""
+    return ''.join(part for part in (s.strip() for s in _lxml_strings(element, skip)) if part)
+
+
+def parse_sections_lxml(html: str) -> Sections:
+    root = lxml.html.document_fromstring(html)
+
+    specs = {}
+    table = _first(XP_SPECS_TABLE, root)
+    if table is not None:
+        for row in XP_ROWS(table):
+            property_cell = _first(XP_PROPERTY, row)
+            value_cell = _first(XP_VALUE_TD, row)
+            if property_cell is not None and value_cell is not None:
+                # Первая кнопка ("налог") в значение не входит
+                value_text = _lxml_text(value_cell, skip=_first(XP_BUTTON, value_cell))
+                specs[_lxml_text(property_cell)] = SPACES_RE.sub(' ', value_text)
+
+    vin_report = empty_vin_report()
+    vin_block = _first(XP_VIN_BLOCK, root)
+    if vin_block is not None:
+        vin_div = _first(XP_VIN, vin_block)
+        if vin_div is not None:
+            vin_report['vin_full'] = _lxml_text(vin_div)
+
+        for item_div in XP_VIN_ITEMS(vin_block):
+            button = _first(XP_BUTTON, item_div)
+            text = _lxml_text(button if button is not None else item_div)
+            if text and len(text) > 3:
+                vin_report['report_items'].append(text)
+
+    description = empty_description()
+    desc_block = _first(XP_DESC_BLOCK, root)
+    if desc_block is not None:
+        for key, xpath in (('full_description', XP_INFO_FULL),
+                           ('exchange_possible', XP_TRADE),
+                           ('city_from_description', XP_CITY)):
+            div = _first(xpath, desc_block)
+            value_span = _first(XP_VALUE_SPAN, div) if div is not None else None
+            if value_span is None:
+                continue
+            if key == 'full_description':
+                description[key] = clean_description(''.join(_lxml_strings(value_span, br='\n')))
+            else:
+                description[key] = _lxml_text(value_span)
+
+    bulletin_info = empty_bulletin_info()
+    info_block = _first(XP_INFO_BLOCK, root)
+    if info_block is not None:
+        bulletin_text_div = _first(XP_BULLETIN_TEXT, info_block)
+        views_div = _first(XP_VIEWS, info_block)
+        fill_bulletin_info(
+            bulletin_info,
+            _lxml_text(bulletin_text_div) if bulletin_text_div is not None else None,
+            _lxml_text(views_div) if views_div is not None else None,
+        )
+
+    return specs, vin_report, description, bulletin_info
+
+
+# ==================== selectolax ====================
+
+def _lexbor_strings(node, skip=None, br: Optional[str] = None) -> Iterator[str]:
+    """Текстовые узлы поддерева в порядке документа; skip и br - как в _lxml_strings"""
+    child = node.child
+    while child is not None:
+        tag = child.tag
+        if tag == '-text':
+            yield child.text_content
+        elif tag == 'br' and br is not None:
+            yield br
+        elif tag[0] != '-' and tag not in NON_TEXT_TAGS and (skip is None or child.mem_id != skip.mem_id):
+            yield from _lexbor_strings(child, skip, br)
+        child = child.next
+
+
+def _lexbor_text(node, skip=None) -> str:
+    return ''.join(part for part in (s.strip() for s in _lexbor_strings(node, skip)) if part)
+
+
+def parse_sections_selectolax(html: str) -> Sections:
+    tree = LexborHTMLParser(html)
+
+    specs = {}
+    table = tree.css_first('table.i2nf564[data-ftid="bulletin-specifications"]')
+    if table is not None:
+        for row in table.css('tr'):
+            property_cell = row.css_first('th[data-ftid="property"]')
+            value_cell = row.css_first('td[data-ftid="value"]')
+            if property_cell is not None and value_cell is not None:
+                value_text = _lexbor_text(value_cell, skip=value_cell.css_first('button'))
+                specs[_lexbor_text(property_cell)] = SPACES_RE.sub(' ', value_text)
+
+    vin_report = empty_vin_report()
+    vin_block = tree.css_first('div[data-ga-stats-name="gibdd_report"]')
+    if vin_block is not None:
+        vin_div = vin_block.css_first('div.css-o8yr01')
+        if vin_div is not None:
+            vin_report['vin_full'] = _lexbor_text(vin_div)
+
+        for item_div in vin_block.css('div[class*="css-13qo6o5"], div[class*="css-z05wok"]'):
+            button = item_div.css_first('button')
+            text = _lexbor_text(button if button is not None else item_div)
+            if text and len(text) > 3:
+                vin_report['report_items'].append(text)
+
+    description = empty_description()
+    desc_block = tree.css_first('div[data-ftid="bulletin-description"]')
+    if desc_block is not None:
+        for key, selector in (('full_description', 'div[data-ftid="info-full"]'),
+                              ('exchange_possible', 'div[data-ftid="trade"]'),
+                              ('city_from_description', 'div[data-ftid="city"]')):
+            div = desc_block.css_first(selector)
+            value_span = div.css_first('span[data-ftid="value"]') if div is not None else None
+            if value_span is None:
+                continue
+            if key == 'full_description':
+                description[key] = clean_description(''.join(_lexbor_strings(value_span, br='\n')))
+            else:
+                description[key] = _lexbor_text(value_span)
+
+    bulletin_info = empty_bulletin_info()
+    info_block = tree.css_first('div[data-ftid="bull-page_bull-views"]')
+    if info_block is not None:
+        bulletin_text_div = info_block.css_first('div.css-pxeubi')
+        views_div = info_block.css_first('div.css-14wh0pm')
+        fill_bulletin_info(
+            bulletin_info,
+            _lexbor_text(bulletin_text_div) if bulletin_text_div is not None else None,
+            _lexbor_text(views_div) if views_div is not None else None,
+        )
+
+    return specs, vin_report, description, bulletin_info
+
+
+# ==================== Состояние страницы ====================
+
+# Ключи JSON-состояния детальной страницы. Не сверены с сохраненными живыми
+# страницами drom (фикстуры бенчмарка строят состояние с этими же ключами),
+# поэтому режим state включается только флагом. При расхождении править здесь;
+# ненайденный раздел разбирается из DOM и попадает в счетчик промахов
+STATE_SPECS_KEYS = ('specifications', 'bullSpecifications')
+STATE_VIN_KEYS = ('gibddReport', 'vinReport')
+STATE_DESCRIPTION_KEYS = ('bullDescription',)
+STATE_BULLETIN_KEYS = ('bullInfo', 'bulletin')
+
+# Характеристики, по которым узнаем таблицу (как подписи строк на странице)
+KNOWN_SPEC_TITLES = {'Двигатель', 'Мощность', 'Коробка передач', 'Привод', 'Тип кузова',
+                     'Цвет', 'Пробег', 'Владельцы', 'Руль', 'Поколение', 'Комплектация'}
+
+STATE_DATE_RE = re.compile(r'(\d{4})-(\d{2})-(\d{2})')
+
+STATE_SECTIONS = ('specs', 'vin_report', 'description', 'bulletin_info')
+STATE_MISS_LOG_EVERY = 100  # Строка в лог на первый и каждый N-й промах
+
+# Промахи режима state: страниц всего, страниц с переходом на DOM, по разделам.
+# Считает вызывающий процесс - пул разбора возвращает промахи вместе с результатом
+state_stats: Dict[str, int] = {'pages': 0, 'fallback_pages': 0, **{section: 0 for section in STATE_SECTIONS}}
+
+
+def _state_text(value: Any) -> str:
+    """Строка из значения состояния так же, как из текста страницы: без лишних пробелов"""
+    if value is None or isinstance(value, (dict, list)):
+        return ''
+    return SPACES_RE.sub(' ', str(value)).strip()
+
+
+def _spec_title(item: Any) -> str:
+    return _state_text(item.get('title') or item.get('name')) if isinstance(item, dict) else ''
+
+
+def _is_specs(value: Any) -> bool:
+    return isinstance(value, list) and any(_spec_title(item) in KNOWN_SPEC_TITLES for item in value)
+
+
+def _is_vin_report(value: Any) -> bool:
+    return isinstance(value, dict) and isinstance(value.get('vin'), str)
+
+
+def _is_description(value: Any) -> bool:
+    return isinstance(value, dict) and isinstance(value.get('text'), str)
+
+
+def _is_bulletin(value: Any) -> bool:
+    return isinstance(value, dict) and str(value.get('id', '')).isdigit() and is_count(value.get('viewsCount'))
+
+
+def count_state_misses(missing: List[str]):
+    """Учитывает страницу режима state и разделы, которых не нашлось в ее состоянии"""
+    state_stats['pages'] += 1
+    if not missing:
+        return
+
+    state_stats['fallback_pages'] += 1
+    for name in missing:
+        state_stats[name] += 1
+    if state_stats['fallback_pages'] == 1 or state_stats['fallback_pages'] % STATE_MISS_LOG_EVERY == 0:
+        print(f"⚠️  --extract state: нет в состоянии страницы ({', '.join(missing)}), берем из DOM | "
+              f"промахов {state_stats['fallback_pages']:,} из {state_stats['pages']:,} страниц")
+
+
+def state_fallback_summary() -> Optional[str]:
+    """Итог промахов режима state; None - режим не использовался"""
+    if not state_stats['pages']:
+        return None
+    by_section = ', '.join(f"{name} {state_stats[name]:,}" for name in STATE_SECTIONS)
+    return (f"страниц с переходом на DOM {state_stats['fallback_pages']:,} из {state_stats['pages']:,} "
+            f"({by_section})")
+
+
+def parse_sections_state(html: str) -> Tuple[Optional[Dict[str, Any]], ...]:
+    """
+    Разделы страницы из JSON-состояния в формате DOM-парсеров.
+    None на месте раздела - в состоянии его нет, нужен DOM.
+    """
+    specs = None
+    items = find_state_value(html, STATE_SPECS_KEYS, _is_specs)
+    if items is not None:
+        specs = {_spec_title(item): _state_text(item.get('value'))
+                 for item in items if _spec_title(item)}
+
+    vin_report = None
+    report = find_state_value(html, STATE_VIN_KEYS, _is_vin_report)
+    if report is not None:
+        vin_report = {'vin_full': report['vin'].strip(), 'report_items': []}
+        for item in report.get('items') or []:
+            text = _state_text(item.get('title') if isinstance(item, dict) else item)
+            if text and len(text) > 3:
+                vin_report['report_items'].append(text)
+
+    description = None
+    desc = find_state_value(html, STATE_DESCRIPTION_KEYS, _is_description)
+    if desc is not None:
+        description = {
+            'full_description': clean_description(desc['text']),
+            'exchange_possible': _state_text(desc.get('trade')),
+            'city_from_description': _state_text(desc.get('city')),
+        }
+
+    bulletin_info = None
+    info = find_state_value(html, STATE_BULLETIN_KEYS, _is_bulletin)
+    if info is not None:
+        # На странице дата в виде 12.03.2024
+        date = _state_text(info.get('date'))
+        date_match = STATE_DATE_RE.match(date)
+        if date_match:
+            date = f"{date_match.group(3)}.{date_match.group(2)}.{date_match.group(1)}"
+        bulletin_info = {
+            'bulletin_id': str(info['id']),
+            'bulletin_date': date,
+            'views_count': str(info['viewsCount']),
+        }
+
+    return specs, vin_report, description, bulletin_info
+
+
+# ==================== Общий результат ====================
+
+SECTION_PARSERS = {
+    'bs4': parse_sections_bs4,
+    'lxml': parse_sections_lxml,
+    'selectolax': parse_sections_selectolax,
+}
+
+
+def build_detail_result(specs: Dict[str, str], vin_report: Dict[str, Any],
+                        description: Dict[str, str], bulletin_info: Dict[str, str]) -> Dict[str, Any]:
+    """Объединяет все в плоский словарь для Excel"""
+    return {
+        # Характеристики
+        'engine': specs.get('Двигатель', ''),
+        'power': specs.get('Мощность', ''),
+        'transmission': specs.get('Коробка передач', ''),
+        'drive': specs.get('Привод', ''),
+        'body_type': specs.get('Тип кузова', ''),
+        'color': specs.get('Цвет', ''),
+        'mileage_detail': specs.get('Пробег', ''),
+        'owners': specs.get('Владельцы', ''),
+        'wheel': specs.get('Руль', ''),
+        'generation': specs.get('Поколение', ''),
+        'complectation': specs.get('Комплектация', ''),
+
+        # VIN отчет
+        'vin_full': vin_report.get('vin_full', ''),
+        'vin_report_items': ' | '.join(vin_report.get('report_items', [])),
+
+        # Описание
+        'full_description': description.get('full_description', ''),
+        'exchange_possible': description.get('exchange_possible', ''),
+        'city_from_description': description.get('city_from_description', ''),
+
+        # Информация об объявлении
+        'bulletin_id': bulletin_info.get('bulletin_id', ''),
+        'bulletin_date': bulletin_info.get('bulletin_date', ''),
+        'views_count': bulletin_info.get('views_count', '')
+    }
+
+
+def parse_detail_page_misses(html: str, backend: str = DEFAULT_PARSER_BACKEND,
+                             extract: str = DEFAULT_EXTRACT_MODE) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Разбирает детальную страницу выбранным движком; без побочных эффектов (годится для пула).
+    Возвращает (результат, разделы, которых нет в состоянии страницы - только для extract=state)
+    """
+    sections = (None, None, None, None)
+    missing: List[str] = []
+    if extract == 'state':
+        sections = parse_sections_state(html)
+        missing = [name for name, section in zip(STATE_SECTIONS, sections) if section is None]
+        if not missing:
+            return build_detail_result(*sections), missing
+
+    dom_html = html if extract == 'full' else (slice_detail_regions(html) or html)
+    dom_sections = SECTION_PARSERS[backend](dom_html)
+    return build_detail_result(*(section if section is not None else dom_section
+                                 for section, dom_section in zip(sections, dom_sections))), missing
+
+
+def parse_detail_page(html: str, backend: str = DEFAULT_PARSER_BACKEND,
+                      extract: str = DEFAULT_EXTRACT_MODE) -> Dict[str, Any]:
+    """
+    Разбирает детальную страницу выбранным движком.
+    extract: state - сначала JSON-состояние, targeted - DOM только нужных блоков, full - DOM всей страницы
+    """
+    result, missing = parse_detail_page_misses(html, backend, extract)
+    if extract == 'state':
+        count_state_misses(missing)
+    return result
+
+
+async def parse_detail_page_async(html: str, backend: str = DEFAULT_PARSER_BACKEND, extract: str = DEFAULT_EXTRACT_MODE,
+                                  executor: Optional[ProcessPoolExecutor] = None) -> Dict[str, Any]:
+    """Разбирает страницу в пуле процессов (или на месте, если пула нет), не блокируя event loop"""
+    if executor is None:
+        return parse_detail_page(html, backend, extract)
+
+    # Промахи состояния считаем здесь: счетчики процессов пула до основного не доходят
+    loop = asyncio.get_running_loop()
+    result, missing = await loop.run_in_executor(executor, parse_detail_page_misses, html, backend, extract)
+    if extract == 'state':
+        count_state_misses(missing)
+    return result
+
+
+def create_parse_executor(workers: int) -> Optional[ProcessPoolExecutor]:
+    """
+    Пул процессов разбора; 0 - разбирать в основном процессе.
+    Процессы запускаются при первой задаче через forkserver (на Linux) или
+    spawn: fork из процесса с потоками event loop может зависнуть.
+    """
+    if workers <= 0:
+        print("🧩 Разбор страниц в основном процессе")
+        return None
+
+    start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+    executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(start_method))
+    print(f"🧩 Пул разбора страниц: {workers} процессов")
+    return executor
+
+
+def add_parser_arguments(parser):
+    """Добавляет флаги --parser, --extract и --parse-workers"""
+    parser.add_argument('--parser', choices=PARSER_BACKENDS, default=DEFAULT_PARSER_BACKEND,
+                        help=f'движок разбора детальных страниц (по умолчанию {DEFAULT_PARSER_BACKEND})')
+    parser.add_argument('--extract', choices=EXTRACT_MODES, default=DEFAULT_EXTRACT_MODE,
+                        help='targeted - DOM только нужных блоков (по умолчанию); full - DOM всей страницы; '
+                             'state - данные из JSON-состояния страницы, DOM только для недостающего '
+                             '(ключи состояния не сверены с живыми страницами)')
+    parser.add_argument('--parse-workers', type=int, default=DEFAULT_PARSE_WORKERS,
+                        help=f'процессов для разбора страниц, 0 - в основном процессе (по умолчанию {DEFAULT_PARSE_WORKERS})')
+
+
+def backend_from_args(args) -> str:
+    """Проверяет, что выбранный движок доступен"""
+    if args.parser == 'selectolax' and LexborHTMLParser is None:
+        print("❌ ОШИБКА: для --parser selectolax установите библиотеку: pip install selectolax")
+        exit(1)
+
+    print(f"🧩 Движок разбора страниц: {args.parser} ({args.extract})")
+    return args.parser
@@ -0,0 +1,51 @@
+"""
+ДАННЫЕ ИЗ СОСТОЯНИЯ СТРАНИЦЫ (EMBEDDED STATE)
+- Страницы drom несут JSON-состояние фронтенда внутри <script>
+  (например "generationsByModels" в drom_ru/model_name_parser.py)
+- Значение по ключу находится поиском "key": по строке и декодируется
+  json.raw_decode прямо с места, где оно начинается: без регулярки по
+  содержимому, без DOM и без привязки к хешированным классам css-*
+- Ключ может встречаться в состоянии несколько раз - accept отбирает
+  значение нужной формы
+"""
+
+import json
+import re
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+_DECODER = json.JSONDecoder()
+
+# После "key" - двоеточие и начало значения
+VALUE_START_RE = re.compile(r'\s*:\s*')
+
+
+def iter_state_values(html: str, key: str) -> Iterator[Any]:
+    """Все значения по ключу key в JSON-состоянии страницы, в порядке документа"""
+    needle = f'"{key}"'
+    pos = html.find(needle)
+    while pos != -1:
+        next_pos = pos + len(needle)
+        match = VALUE_START_RE.match(html, next_pos)
+        if match:
+            try:
+                value, end = _DECODER.raw_decode(html, match.end())
+            except ValueError:
+                pass
+            else:
+                yield value
+                next_pos = end
+        pos = html.find(needle, next_pos)
+
+
+def find_state_value(html: str, keys: Iterable[str], accept: Optional[Callable[[Any], bool]] = None) -> Any:
+    """Первое значение по одному из ключей, прошедшее проверку accept (None - не нашлось)"""
+    for key in keys:
+        for value in iter_state_values(html, key):
+            if accept is None or accept(value):
+                return value
+    return None
+
+
+def is_count(value: Any) -> bool:
+    """Неотрицательное целое (счетчик), bool не считается"""
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
@@ -0,0 +1,147 @@
+"""
+КЭШ ВХОДНЫХ XLSX-ФАЙЛОВ
+- Первое чтение XLSX разбирает его как обычно (pd.read_excel) и сохраняет
+  снимок рядом, в папке .excel_cache: Feather (Arrow IPC), если установлен
+  pyarrow, иначе pickle
+- Следующие запуски читают снимок (Feather - через memory map) за доли
+  секунды вместо повторного разбора XLSX после каждого перезапуска
+- Снимок действителен, пока у XLSX те же размер и mtime; если они изменились,
+  сверяется sha256 содержимого (копия файла, touch) - при совпадении снимок
+  остается, иначе пересобирается
+- Пустые ячейки текстовых колонок читаются как NaN, как у pd.read_excel
+"""
+
+import hashlib
+import json
+import os
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow
+    import pyarrow.feather
+except ImportError:
+    pyarrow = None
+
+CACHE_DIR_NAME = '.excel_cache'
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _cache_paths(path: str) -> Dict[str, str]:
+    cache_dir = os.path.join(os.path.dirname(os.path.abspath(path)), CACHE_DIR_NAME)
+    stem = os.path.join(cache_dir, os.path.basename(path))
+    return {'dir': cache_dir, 'meta': f'{stem}.json', 'feather': f'{stem}.feather', 'pickle': f'{stem}.pkl'}
+
+
+def _load_meta(meta_path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _snapshot_valid(path: str, meta: Dict[str, Any], paths: Dict[str, str]) -> bool:
+    """Снимок на месте и соответствует текущему содержимому XLSX"""
+    snapshot_path = paths.get(meta.get('format'))
+    if snapshot_path is None or not os.path.exists(snapshot_path):
+        return False
+
+    stat = os.stat(path)
+    if meta.get('size') == stat.st_size and meta.get('mtime_ns') == stat.st_mtime_ns:
+        return True
+
+    # Файл тронули или скопировали: содержимое то же - снимок годится
+    if meta.get('size') == stat.st_size and meta.get('sha256') == file_sha256(path):
+        meta['mtime_ns'] = stat.st_mtime_ns
+        _write_meta(paths['meta'], meta)
+        return True
+    return False
+
+
+def _write_meta(meta_path: str, meta: Dict[str, Any]):
+    tmp_path = f'{meta_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    os.replace(tmp_path, meta_path)
+
+
+def _write_snapshot(path: str, df: pd.DataFrame, paths: Dict[str, str]):
+    """Сохраняет снимок: Feather, если получится, иначе pickle"""
+    os.makedirs(paths['dir'], exist_ok=True)
+    stat = os.stat(path)
+    meta = {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'sha256': file_sha256(path)}
+
+    snapshot_format = 'pickle'
+    if pyarrow is not None and all(isinstance(column, str) for column in df.columns):
+        tmp_path = f"{paths['feather']}.{os.getpid()}.tmp"
+        try:
+            df.to_feather(tmp_path)
+            os.replace(tmp_path, paths['feather'])
+            snapshot_format = 'feather'
+        except (pyarrow.ArrowException, TypeError, ValueError):
+            # Колонка со значениями разных типов (число и текст) в Arrow не ложится
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    if snapshot_format == 'pickle':
+        tmp_path = f"{paths['pickle']}.{os.getpid()}.tmp"
+        df.to_pickle(tmp_path)
+        os.replace(tmp_path, paths['pickle'])
+
+    meta['format'] = snapshot_format
+    _write_meta(paths['meta'], meta)
+
+
+def _read_snapshot(paths: Dict[str, str], snapshot_format: str, columns: Optional[List[str]]) -> pd.DataFrame:
+    if snapshot_format == 'feather':
+        table = pyarrow.feather.read_table(paths['feather'], memory_map=True)
+        if columns is not None:
+            table = table.select([column for column in columns if column in table.column_names])
+        df = table.to_pandas()
+        # Arrow возвращает пустые текстовые ячейки как None, read_excel - как NaN
+        text_columns = df.columns[df.dtypes == object]
+        if len(text_columns):
+            df[text_columns] = df[text_columns].where(df[text_columns].notna(), np.nan)
+        return df
+
+    df = pd.read_pickle(paths['pickle'])
+    if columns is not None:
+        df = df[[column for column in columns if column in df.columns]]
+    return df
+
+
+def read_excel_cached(path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    pd.read_excel(path) через снимок в .excel_cache.
+    columns - только эти колонки (отсутствующие в файле пропускаются)
+    """
+    paths = _cache_paths(path)
+    meta = _load_meta(paths['meta'])
+
+    if meta is not None and _snapshot_valid(path, meta, paths):
+        try:
+            return _read_snapshot(paths, meta['format'], columns)
+        except Exception as e:
+            print(f"⚠️  Снимок {os.path.basename(path)} не читается ({e}), разбираем XLSX заново")
+
+    df = pd.read_excel(path)
+    try:
+        _write_snapshot(path, df, paths)
+    except OSError as e:
+        # Папка только для чтения и т.п.: работаем без кэша
+        print(f"⚠️  Не удалось сохранить снимок {os.path.basename(path)}: {e}")
+
+    if columns is not None:
+        df = df[[column for column in columns if column in df.columns]]
+    return df
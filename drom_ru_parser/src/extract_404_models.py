@@ -1,16 +1,26 @@
-import pandas as pd
+import os
+
+from excel_cache import read_excel_cached
+from failure_ledger import DEFAULT_LEDGER_FILE, DeadLedger
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
 # Читаем исходный файл
 input_file = '/drom_ru_parser/drom_scraped_data_progress.xlsx'
 output_file = '/drom_ru_parser/skipped_models.xlsx'
 
 # Загружаем данные
-df = pd.read_excel(input_file)
+df = read_excel_cached(input_file)
+
+# Реестр удаленных моделей ведут сами парсеры (404/410 на первой странице выдачи)
+ledger = DeadLedger(os.path.join(SCRIPT_DIR, DEFAULT_LEDGER_FILE))
+in_ledger = df.apply(lambda row: ledger.is_dead_model(row['brand'], row['model']), axis=1)
 
-# Фильтруем строки со статусом HTTP 404
-http_404_models = df[df['status'] == 'HTTP 404']
+# Статус HTTP 404 - для результатов, собранных до появления реестра
+http_404_models = df[in_ledger | (df['status'] == 'HTTP 404')]
 
 print(f"Всего записей в файле: {len(df)}")
+print(f"Моделей в реестре удаленных: {len(ledger.models)}")
 print(f"Найдено моделей с HTTP 404: {len(http_404_models)}")
 
 # Сохраняем в новый файл
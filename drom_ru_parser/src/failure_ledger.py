@@ -0,0 +1,150 @@
+"""
+ТИПЫ ОШИБОК И РЕЕСТР "МЕРТВЫХ" СТРАНИЦ
+- Failure: вид ошибки (удалено, 429, 5xx, сеть, разбор) вместо общего None
+- Повторять имеет смысл только временные ошибки (429, 5xx, прочие коды, сеть)
+- 404/410 попадают в реестр dead_ledger.jsonl с причиной; все парсеры
+  сверяются с ним перед запросом и не тратят запросы на удаленные страницы
+"""
+
+import asyncio
+import json
+import os
+import time
+from typing import Any, Dict, Optional
+
+import aiohttp
+import requests
+
+# Виды ошибок
+GONE = 'gone'  # 404/410: объявление или модель удалены
+THROTTLED = 'throttled'  # 429
+SERVER_ERROR = 'server_error'  # 5xx
+HTTP_ERROR = 'http_error'  # прочие коды (403 и т.п.)
+NETWORK = 'network'  # таймаут, обрыв соединения
+PARSE = 'parse'  # страница загружена, но не разобралась
+MISSING = 'missing'  # при --replay страницы нет в хранилище
+
+# Ошибки, которые могут пройти при повторе
+RETRYABLE_KINDS = {THROTTLED, SERVER_ERROR, HTTP_ERROR, NETWORK}
+
+GONE_STATUSES = {404, 410}
+
+DEFAULT_LEDGER_FILE = 'dead_ledger.jsonl'
+
+
+class Failure:
+    """Результат неудачной загрузки: вид ошибки, HTTP-статус и текст причины"""
+
+    __slots__ = ('kind', 'status', 'reason')
+
+    def __init__(self, kind: str, status: Optional[int] = None, reason: str = ''):
+        self.kind = kind
+        self.status = status
+        self.reason = reason or (f"HTTP {status}" if status is not None else kind)
+
+    @property
+    def is_permanent(self) -> bool:
+        """Страница удалена - повторять бессмысленно"""
+        return self.kind == GONE
+
+    @property
+    def is_retryable(self) -> bool:
+        return self.kind in RETRYABLE_KINDS
+
+    def __repr__(self) -> str:
+        return f"Failure({self.kind}, {self.reason})"
+
+
+def failure_from_status(status: Optional[int]) -> Failure:
+    """Классифицирует неуспешный HTTP-статус (None - нет в хранилище при --replay)"""
+    if status is None:
+        return Failure(MISSING, reason="Нет в хранилище HTML")
+    if status in GONE_STATUSES:
+        return Failure(GONE, status)
+    if status == 429:
+        return Failure(THROTTLED, status)
+    if status >= 500:
+        return Failure(SERVER_ERROR, status)
+    return Failure(HTTP_ERROR, status)
+
+
+def failure_from_exception(error: Exception) -> Failure:
+    """Классифицирует исключение: сетевые ошибки временные, остальное - ошибка разбора"""
+    if isinstance(error, (asyncio.TimeoutError, aiohttp.ClientError, requests.RequestException, ConnectionError)):
+        return Failure(NETWORK, reason=f"{type(error).__name__}: {str(error)[:100]}")
+    return Failure(PARSE, reason=f"{type(error).__name__}: {str(error)[:100]}")
+
+
+def model_slug(brand: Any, model: Any) -> str:
+    """Ключ модели как в URL выдачи: brand/model"""
+    return f"{str(brand).lower().strip()}/{str(model).lower().strip()}"
+
+
+class DeadLedger:
+    """
+    Постоянный реестр удаленных объявлений (по URL) и моделей (по brand/model).
+    Хранится в JSONL: запись добавляется одной строкой, файл можно
+    дописывать из нескольких скриптов.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.urls: Dict[str, Dict[str, Any]] = {}
+        self.models: Dict[str, Dict[str, Any]] = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                target = self.urls if entry.get('type') == 'url' else self.models
+                target[entry['key']] = entry
+
+    def _append(self, target: Dict[str, Dict[str, Any]], entry_type: str, key: str, failure: Failure):
+        if key in target:
+            return
+
+        entry = {
+            'type': entry_type,
+            'key': key,
+            'status': failure.status,
+            'reason': failure.reason,
+            'marked_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+        }
+        target[key] = entry
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+
+    def mark_url(self, url: str, failure: Failure):
+        self._append(self.urls, 'url', url, failure)
+
+    def mark_model(self, brand: Any, model: Any, failure: Failure):
+        self._append(self.models, 'model', model_slug(brand, model), failure)
+
+    def url_entry(self, url: str) -> Optional[Dict[str, Any]]:
+        return self.urls.get(url)
+
+    def model_entry(self, brand: Any, model: Any) -> Optional[Dict[str, Any]]:
+        return self.models.get(model_slug(brand, model))
+
+    def is_dead_url(self, url: str) -> bool:
+        return url in self.urls
+
+    def is_dead_model(self, brand: Any, model: Any) -> bool:
+        return model_slug(brand, model) in self.models
+
+    def __len__(self) -> int:
+        return len(self.urls) + len(self.models)
+
+
+def load_ledger(script_dir: str) -> DeadLedger:
+    """Открывает общий реестр в папке скриптов"""
+    ledger = DeadLedger(os.path.join(script_dir, DEFAULT_LEDGER_FILE))
+    print(f"🪦 Реестр удаленных страниц: {len(ledger.urls):,} объявлений, {len(ledger.models):,} моделей")
+    return ledger
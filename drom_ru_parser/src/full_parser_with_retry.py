@@ -1,20 +1,53 @@
 """
 УЛУЧШЕННЫЙ АСИНХРОННЫЙ ПАРСЕР С АВТО-ПОВТОРОМ ОШИБОК
-- Сначала добивает до конца основной парсинг
-- Потом автоматически повторяет все ошибки
+- Пул воркеров: новый запрос стартует сразу как освобождается слот
+- Ошибки уходят в очередь повторов с экспоненциальной задержкой на каждую строку
+- Повторы выполняются вперемешку с основным проходом, как только наступило их время
+- Очередь повторов сохраняется в файле прогресса
+- Повторяются только временные ошибки; удаленные (404/410) объявления уходят в реестр
 - Максимум 3 попытки на каждую строку
+- Результаты дописываются в журнал (JSONL); XLSX-файлы собираются из него
+  в конце прогона или по --materialize, а не переписываются каждые 50 строк
+- С флагом --parquet результаты собираются в Parquet по брендам (parquet_store.py)
+  вместо XLSX-файлов по CHUNK_SIZE строк
+- С флагом --db берет объявления без деталей из SQLite (listing_db.py) и
+  пишет детали туда же по номеру объявления, без XLSX и журнала
+- С флагом --lease несколько процессов (в т.ч. на разных машинах) делят строки
+  через аренду диапазонов в SQLite; --workers N запускает N таких процессов
 """
 
+import argparse
 import pandas as pd
 import asyncio
 import aiohttp
-from bs4 import BeautifulSoup
 import random
-import re
 import time
 import os
 import json
-from typing import Dict, Any, Optional, List, Tuple, Set
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date
+from functools import partial
+from typing import Dict, Any, Optional, List, Tuple, Set, Union
+
+from chunk_cache import ChunkCache
+from concurrency_controller import AIMDController
+from detail_parser import (DEFAULT_EXTRACT_MODE, DEFAULT_PARSER_BACKEND, add_parser_arguments,
+                           backend_from_args, create_parse_executor, parse_detail_page_async,
+                           state_fallback_summary)
+from excel_cache import read_excel_cached
+from failure_ledger import Failure, failure_from_exception, failure_from_status, load_ledger
+from lease_coordinator import LeaseCoordinator
+from listing_db import ListingDB, add_db_arguments, db_from_args
+from parquet_store import add_parquet_arguments, parquet_dir_from_args, write_partitioned
+from rate_limiter import HostRateLimiter
+from response_store import ResponseStore, add_store_arguments, store_from_args
+from result_buffer import DETAIL_COLUMNS, ResultBuffer
+from result_journal import ResultJournal, latest_entries
+from retry_scheduler import RetryScheduler
+from work_plan import ListingPlan
+from worker_pool import run_worker_pool
 
 # Проверяем brotli
 try:
@@ -33,11 +66,46 @@ USER_AGENTS = [
 ]
 
 # Настройки
-CONCURRENT_REQUESTS = 7  # Количество параллельных запросов
-SAVE_BATCH_SIZE = 50  # Сохранять каждые N успешных записей
+CONCURRENT_REQUESTS = 7  # Стартовое окно параллельных запросов
+MIN_CONCURRENT_REQUESTS = 2  # Нижняя граница окна при 429/5xx
+MAX_CONCURRENT_REQUESTS = 20  # Верхняя граница окна при здоровых ответах
+SAVE_BATCH_SIZE = 50  # Сохранять прогресс каждые N успешных записей
 CHUNK_SIZE = 50000  # Размер файла (50,000 записей)
 START_INDEX = 36578  # Начинаем с этой записи
 MAX_RETRY_ATTEMPTS = 3  # Максимум попыток для каждой ошибки
+RETRY_BASE_DELAY = 30  # Задержка перед первым повтором (сек), дальше удваивается
+RETRY_MAX_DELAY = 900  # Потолок задержки повтора (сек)
+LEASE_RANGE_SIZE = 5000  # Строк в одном арендуемом диапазоне (--lease)
+LEASE_TTL = 120  # Аренда истекает без heartbeat через N секунд
+REQUESTS_PER_SECOND = 30.0  # Бюджет запросов на хост
+REQUESTS_BURST = 10  # Допустимый всплеск запросов на хост
+
+# Общий ограничитель: 429 ставит на паузу только свой хост, без sleep на весь процесс
+rate_limiter = HostRateLimiter(rate=REQUESTS_PER_SECOND, burst=REQUESTS_BURST)
+
+# Хранилище сырых страниц (--store-html / --replay), настраивается при запуске
+response_store: Optional[ResponseStore] = None
+
+# Движок разбора детальных страниц (--parser) и откуда брать данные (--extract)
+PARSER_BACKEND = DEFAULT_PARSER_BACKEND
+PARSER_EXTRACT = DEFAULT_EXTRACT_MODE
+
+# Пул процессов разбора (--parse-workers), создается при запуске; None - разбор в event loop
+parse_executor: Optional[ProcessPoolExecutor] = None
+
+# Входной файл и префикс выходных файлов (--input переключает на дельту database_parser --incremental)
+INPUT_FILE_NAME = 'drom_scraped_data_progress.xlsx'
+OUTPUT_PREFIX = 'drom_full_scraper'
+
+# Имя процесса в режиме --lease: у каждого процесса свой файл прогресса
+WORKER_ID: Optional[str] = None
+
+# База объявлений (--db): источник строк и приемник деталей вместо XLSX
+listing_db: Optional[ListingDB] = None
+
+# Папка Parquet (--parquet): результаты по брендам вместо XLSX-файлов; None - XLSX
+PARQUET_DIR: Optional[str] = None
+PARTITION_BY_DATE = False
 
 
 def get_headers():
@@ -52,197 +120,43 @@ def get_headers():
     }
 
 
-def parse_specifications_table(soup: BeautifulSoup) -> Dict[str, str]:
-    """Парсит таблицу характеристик"""
-    specs = {}
-    table = soup.find('table', {'class': 'i2nf564', 'data-ftid': 'bulletin-specifications'})
-
-    if not table:
-        return specs
-
-    rows = table.find_all('tr')
-    for row in rows:
-        property_cell = row.find('th', {'data-ftid': 'property'})
-        value_cell = row.find('td', {'data-ftid': 'value'})
-
-        if property_cell and value_cell:
-            property_name = property_cell.get_text(strip=True)
-
-            # Удаляем кнопку "налог"
-            button = value_cell.find('button')
-            if button:
-                button.decompose()
-
-            # Заменяем ссылки на текст
-            for link in value_cell.find_all('a'):
-                link.replace_with(link.get_text(strip=True))
-
-            value_text = value_cell.get_text(strip=True)
-            value_text = re.sub(r'\s+', ' ', value_text)
-
-            specs[property_name] = value_text
-
-    return specs
+async def fetch_html(session: aiohttp.ClientSession, url: str) -> Tuple[Optional[int], str]:
+    """Возвращает (status, html): из хранилища при --replay, иначе запросом через rate_limiter"""
+    if response_store is not None and response_store.replay:
+        return response_store.get(url) or (None, '')
 
+    await rate_limiter.wait_async(url)
+    async with session.get(url, headers=get_headers(), timeout=aiohttp.ClientTimeout(total=30)) as response:
+        if response.status == 429:
+            rate_limiter.penalize(url, response.headers.get('Retry-After'))
+            return response.status, ''
 
-def parse_vin_report(soup: BeautifulSoup) -> Dict[str, Any]:
-    """Парсит блок отчета по VIN"""
-    vin_info = {
-        'vin_full': None,
-        'report_items': []
-    }
-
-    vin_block = soup.find('div', {'data-ga-stats-name': 'gibdd_report'})
-
-    if not vin_block:
-        return vin_info
-
-    # VIN номер
-    vin_div = vin_block.find('div', class_='css-o8yr01')
-    if vin_div:
-        vin_info['vin_full'] = vin_div.get_text(strip=True)
-
-    # Пункты отчета
-    report_items_divs = vin_block.find_all('div', class_=re.compile(r'css-13qo6o5|css-z05wok'))
-
-    for item_div in report_items_divs:
-        button = item_div.find('button')
-        if button:
-            text = button.get_text(strip=True)
-        else:
-            text = item_div.get_text(strip=True)
-
-        if text and len(text) > 3:
-            vin_info['report_items'].append(text)
-
-    return vin_info
-
-
-def parse_description(soup: BeautifulSoup) -> Dict[str, str]:
-    """Парсит описание объявления"""
-    description_data = {
-        'full_description': '',
-        'exchange_possible': '',
-        'city_from_description': ''
-    }
-
-    desc_block = soup.find('div', {'data-ftid': 'bulletin-description'})
-
-    if not desc_block:
-        return description_data
-
-    # Полное описание
-    full_desc_div = desc_block.find('div', {'data-ftid': 'info-full'})
-    if full_desc_div:
-        value_span = full_desc_div.find('span', {'data-ftid': 'value'})
-        if value_span:
-            for br in value_span.find_all('br'):
-                br.replace_with('\n')
-
-            description_text = value_span.get_text(strip=False)
-            description_text = re.sub(r'\n\s*\n', '\n', description_text)
-            description_data['full_description'] = description_text.strip()
-
-    # Обмен
-    trade_div = desc_block.find('div', {'data-ftid': 'trade'})
-    if trade_div:
-        value_span = trade_div.find('span', {'data-ftid': 'value'})
-        if value_span:
-            description_data['exchange_possible'] = value_span.get_text(strip=True)
-
-    # Город
-    city_div = desc_block.find('div', {'data-ftid': 'city'})
-    if city_div:
-        value_span = city_div.find('span', {'data-ftid': 'value'})
-        if value_span:
-            description_data['city_from_description'] = value_span.get_text(strip=True)
-
-    return description_data
-
-
-def parse_bulletin_info(soup: BeautifulSoup) -> Dict[str, str]:
-    """Парсит информацию об объявлении"""
-    bulletin_info = {
-        'bulletin_id': '',
-        'bulletin_date': '',
-        'views_count': ''
-    }
-
-    info_block = soup.find('div', {'data-ftid': 'bull-page_bull-views'})
+        if response.status != 200:
+            # 5xx не сохраняем: это временная ошибка, а не содержимое страницы
+            if response_store is not None and response.status < 500:
+                response_store.put(url, response.status)
+            return response.status, ''
 
-    if not info_block:
-        return bulletin_info
+        rate_limiter.record_success(url)
 
-    # Номер и дата
-    bulletin_text_div = info_block.find('div', class_='css-pxeubi')
-    if bulletin_text_div:
-        text = bulletin_text_div.get_text(strip=True)
-        match = re.search(r'Объявление\s+(\d+)\s+от\s+([\d.]+)', text)
-        if match:
-            bulletin_info['bulletin_id'] = match.group(1)
-            bulletin_info['bulletin_date'] = match.group(2)
+        # aiohttp автоматически декодирует gzip/brotli
+        html = await response.text(encoding='windows-1251')
+        if response_store is not None:
+            response_store.put(url, response.status, html)
+        return response.status, html
 
-    # Просмотры
-    views_div = info_block.find('div', class_='css-14wh0pm')
-    if views_div:
-        views_text = views_div.get_text(strip=True)
-        views_match = re.search(r'(\d+)', views_text)
-        if views_match:
-            bulletin_info['views_count'] = views_match.group(1)
 
-    return bulletin_info
-
-
-async def scrape_listing_details(session: aiohttp.ClientSession, url: str, idx: int) -> Tuple[int, Optional[Dict[str, Any]]]:
-    """Асинхронно скрапит детальную информацию об объявлении"""
+async def scrape_listing_details(session: aiohttp.ClientSession, url: str, idx: int) -> Tuple[int, Union[Dict[str, Any], Failure]]:
+    """Асинхронно скрапит детальную информацию об объявлении. При ошибке вместо данных - Failure"""
     try:
-        async with session.get(url, headers=get_headers(), timeout=aiohttp.ClientTimeout(total=30)) as response:
-            if response.status != 200:
-                return (idx, None)
-
-            # aiohttp автоматически декодирует gzip/brotli
-            html = await response.text(encoding='windows-1251')
-            soup = BeautifulSoup(html, 'html.parser')
-
-            specs = parse_specifications_table(soup)
-            vin_report = parse_vin_report(soup)
-            description = parse_description(soup)
-            bulletin_info = parse_bulletin_info(soup)
-
-            # Объединяем все в плоский словарь для Excel
-            result = {
-                # Характеристики
-                'engine': specs.get('Двигатель', ''),
-                'power': specs.get('Мощность', ''),
-                'transmission': specs.get('Коробка передач', ''),
-                'drive': specs.get('Привод', ''),
-                'body_type': specs.get('Тип кузова', ''),
-                'color': specs.get('Цвет', ''),
-                'mileage_detail': specs.get('Пробег', ''),
-                'owners': specs.get('Владельцы', ''),
-                'wheel': specs.get('Руль', ''),
-                'generation': specs.get('Поколение', ''),
-                'complectation': specs.get('Комплектация', ''),
-
-                # VIN отчет
-                'vin_full': vin_report.get('vin_full', ''),
-                'vin_report_items': ' | '.join(vin_report.get('report_items', [])),
-
-                # Описание
-                'full_description': description.get('full_description', ''),
-                'exchange_possible': description.get('exchange_possible', ''),
-                'city_from_description': description.get('city_from_description', ''),
-
-                # Информация об объявлении
-                'bulletin_id': bulletin_info.get('bulletin_id', ''),
-                'bulletin_date': bulletin_info.get('bulletin_date', ''),
-                'views_count': bulletin_info.get('views_count', '')
-            }
-
-            return (idx, result)
+        status, html = await fetch_html(session, url)
+        if status != 200:
+            return (idx, failure_from_status(status))
+
+        return (idx, await parse_detail_page_async(html, PARSER_BACKEND, PARSER_EXTRACT, parse_executor))
 
     except Exception as e:
-        return (idx, None)
+        return (idx, failure_from_exception(e))
 
 
 def get_file_number(idx: int) -> int:
@@ -252,7 +166,7 @@ def get_file_number(idx: int) -> int:
 
 def get_file_path(file_number: int) -> str:
     """Возвращает путь к файлу по номеру"""
-    return os.path.join(SCRIPT_DIR, f'drom_full_scraper_{file_number}.xlsx')
+    return os.path.join(SCRIPT_DIR, f'{OUTPUT_PREFIX}_{file_number}.xlsx')
 
 
 def load_or_create_chunk_file(file_number: int, source_df: pd.DataFrame) -> pd.DataFrame:
@@ -269,27 +183,105 @@ def load_or_create_chunk_file(file_number: int, source_df: pd.DataFrame) -> pd.D
         except Exception as e:
             print(f"   ⚠️ Ошибка чтения файла: {e}, создаем новый")
 
-    # Создаем новый файл из нужного диапазона
-    chunk_df = source_df.iloc[start_idx:end_idx].copy()
+    # Создаем новый файл из нужного диапазона (индекс с нуля, как у прочитанного из Excel)
+    chunk_df = source_df.iloc[start_idx:end_idx].copy().reset_index(drop=True)
 
     # Добавляем новые колонки
-    new_columns = [
-        'engine', 'power', 'transmission', 'drive', 'body_type', 'color',
-        'mileage_detail', 'owners', 'wheel', 'generation', 'complectation',
-        'vin_full', 'vin_report_items', 'full_description', 'exchange_possible',
-        'city_from_description', 'bulletin_id', 'bulletin_date', 'views_count'
-    ]
-
-    for col in new_columns:
+    for col in DETAIL_COLUMNS:
         if col not in chunk_df.columns:
             chunk_df[col] = ''
 
     return chunk_df
 
 
+def get_journal_path() -> str:
+    """Журнал результатов; в режиме --lease у каждого процесса свой"""
+    if WORKER_ID:
+        return os.path.join(SCRIPT_DIR, f'{OUTPUT_PREFIX}_results_{WORKER_ID}.jsonl')
+    return os.path.join(SCRIPT_DIR, f'{OUTPUT_PREFIX}_results.jsonl')
+
+
+def save_chunk_file(file_number: int, chunk_df: pd.DataFrame):
+    """Записывает файл результатов через временный файл: прерванная запись не портит прежний XLSX"""
+    file_path = get_file_path(file_number)
+    tmp_path = f'{file_path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        chunk_df.to_excel(f, index=False, engine='openpyxl')
+    os.replace(tmp_path, file_path)
+
+
+def create_chunk_cache(source_df: pd.DataFrame) -> ChunkCache:
+    """Кэш таблиц файлов результатов, заготовки берутся из source_df"""
+    return ChunkCache(load=partial(load_or_create_chunk_file, source_df=source_df),
+                      save=save_chunk_file, path=get_file_path)
+
+
+def materialize_chunks(source_df: pd.DataFrame, journal_path: str,
+                       cache: Optional[ChunkCache] = None) -> int:
+    """
+    Собирает XLSX-файлы из журнала: существующий файл (или заготовка из
+    исходной таблицы) плюс записи журнала поверх. Возвращает число записей.
+    cache - таблицы, оставшиеся в памяти с прошлой сборки (не читаются заново)
+    """
+    if cache is None:
+        cache = create_chunk_cache(source_df)
+
+    buffers: Dict[int, ResultBuffer] = {}
+    for idx, details in latest_entries(journal_path).items():
+        buffers.setdefault(get_file_number(idx), ResultBuffer()).add(idx % CHUNK_SIZE, details)
+
+    for file_number, buffer in sorted(buffers.items()):
+        buffer.apply_to(cache.get(file_number))
+        cache.mark_dirty(file_number)
+        print(f"    📗 {os.path.basename(get_file_path(file_number))}: записей из журнала {len(buffer):,}")
+
+    # Журнал после сборки очищается: все измененные таблицы должны быть на диске
+    cache.flush()
+    return sum(len(buffer) for buffer in buffers.values())
+
+
+def materialize_parquet(source_df: pd.DataFrame, journal_path: str) -> int:
+    """
+    Переносит записи журнала в Parquet: исходная строка плюс детальные поля,
+    раздел по бренду (и дате обхода). Возвращает число записей
+    """
+    entries = latest_entries(journal_path)
+    if not entries:
+        return 0
+
+    indices = sorted(entries)
+    buffer = ResultBuffer()
+    for position, idx in enumerate(indices):
+        buffer.add(position, entries[idx])
+    details = buffer.to_frame()
+    rows = source_df.iloc[indices].reset_index(drop=True)
+    rows = rows.drop(columns=[column for column in details.columns if column in rows.columns]).join(details)
+
+    # У каждого процесса --lease свои файлы в разделах
+    basename = f'{OUTPUT_PREFIX}_{WORKER_ID}' if WORKER_ID else OUTPUT_PREFIX
+    partitions = write_partitioned(rows, PARQUET_DIR, basename, date.today() if PARTITION_BY_DATE else None)
+    print(f"    🧱 Parquet: записей из журнала {len(indices):,}, разделов {partitions}")
+    return len(indices)
+
+
+def materialize_results(source_df: pd.DataFrame, journal_path: str,
+                        cache: Optional[ChunkCache] = None) -> int:
+    """Собирает результаты из журнала в Parquet (--parquet) или XLSX-файлы"""
+    if PARQUET_DIR is not None:
+        return materialize_parquet(source_df, journal_path)
+    return materialize_chunks(source_df, journal_path, cache)
+
+
+def get_progress_path() -> str:
+    """Файл прогресса; в режиме --lease у каждого процесса свой"""
+    if WORKER_ID:
+        return os.path.join(SCRIPT_DIR, f'{OUTPUT_PREFIX}_progress_{WORKER_ID}.json')
+    return os.path.join(SCRIPT_DIR, f'{OUTPUT_PREFIX}_progress.json')
+
+
 def load_progress():
     """Загружает прогресс"""
-    progress_file = os.path.join(SCRIPT_DIR, 'drom_full_scraper_progress.json')
+    progress_file = get_progress_path()
     if os.path.exists(progress_file):
         try:
             with open(progress_file, 'r', encoding='utf-8') as f:
@@ -299,378 +291,404 @@ def load_progress():
     return None
 
 
-def save_progress(last_index, successful, failed, skipped, failed_indices: Set[int], retry_attempt: int = 1):
+def save_progress(last_index, successful, failed, skipped, failed_indices: Set[int],
+                  retry_queue: Optional[List[Dict[str, Any]]] = None,
+                  concurrency: Optional[Dict[str, Any]] = None, gone: int = 0):
     """Сохраняет прогресс"""
-    progress_file = os.path.join(SCRIPT_DIR, 'drom_full_scraper_progress.json')
-    with open(progress_file, 'w', encoding='utf-8') as f:
-        json.dump({
-            'last_index': last_index,
-            'successful': successful,
-            'failed': failed,
-            'skipped': skipped,
-            'failed_indices': list(failed_indices),
-            'retry_attempt': retry_attempt
-        }, f, ensure_ascii=False, indent=2)
-
+    progress_file = get_progress_path()
+    progress_data = {
+        'last_index': last_index,
+        'successful': successful,
+        'failed': failed,
+        'skipped': skipped,
+        'failed_indices': list(failed_indices),
+        'retry_queue': retry_queue or [],
+        'gone': gone
+    }
+    if concurrency is not None:
+        progress_data['concurrency'] = concurrency
 
-async def process_batch(session: aiohttp.ClientSession, tasks: List[Tuple[int, str]]) -> List[Tuple[int, Optional[Dict]]]:
-    """Обрабатывает батч запросов параллельно"""
-    coroutines = [scrape_listing_details(session, url, idx) for idx, url in tasks]
-    return await asyncio.gather(*coroutines)
+    with open(progress_file, 'w', encoding='utf-8') as f:
+        json.dump(progress_data, f, ensure_ascii=False, indent=2)
 
 
-async def main():
+async def main(lease: Optional[LeaseCoordinator] = None):
+    """
+    Без lease - один процесс проходит таблицу от START_INDEX (или от прогресса) до конца.
+    С lease - процесс по очереди берет в аренду диапазоны строк, пока они не кончатся.
+    """
     start_time = time.time()
 
     print(f"\n{'=' * 80}")
     print("УЛУЧШЕННЫЙ ПАРСЕР С АВТО-ПОВТОРОМ ОШИБОК")
     print('=' * 80)
-    print(f"⚡ Параллельных запросов: {CONCURRENT_REQUESTS}")
+    print(f"⚡ Параллельных запросов: {CONCURRENT_REQUESTS} (адаптивно {MIN_CONCURRENT_REQUESTS}-{MAX_CONCURRENT_REQUESTS})")
     print(f"📦 Размер файла: {CHUNK_SIZE:,} записей")
     print(f"💾 Сохранение каждые: {SAVE_BATCH_SIZE} успешных записей")
-    print(f"🔄 Макс. попыток для ошибок: {MAX_RETRY_ATTEMPTS}")
+    print(f"🔄 Макс. попыток для ошибок: {MAX_RETRY_ATTEMPTS} (задержка {RETRY_BASE_DELAY}с, x2, до {RETRY_MAX_DELAY}с)")
 
-    # Загружаем исходный файл
-    input_file = os.path.join(SCRIPT_DIR, 'drom_scraped_data_progress.xlsx')
+    if listing_db is not None:
+        # Источник - объявления базы, у которых еще нет деталей: база сама хранит,
+        # что сделано, поэтому файл прогресса для продолжения не нужен
+        print(f"\n🗃️  Загружаем объявления без деталей из базы")
+        source_df = listing_db.listings_frame(pending_details=True)
+    else:
+        # Загружаем исходный файл
+        input_file = os.path.join(SCRIPT_DIR, INPUT_FILE_NAME)
 
-    if not os.path.exists(input_file):
-        print(f"\n❌ ОШИБКА: Файл {input_file} не найден!")
-        return
+        if not os.path.exists(input_file):
+            print(f"\n❌ ОШИБКА: Файл {input_file} не найден!")
+            return
 
-    print(f"\n📂 Загружаем исходный файл: drom_scraped_data_progress.xlsx")
-    source_df = pd.read_excel(input_file)
+        print(f"\n📂 Загружаем исходный файл: {INPUT_FILE_NAME}")
+        source_df = read_excel_cached(input_file)
     print(f"   Всего строк: {len(source_df):,}")
 
-    # Подсчитываем сколько нужно обработать
-    rows_to_process = source_df[source_df['status'] == 'Найдено']
-    print(f"   Со статусом 'Найдено': {len(rows_to_process):,}")
+    # Строки к загрузке, их URL и названия - одним проходом по таблице
+    plan = ListingPlan(source_df)
+    print(f"   Со статусом 'Найдено': {plan.fetch_count:,}")
+
+    # Реестр удаленных объявлений: такие URL не запрашиваем и не повторяем
+    dead_ledger = load_ledger(SCRIPT_DIR)
+
+    # Очередь повторов: у каждой ошибки свое время следующей попытки
+    retry_scheduler = RetryScheduler(
+        max_attempts=MAX_RETRY_ATTEMPTS,
+        base_delay=RETRY_BASE_DELAY,
+        max_delay=RETRY_MAX_DELAY,
+    )
 
-    # Загружаем прогресс
-    progress_data = load_progress()
+    # Загружаем прогресс (в режиме аренды состояние диапазонов хранится в SQLite)
+    progress_data = load_progress() if lease is None and listing_db is None else None
 
     if progress_data:
         start_index = max(START_INDEX, progress_data.get('last_index', -1) + 1)
         successful = progress_data.get('successful', 0)
         failed = progress_data.get('failed', 0)
         skipped = progress_data.get('skipped', 0)
+        gone = progress_data.get('gone', 0)
         failed_indices = set(progress_data.get('failed_indices', []))
-        retry_attempt = progress_data.get('retry_attempt', 1)
+
+        if 'retry_queue' in progress_data:
+            retry_scheduler.load(progress_data['retry_queue'])
+        else:
+            # Прогресс старого формата: незавершенные ошибки повторяем сразу
+            retry_attempt = progress_data.get('retry_attempt', 1)
+            if retry_attempt < MAX_RETRY_ATTEMPTS:
+                retry_scheduler.load([
+                    {'idx': idx, 'url': plan.url(idx), 'attempts': retry_attempt, 'due_at': time.time()}
+                    for idx in sorted(failed_indices)
+                    if plan.url(idx)
+                ])
+
         print(f"\n🔄 ПРОДОЛЖАЕМ С СТРОКИ {start_index:,}")
         print(f"   Ошибок в базе: {len(failed_indices):,}")
-        print(f"   Попытка: {retry_attempt}")
+        print(f"   В очереди повторов: {len(retry_scheduler):,}")
     else:
         start_index = START_INDEX
         successful = 0
         failed = 0
         skipped = 0
+        gone = 0
         failed_indices = set()
-        retry_attempt = 1
-        print(f"\n🆕 НАЧИНАЕМ СО СТРОКИ {start_index:,}")
+        if lease is None:
+            print(f"\n🆕 НАЧИНАЕМ СО СТРОКИ {start_index:,}")
+        else:
+            print(f"\n🔐 РЕЖИМ АРЕНДЫ: процесс {lease.worker_id}, база {lease.db_path}")
 
     print(f"{'=' * 80}\n")
 
-    # Кэш загруженных файлов
-    current_chunk_number = None
-    current_chunk_df = None
+    # Результаты дописываются в журнал (XLSX собирается из него в конце) или в базу
+    journal = ResultJournal(get_journal_path()) if listing_db is None else None
+
+    def store_details(result_idx: int, details: Dict[str, Any]):
+        if listing_db is not None:
+            listing_db.add_details(plan.url(result_idx), details)
+        else:
+            journal.append(result_idx, details)
+
+    def sync_results():
+        """Сбрасывает результаты на диск: пачку в базу или журнал"""
+        if listing_db is not None:
+            listing_db.flush()
+        else:
+            journal.sync()
+
+    # Индексы, отправленные в пул, но еще не обработанные потребителем.
+    # Нужны чтобы last_index в прогрессе не перепрыгивал через незавершенные строки
+    in_flight: Set[int] = set()
+    last_dispatched = start_index - 1
+
+    def safe_last_index() -> int:
+        """Последний индекс, до которого все строки гарантированно обработаны"""
+        if in_flight:
+            return min(in_flight) - 1
+        return last_dispatched
+
+    # Таблицы файлов результатов между сборками журнала (повторная сборка того же файла - без чтения XLSX)
+    chunk_cache = create_chunk_cache(source_df)
+
+    def materialize_journal():
+        """Переносит журнал в XLSX и очищает его"""
+        journal.sync()
+        materialize_results(source_df, journal.path, chunk_cache)
+        journal.reset()
+
+    # Окно параллельности подстраивается под 429/5xx и задержки
+    controller = AIMDController(
+        initial=CONCURRENT_REQUESTS,
+        min_limit=MIN_CONCURRENT_REQUESTS,
+        max_limit=MAX_CONCURRENT_REQUESTS,
+    )
 
     # Асинхронная сессия
-    connector = aiohttp.TCPConnector(limit=CONCURRENT_REQUESTS, limit_per_host=CONCURRENT_REQUESTS)
+    connector = aiohttp.TCPConnector(limit=MAX_CONCURRENT_REQUESTS, limit_per_host=MAX_CONCURRENT_REQUESTS)
     timeout = aiohttp.ClientTimeout(total=30)
 
-    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                     trace_configs=[controller.trace_config()]) as session:
+        worker = partial(scrape_listing_details, session)
+
         try:
-            # ===== ЭТАП 1: ОСНОВНОЙ ПАРСИНГ ДО КОНЦА =====
+            # ===== ОСНОВНОЙ ПАРСИНГ + ПОВТОРЫ ОШИБОК ПО ГРАФИКУ =====
             print(f"{'='*80}")
-            print("ЭТАП 1: ОСНОВНОЙ ПАРСИНГ ДО КОНЦА")
+            print("ОСНОВНОЙ ПАРСИНГ (ошибки повторяются по мере наступления их времени)")
             print(f"{'='*80}\n")
 
-            batch_tasks = []
-            idx = start_index
-
-            while idx < len(source_df):
-                row = source_df.iloc[idx]
-                status = row.get('status', '')
-                url = row.get('url', '')
-
-                # Пропускаем не "Найдено"
-                if status != 'Найдено':
-                    skipped += 1
-                    idx += 1
-                    continue
-
-                if not url:
-                    skipped += 1
-                    idx += 1
-                    continue
-
-                # Добавляем в батч
-                batch_tasks.append((idx, url))
-
-                # Когда батч заполнен - обрабатываем
-                if len(batch_tasks) >= CONCURRENT_REQUESTS:
-                    results = await process_batch(session, batch_tasks)
-
-                    # Обрабатываем результаты
-                    for result_idx, details in results:
-                        # Определяем файл для этой записи
-                        file_number = get_file_number(result_idx)
-
-                        # Загружаем chunk если нужно
-                        if file_number != current_chunk_number:
-                            # Сохраняем предыдущий chunk
-                            if current_chunk_df is not None and current_chunk_number is not None:
-                                file_path = get_file_path(current_chunk_number)
-                                current_chunk_df.to_excel(file_path, index=False)
-
-                            # Загружаем новый chunk
-                            current_chunk_number = file_number
-                            current_chunk_df = load_or_create_chunk_file(file_number, source_df)
-
-                        # Записываем результат
-                        chunk_idx = result_idx % CHUNK_SIZE
-
-                        if details:
-                            for key, value in details.items():
-                                current_chunk_df.at[chunk_idx, key] = value
-                            successful += 1
-
-                            # Убираем из списка ошибок если была там
-                            if result_idx in failed_indices:
-                                failed_indices.remove(result_idx)
-                                failed -= 1
-
-                            # Улучшенный вывод прогресса
-                            total_processed = successful + failed
-                            progress_pct = (result_idx / len(source_df)) * 100
-                            success_rate = (successful / total_processed * 100) if total_processed > 0 else 0
-
-                            car_name = source_df.iloc[result_idx].get('car_name', 'N/A')
-                            vin = details.get('vin_full', 'N/A')[:8] if details.get('vin_full') else 'N/A'
-                            views = details.get('views_count', 'N/A')
-
-                            print(f"[{result_idx + 1:,}/{len(source_df):,}] ({progress_pct:.1f}%) ✓ {car_name} | VIN: {vin}... | Просмотры: {views} | Успешно: {successful:,} | Ошибок: {failed:,} | Success Rate: {success_rate:.1f}%")
-                        else:
-                            failed += 1
-                            failed_indices.add(result_idx)
-
-                            total_processed = successful + failed
-                            progress_pct = (result_idx / len(source_df)) * 100
-                            success_rate = (successful / total_processed * 100) if total_processed > 0 else 0
-
-                            car_name = source_df.iloc[result_idx].get('car_name', 'N/A')
-                            print(f"[{result_idx + 1:,}/{len(source_df):,}] ({progress_pct:.1f}%) ✗ {car_name} | Успешно: {successful:,} | Ошибок: {failed:,} | Success Rate: {success_rate:.1f}%")
-
-                        # Сохраняем прогресс
-                        if successful % SAVE_BATCH_SIZE == 0:
-                            save_progress(result_idx, successful, failed, skipped, failed_indices, retry_attempt)
-                            if current_chunk_df is not None and current_chunk_number is not None:
-                                file_path = get_file_path(current_chunk_number)
-                                current_chunk_df.to_excel(file_path, index=False)
+            # Аренду диапазона перехватил другой процесс - прекращаем выдачу строк
+            lease_lost = False
+
+            async def all_tasks(first_index: int, end_index: int):
+                """
+                Лениво выдает (idx, url) строк плана из [first_index, end_index): перед
+                каждой новой строкой - повторы, чье время наступило. После конца основного
+                прохода ждет оставшиеся повторы, пока очередь не опустеет.
+                """
+                nonlocal skipped, gone, last_dispatched
+
+                previous = first_index - 1
+                for idx in plan.indices_between(first_index, end_index):
+                    if lease_lost:
+                        return
+
+                    retry_task = retry_scheduler.pop_due()
+                    while retry_task is not None:
+                        yield retry_task
+                        retry_task = retry_scheduler.pop_due()
+
+                    # Строки между соседними строками плана - не "Найдено" или без URL
+                    skipped += idx - previous - 1
+                    previous = idx
+                    url = plan.url(idx)
+
+                    # Объявление удалено (404/410 в прошлых запусках)
+                    if dead_ledger.is_dead_url(url):
+                        gone += 1
+                        last_dispatched = idx
+                        continue
 
-                                # Расчет ETA
-                                elapsed = time.time() - start_time
-                                items_per_sec = successful / elapsed if elapsed > 0 else 0
-                                remaining_items = len(rows_to_process) - successful
-                                eta_seconds = remaining_items / items_per_sec if items_per_sec > 0 else 0
-                                eta_hours = eta_seconds / 3600
+                    # Строка уже ждет повтора (ошибка до перезапуска) - ее выдаст очередь
+                    if idx in retry_scheduler:
+                        last_dispatched = idx
+                        continue
 
-                                print(f"    💾 Прогресс сохранен | Успешно: {successful:,} | Ошибок: {failed:,} | Скорость: {items_per_sec:.1f} items/sec | ETA: {eta_hours:.1f}ч")
+                    in_flight.add(idx)
+                    last_dispatched = idx
+                    yield (idx, url)
 
-                    batch_tasks = []
+                if lease_lost:
+                    return
+                skipped += end_index - previous - 1
+                last_dispatched = max(last_dispatched, end_index - 1)
 
-                    # Небольшая пауза между батчами
-                    await asyncio.sleep(random.uniform(0.3, 0.7))
+                print(f"\n✅ Основной проход выдан полностью | В очереди повторов: {len(retry_scheduler):,}")
 
-                idx += 1
+                while (len(retry_scheduler) > 0 or in_flight) and not lease_lost:
+                    retry_task = retry_scheduler.pop_due()
+                    if retry_task is not None:
+                        yield retry_task
+                        continue
 
-            # Обрабатываем оставшиеся задачи
-            if batch_tasks:
-                results = await process_batch(session, batch_tasks)
+                    # Ждем ближайший повтор (или результаты строк в работе)
+                    next_due = retry_scheduler.next_due_in()
+                    await asyncio.sleep(min(next_due, 1.0) if next_due is not None else 0.5)
 
-                for result_idx, details in results:
-                    file_number = get_file_number(result_idx)
-
-                    if file_number != current_chunk_number:
-                        if current_chunk_df is not None and current_chunk_number is not None:
-                            file_path = get_file_path(current_chunk_number)
-                            current_chunk_df.to_excel(file_path, index=False)
+            def handle_result(result: Tuple[int, Union[Dict[str, Any], Failure]]):
+                nonlocal successful, failed, gone
 
-                        current_chunk_number = file_number
-                        current_chunk_df = load_or_create_chunk_file(file_number, source_df)
+                result_idx, details = result
+                in_flight.discard(result_idx)
+                is_retry = result_idx in retry_scheduler
+                attempt = retry_scheduler.attempts(result_idx) + 1
+                car_name = plan.name(result_idx)
 
-                    chunk_idx = result_idx % CHUNK_SIZE
+                if not isinstance(details, Failure):
+                    store_details(result_idx, details)
+                    successful += 1
+                    retry_scheduler.discard(result_idx)
 
-                    if details:
-                        for key, value in details.items():
-                            current_chunk_df.at[chunk_idx, key] = value
-                        successful += 1
+                    # Убираем из списка ошибок если была там
+                    if result_idx in failed_indices:
+                        failed_indices.remove(result_idx)
+                        failed -= 1
 
-                        if result_idx in failed_indices:
-                            failed_indices.remove(result_idx)
-                            failed -= 1
+                    vin = details.get('vin_full', 'N/A')[:8] if details.get('vin_full') else 'N/A'
 
+                    if is_retry:
+                        print(f"[Retry #{attempt}] ✓ {car_name} | VIN: {vin}... | Осталось ошибок: {len(failed_indices):,} | В очереди повторов: {retry_scheduler.pending():,}")
+                    else:
+                        # Улучшенный вывод прогресса
                         total_processed = successful + failed
                         progress_pct = (result_idx / len(source_df)) * 100
                         success_rate = (successful / total_processed * 100) if total_processed > 0 else 0
-
-                        car_name = source_df.iloc[result_idx].get('car_name', 'N/A')
-                        vin = details.get('vin_full', 'N/A')[:8] if details.get('vin_full') else 'N/A'
                         views = details.get('views_count', 'N/A')
 
                         print(f"[{result_idx + 1:,}/{len(source_df):,}] ({progress_pct:.1f}%) ✓ {car_name} | VIN: {vin}... | Просмотры: {views} | Успешно: {successful:,} | Ошибок: {failed:,} | Success Rate: {success_rate:.1f}%")
-                    else:
-                        failed += 1
-                        failed_indices.add(result_idx)
 
-                        total_processed = successful + failed
-                        progress_pct = (result_idx / len(source_df)) * 100
-                        success_rate = (successful / total_processed * 100) if total_processed > 0 else 0
-
-                        car_name = source_df.iloc[result_idx].get('car_name', 'N/A')
-                        print(f"[{result_idx + 1:,}/{len(source_df):,}] ({progress_pct:.1f}%) ✗ {car_name} | Успешно: {successful:,} | Ошибок: {failed:,} | Success Rate: {success_rate:.1f}%")
-
-            # Сохраняем после основного парсинга
-            if current_chunk_df is not None and current_chunk_number is not None:
-                file_path = get_file_path(current_chunk_number)
-                current_chunk_df.to_excel(file_path, index=False)
-
-            save_progress(len(source_df) - 1, successful, failed, skipped, failed_indices, retry_attempt)
+                    # Сохраняем прогресс
+                    if successful % SAVE_BATCH_SIZE == 0:
+                        # Сначала результаты на диск: прогресс не должен опережать их
+                        sync_results()
+                        save_progress(safe_last_index(), successful, failed, skipped, failed_indices,
+                                      retry_scheduler.to_list(), controller.snapshot(), gone)
+
+                        # Расчет ETA
+                        elapsed = time.time() - start_time
+                        items_per_sec = successful / elapsed if elapsed > 0 else 0
+                        remaining_items = plan.fetch_count - successful
+                        eta_seconds = remaining_items / items_per_sec if items_per_sec > 0 else 0
+                        eta_hours = eta_seconds / 3600
+
+                        print(f"    💾 Прогресс сохранен | Успешно: {successful:,} | Ошибок: {failed:,} | Повторов в очереди: {retry_scheduler.pending():,} | Скорость: {items_per_sec:.1f} items/sec | Окно: {controller.window} | ETA: {eta_hours:.1f}ч")
+                    return
+
+                failure = details
+                url = plan.url(result_idx)
+
+                if failure.is_permanent:
+                    # Удаленное объявление: в реестр, без повторов и без учета в ошибках
+                    dead_ledger.mark_url(url, failure)
+                    gone += 1
+                    retry_scheduler.discard(result_idx)
+                    if result_idx in failed_indices:
+                        failed_indices.remove(result_idx)
+                        failed -= 1
+                    print(f"[{result_idx + 1:,}/{len(source_df):,}] 🪦 {car_name} | удалено ({failure.reason}) | Удаленных: {gone:,}")
+                    return
+
+                if result_idx not in failed_indices:
+                    failed += 1
+                    failed_indices.add(result_idx)
+
+                if failure.is_retryable:
+                    delay = retry_scheduler.schedule(result_idx, url, attempt)
+                else:
+                    # Ошибка разбора повторится и при повторной загрузке
+                    retry_scheduler.discard(result_idx)
+                    delay = None
+
+                if delay is not None:
+                    retry_note = f"{failure.reason}, повтор через {delay:.0f}с"
+                elif failure.is_retryable:
+                    retry_note = f"{failure.reason}, попытки исчерпаны ({attempt}/{MAX_RETRY_ATTEMPTS})"
+                else:
+                    retry_note = f"{failure.reason}, без повторов"
+
+                if is_retry:
+                    print(f"[Retry #{attempt}] ✗ {car_name} | {retry_note} | Осталось ошибок: {len(failed_indices):,}")
+                else:
+                    total_processed = successful + failed
+                    progress_pct = (result_idx / len(source_df)) * 100
+                    success_rate = (successful / total_processed * 100) if total_processed > 0 else 0
+
+                    print(f"[{result_idx + 1:,}/{len(source_df):,}] ({progress_pct:.1f}%) ✗ {car_name} | {retry_note} | Успешно: {successful:,} | Ошибок: {failed:,} | Success Rate: {success_rate:.1f}%")
+
+            async def keep_lease(range_id: int):
+                """Продлевает аренду, пока диапазон в работе"""
+                nonlocal lease_lost
+                while True:
+                    await asyncio.sleep(LEASE_TTL / 3)
+                    # В потоке: SQLite может ждать блокировку до 60с, загрузки в это время идут
+                    if not await asyncio.to_thread(lease.heartbeat, range_id):
+                        lease_lost = True
+                        print(f"⚠️  Аренду диапазона #{range_id} забрал другой процесс, останавливаем его")
+                        return
+
+            async def run_leased_ranges():
+                """Берет диапазоны в аренду один за другим и прогоняет каждый через пул"""
+                nonlocal last_dispatched, lease_lost, retry_scheduler
+                nonlocal successful, failed, skipped, gone, failed_indices
+
+                total_ranges = lease.init_ranges(len(source_df), CHUNK_SIZE, first_index=START_INDEX)
+                print(f"📋 Диапазонов: {total_ranges} по {CHUNK_SIZE:,} строк | {lease.summary()}")
+
+                while True:
+                    leased = lease.acquire()
+                    if leased is None:
+                        break
+
+                    range_id, range_start, range_end = leased
+                    print(f"\n🔐 Диапазон #{range_id}: строки {range_start:,}-{range_end - 1:,}")
+
+                    range_successful, range_failed = successful, len(failed_indices)
+                    # Счетчики до диапазона: при потере аренды его работу засчитает новый владелец
+                    range_counters = (successful, failed, skipped, gone, set(failed_indices))
+                    last_dispatched = range_start - 1
+                    lease_lost = False
+                    completed = False
+                    heartbeat = asyncio.ensure_future(keep_lease(range_id))
+                    try:
+                        await run_worker_pool(all_tasks(range_start, range_end), worker, handle_result,
+                                              MAX_CONCURRENT_REQUESTS, controller)
+
+                        if lease_lost:
+                            # Диапазон пересчитает новый владелец - свои результаты и счетчики выбрасываем
+                            journal.reset()
+                            successful, failed, skipped, gone, failed_indices = range_counters
+                            in_flight.clear()
+                            retry_scheduler = RetryScheduler(MAX_RETRY_ATTEMPTS, RETRY_BASE_DELAY, RETRY_MAX_DELAY)
+                            continue
+
+                        # В журнале только этот диапазон: прошлые уже перенесены в XLSX
+                        materialize_journal()
+                        completed = lease.complete(range_id, successful - range_successful,
+                                                   len(failed_indices) - range_failed)
+                        save_progress(safe_last_index(), successful, failed, skipped, failed_indices,
+                                      retry_scheduler.to_list(), controller.snapshot(), gone)
+                        print(f"✅ Диапазон #{range_id} готов | {lease.summary()}")
+                    finally:
+                        heartbeat.cancel()
+                        if not completed and not lease_lost:
+                            lease.release(range_id)
+
+            if lease is None:
+                await run_worker_pool(all_tasks(start_index, len(source_df)), worker, handle_result,
+                                      MAX_CONCURRENT_REQUESTS, controller)
+            else:
+                await run_leased_ranges()
 
             print(f"\n{'='*80}")
-            print("ЭТАП 1 ЗАВЕРШЕН!")
+            print("ПАРСИНГ ЗАВЕРШЕН!")
             print(f"{'='*80}")
-            print(f"Успешно: {successful:,} | Ошибок: {len(failed_indices):,}")
-
-            # ===== ЭТАП 2: ПОВТОРНАЯ ОБРАБОТКА ОШИБОК =====
-            while len(failed_indices) > 0 and retry_attempt < MAX_RETRY_ATTEMPTS:
-                retry_attempt += 1
-
-                print(f"\n{'='*80}")
-                print(f"ЭТАП 2: ПОВТОРНАЯ ОБРАБОТКА ОШИБОК (Попытка {retry_attempt}/{MAX_RETRY_ATTEMPTS})")
-                print(f"{'='*80}")
-                print(f"Ошибок для обработки: {len(failed_indices):,}")
-                print(f"{'='*80}\n")
-
-                # Преобразуем в список для итерации
-                failed_list = sorted(list(failed_indices))
-                batch_tasks = []
-                processed_count = 0
-
-                for idx in failed_list:
-                    row = source_df.iloc[idx]
-                    url = row.get('url', '')
-
-                    if not url:
-                        continue
-
-                    # Добавляем в батч
-                    batch_tasks.append((idx, url))
-
-                    # Когда батч заполнен - обрабатываем
-                    if len(batch_tasks) >= CONCURRENT_REQUESTS:
-                        results = await process_batch(session, batch_tasks)
-
-                        # Обрабатываем результаты
-                        for result_idx, details in results:
-                            processed_count += 1
-
-                            file_number = get_file_number(result_idx)
-
-                            if file_number != current_chunk_number:
-                                if current_chunk_df is not None and current_chunk_number is not None:
-                                    file_path = get_file_path(current_chunk_number)
-                                    current_chunk_df.to_excel(file_path, index=False)
-
-                                current_chunk_number = file_number
-                                current_chunk_df = load_or_create_chunk_file(file_number, source_df)
-
-                            chunk_idx = result_idx % CHUNK_SIZE
-
-                            if details:
-                                for key, value in details.items():
-                                    current_chunk_df.at[chunk_idx, key] = value
-                                successful += 1
-                                failed -= 1
-                                failed_indices.remove(result_idx)
-
-                                car_name = source_df.iloc[result_idx].get('car_name', 'N/A')
-                                vin = details.get('vin_full', 'N/A')[:8] if details.get('vin_full') else 'N/A'
-                                views = details.get('views_count', 'N/A')
-
-                                print(f"[Retry {processed_count:,}/{len(failed_list):,}] ✓ {car_name} | VIN: {vin}... | Осталось ошибок: {len(failed_indices):,}")
-                            else:
-                                car_name = source_df.iloc[result_idx].get('car_name', 'N/A')
-                                print(f"[Retry {processed_count:,}/{len(failed_list):,}] ✗ {car_name} | Осталось ошибок: {len(failed_indices):,}")
-
-                            # Сохраняем прогресс
-                            if processed_count % SAVE_BATCH_SIZE == 0:
-                                save_progress(result_idx, successful, failed, skipped, failed_indices, retry_attempt)
-                                if current_chunk_df is not None and current_chunk_number is not None:
-                                    file_path = get_file_path(current_chunk_number)
-                                    current_chunk_df.to_excel(file_path, index=False)
-                                    print(f"    💾 Прогресс сохранен | Успешно: {successful:,} | Ошибок: {len(failed_indices):,}")
-
-                        batch_tasks = []
-                        await asyncio.sleep(random.uniform(0.5, 1.0))  # Немного больше пауза при ретраях
-
-                # Обрабатываем оставшиеся
-                if batch_tasks:
-                    results = await process_batch(session, batch_tasks)
-
-                    for result_idx, details in results:
-                        processed_count += 1
-
-                        file_number = get_file_number(result_idx)
-
-                        if file_number != current_chunk_number:
-                            if current_chunk_df is not None and current_chunk_number is not None:
-                                file_path = get_file_path(current_chunk_number)
-                                current_chunk_df.to_excel(file_path, index=False)
-
-                            current_chunk_number = file_number
-                            current_chunk_df = load_or_create_chunk_file(file_number, source_df)
-
-                        chunk_idx = result_idx % CHUNK_SIZE
-
-                        if details:
-                            for key, value in details.items():
-                                current_chunk_df.at[chunk_idx, key] = value
-                            successful += 1
-                            failed -= 1
-                            failed_indices.remove(result_idx)
-
-                            car_name = source_df.iloc[result_idx].get('car_name', 'N/A')
-                            vin = details.get('vin_full', 'N/A')[:8] if details.get('vin_full') else 'N/A'
-                            views = details.get('views_count', 'N/A')
-
-                            print(f"[Retry {processed_count:,}/{len(failed_list):,}] ✓ {car_name} | VIN: {vin}... | Осталось ошибок: {len(failed_indices):,}")
-                        else:
-                            car_name = source_df.iloc[result_idx].get('car_name', 'N/A')
-                            print(f"[Retry {processed_count:,}/{len(failed_list):,}] ✗ {car_name} | Осталось ошибок: {len(failed_indices):,}")
-
-                # Сохраняем после каждого прохода по ошибкам
-                if current_chunk_df is not None and current_chunk_number is not None:
-                    file_path = get_file_path(current_chunk_number)
-                    current_chunk_df.to_excel(file_path, index=False)
-
-                save_progress(len(source_df) - 1, successful, failed, skipped, failed_indices, retry_attempt)
-
-                print(f"\n{'='*80}")
-                print(f"ПОПЫТКА {retry_attempt} ЗАВЕРШЕНА")
-                print(f"{'='*80}")
-                print(f"Успешно обработано в этой попытке: {len(failed_list) - len(failed_indices):,}")
-                print(f"Осталось ошибок: {len(failed_indices):,}")
+            print(f"Успешно: {successful:,} | Ошибок после всех попыток: {len(failed_indices):,}")
 
         except KeyboardInterrupt:
             print("\n\n⚠ ПРЕРВАНО ПОЛЬЗОВАТЕЛЕМ")
 
         finally:
-            # Финальное сохранение
-            if current_chunk_df is not None and current_chunk_number is not None:
-                file_path = get_file_path(current_chunk_number)
-                current_chunk_df.to_excel(file_path, index=False)
-
-            save_progress(len(source_df) - 1, successful, failed, skipped, failed_indices, retry_attempt)
+            # Финальное сохранение: прогресс, затем XLSX из журнала (в режиме --db
+            # детали уже в базе)
+            sync_results()
+            save_progress(safe_last_index(), successful, failed, skipped, failed_indices,
+                          retry_scheduler.to_list(), controller.snapshot(), gone)
+            if journal is not None and lease is None:
+                materialize_journal()
+                journal.close()
+            elif journal is not None:
+                # Готовые диапазоны уже в XLSX; в журнале - только отпущенный
+                # или отобранный диапазон, его пересчитает другой процесс
+                journal.close()
+                os.remove(journal.path)
 
             # Финальная статистика
             elapsed_time = time.time() - start_time
@@ -683,13 +701,131 @@ async def main():
             print(f"Всего строк:           {len(source_df):,}")
             print(f"✓ Успешно обработано:  {successful:,}")
             print(f"✗ Финальных ошибок:    {len(failed_indices):,}")
+            print(f"🔁 В очереди повторов:  {len(retry_scheduler):,}")
             print(f"○ Пропущено:           {skipped:,}")
+            print(f"🪦 Удаленных объявлений: {gone:,}")
+            if lease is not None:
+                print(f"🔐 Диапазоны аренды:    {lease.summary()}")
+            state_summary = state_fallback_summary()
+            if state_summary:
+                print(f"🧾 --extract state:     {state_summary}")
             print(f"\n⏱️  Время выполнения:    {elapsed_hours:.2f} часов")
             print(f"⚡ Скорость:             {items_per_hour:.0f} items/час")
-            print(f"🔄 Попыток сделано:     {retry_attempt}")
             print(f"\nФайлы сохранены в: {SCRIPT_DIR}")
             print('=' * 80)
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description='Детальный парсер объявлений с авто-повтором ошибок')
+    parser.add_argument('--input', default=None,
+                        help=f'входной файл объявлений в папке скрипта (по умолчанию {INPUT_FILE_NAME})')
+    parser.add_argument('--lease', action='store_true',
+                        help='брать строки диапазонами из общей базы аренды (несколько процессов/машин)')
+    parser.add_argument('--lease-db', default=None,
+                        help='база аренды SQLite (по умолчанию <префикс>_leases.sqlite в папке скрипта)')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='запустить N процессов в режиме --lease и дождаться их')
+    parser.add_argument('--rps', type=float, default=None,
+                        help=f'бюджет запросов в секунду для этого процесса (по умолчанию {REQUESTS_PER_SECOND})')
+    parser.add_argument('--materialize', action='store_true',
+                        help='собрать XLSX из журнала результатов и выйти (можно во время обхода)')
+    add_parser_arguments(parser)
+    add_store_arguments(parser)
+    add_db_arguments(parser)
+    add_parquet_arguments(parser)
+    args = parser.parse_args()
+
+    if args.db and (args.lease or args.workers or args.materialize or args.parquet):
+        parser.error('--db работает в одном процессе и пишет детали в базу: '
+                     'несовместим с --lease/--workers/--materialize/--parquet')
+
+    if args.input:
+        # drom_scraped_data_delta_20250101.xlsx -> drom_full_scraper_delta_20250101_N.xlsx,
+        # чтобы дельта не перезаписала файлы полного обхода
+        INPUT_FILE_NAME = os.path.basename(args.input)
+        stem = os.path.splitext(INPUT_FILE_NAME)[0].replace('drom_scraped_data_', '', 1)
+        OUTPUT_PREFIX = f'drom_full_scraper_{stem}'
+        START_INDEX = 0
+
+    PARQUET_DIR = parquet_dir_from_args(args, SCRIPT_DIR)
+    PARTITION_BY_DATE = args.partition_by_date
+
+    if args.materialize:
+        journal_path = get_journal_path()
+        print(f"📗 Сборка результатов из журнала {os.path.basename(journal_path)}")
+        count = materialize_results(read_excel_cached(os.path.join(SCRIPT_DIR, INPUT_FILE_NAME)), journal_path)
+        print(f"✅ Перенесено записей: {count:,}")
+        sys.exit(0)
+
+    lease_db = args.lease_db or os.path.join(SCRIPT_DIR, f'{OUTPUT_PREFIX}_leases.sqlite')
+
+    if args.workers > 0:
+        # Запускаем N копий скрипта в режиме аренды; бюджет запросов и процессы разбора делим между ними
+        rps = (args.rps or REQUESTS_PER_SECOND) / args.workers
+        parse_workers = args.parse_workers // args.workers
+        child_args = [sys.executable, os.path.abspath(__file__), '--lease', '--lease-db', lease_db, '--rps', str(rps)]
+        if args.input:
+            child_args += ['--input', args.input]
+        if args.store_html:
+            child_args.append('--store-html')
+        if args.replay:
+            child_args.append('--replay')
+        if args.store_dir:
+            child_args += ['--store-dir', args.store_dir]
+        if PARQUET_DIR:
+            child_args += ['--parquet', PARQUET_DIR]
+        if PARTITION_BY_DATE:
+            child_args.append('--partition-by-date')
+        child_args += ['--parser', args.parser, '--extract', args.extract, '--parse-workers', str(parse_workers)]
+
+        print(f"🚀 Запуск {args.workers} процессов по {rps:.1f} запросов/сек, база аренды: {lease_db}")
+        processes = []
+        for i in range(args.workers):
+            log_path = os.path.join(SCRIPT_DIR, f'{OUTPUT_PREFIX}_shard_worker_{i + 1}.log')
+            log_file = open(log_path, 'w', encoding='utf-8')
+            processes.append((subprocess.Popen(child_args, stdout=log_file, stderr=subprocess.STDOUT), log_file))
+            print(f"   👷 Процесс {i + 1}: лог {os.path.basename(log_path)}")
+
+        try:
+            exit_codes = [process.wait() for process, _ in processes]
+        except KeyboardInterrupt:
+            # Дети получили тот же Ctrl+C и вернут свои диапазоны в очередь
+            exit_codes = [process.wait() for process, _ in processes]
+        finally:
+            for _, log_file in processes:
+                log_file.close()
+
+        print(f"🏁 Процессы завершились, коды выхода: {exit_codes}")
+        sys.exit(max(exit_codes))
+
+    if args.rps:
+        rate_limiter = HostRateLimiter(rate=args.rps, burst=REQUESTS_BURST)
+
+    PARSER_BACKEND = backend_from_args(args)
+    PARSER_EXTRACT = args.extract
+    response_store = store_from_args(args, SCRIPT_DIR)
+    listing_db = db_from_args(args, SCRIPT_DIR)
+    if listing_db is not None:
+        # Строки базы нумеруются с нуля; прогресс отдельно от обхода по XLSX
+        OUTPUT_PREFIX = f'{OUTPUT_PREFIX}_db'
+        START_INDEX = 0
+    parse_executor = create_parse_executor(args.parse_workers)
+
+    try:
+        if args.lease:
+            # Один диапазон аренды = один файл результатов; файлы отдельные от обычного запуска
+            CHUNK_SIZE = LEASE_RANGE_SIZE
+            OUTPUT_PREFIX = f'{OUTPUT_PREFIX}_shard'
+            lease = LeaseCoordinator(lease_db, lease_ttl=LEASE_TTL)
+            WORKER_ID = lease.worker_id
+            try:
+                asyncio.run(main(lease))
+            finally:
+                lease.close()
+        else:
+            asyncio.run(main())
+    finally:
+        if parse_executor is not None:
+            parse_executor.shutdown(cancel_futures=True)
+        if listing_db is not None:
+            listing_db.close()
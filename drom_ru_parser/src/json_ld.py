@@ -0,0 +1,85 @@
+"""
+БЫСТРОЕ ИЗВЛЕЧЕНИЕ JSON-LD ИЗ СТРАНИЦ ВЫДАЧИ
+- Блоки <script type="application/ld+json"> находятся поиском по строке,
+  без построения DOM всей страницы
+- Декодирование через orjson, если установлен, иначе стандартный json
+- car_listing_from_json_ld - единый формат объявления для database_parser
+  и parse_skipped_models
+"""
+
+import json
+import re
+from typing import Any, Dict, Iterator, List, Optional
+
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    orjson = None
+    json_loads = json.loads
+
+JSON_LD_TYPE = 'application/ld+json'
+
+SCRIPT_OPEN_TAG = '<script'
+SCRIPT_CLOSE_RE = re.compile(r'</script\s*>', re.I)
+TYPE_ATTR_RE = re.compile(r'\btype\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))', re.I)
+
+
+def iter_json_ld_blocks(html: str) -> Iterator[str]:
+    """Содержимое всех <script type="application/ld+json"> в порядке документа"""
+    pos = html.find(JSON_LD_TYPE)
+    while pos != -1:
+        tag_start = html.rfind(SCRIPT_OPEN_TAG, 0, pos)
+        tag_end = html.find('>', pos)
+        next_pos = pos + len(JSON_LD_TYPE)
+
+        # Строка должна стоять в атрибуте type открывающего тега <script ...>
+        if tag_start != -1 and tag_end != -1 and html.find('>', tag_start, pos) == -1:
+            type_match = TYPE_ATTR_RE.search(html, tag_start, tag_end + 1)
+            if type_match and ''.join(type_match.groups('')) == JSON_LD_TYPE:
+                close = SCRIPT_CLOSE_RE.search(html, tag_end + 1)
+                if close is None:
+                    return
+                yield html[tag_end + 1:close.start()]
+                next_pos = close.end()
+
+        pos = html.find(JSON_LD_TYPE, next_pos)
+
+
+def car_listing_from_json_ld(data: Any) -> Optional[Dict[str, Any]]:
+    """Объявление из JSON-LD объекта @type=Car (None - это не объявление)"""
+    if not isinstance(data, dict) or data.get('@type') != 'Car':
+        return None
+
+    return {
+        'name': data.get('name', ''),
+        'brand': data.get('brand', {}).get('name', ''),
+        'model': data.get('model', ''),
+        'year': data.get('vehicleModelDate', ''),
+        'price': data.get('offers', {}).get('price'),
+        'currency': data.get('offers', {}).get('priceCurrency', 'RUB'),
+        'url': data.get('offers', {}).get('url', ''),
+        'image': data.get('image', {}).get('url', ''),
+        'mileage': data.get('mileageFromOdometer', {}).get('value'),
+        'vin': data.get('vehicleIdentificationNumber', ''),
+    }
+
+
+def parse_car_listings(html: str) -> List[Dict[str, Any]]:
+    """Все объявления (JSON-LD Car) со страницы выдачи"""
+    listings = []
+
+    for block in iter_json_ld_blocks(html):
+        if not block.strip():
+            continue
+
+        try:
+            listing = car_listing_from_json_ld(json_loads(block))
+        except Exception:
+            # Битый JSON или неожиданная структура полей - пропускаем блок
+            continue
+
+        if listing is not None:
+            listings.append(listing)
+
+    return listings
@@ -0,0 +1,101 @@
+"""
+ИЗВЕСТНЫЕ ОБЪЯВЛЕНИЯ ДЛЯ ИНКРЕМЕНТАЛЬНОГО ОБХОДА
+- Собирает URL и bulletin_id из результатов прошлых запусков
+- Выдача drom отсортирована от новых к старым, поэтому страница,
+  где все объявления уже известны, означает конец новых объявлений
+"""
+
+import glob
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+import pandas as pd
+
+from excel_cache import read_excel_cached
+
+# Файлы прошлых запусков, из которых берутся известные объявления
+KNOWN_SOURCE_PATTERNS = [
+    'drom_scraped_data_progress*.xlsx',
+    'drom_scraped_data_delta_*.xlsx',
+    'drom_full_scraper_*.xlsx',
+]
+
+# Номер объявления в URL: https://auto.drom.ru/<город>/<бренд>/<модель>/123456789.html
+BULLETIN_ID_RE = re.compile(r'/(\d+)\.html')
+
+
+def bulletin_id_from_url(url: str) -> Optional[str]:
+    """Номер объявления из URL (совпадает с bulletin_id детальной страницы)"""
+    match = BULLETIN_ID_RE.search(url or '')
+    return match.group(1) if match else None
+
+
+class KnownListings:
+    """Множество уже собранных объявлений: по URL и по номеру объявления"""
+
+    def __init__(self):
+        self.urls: Set[str] = set()
+        self.bulletin_ids: Set[str] = set()
+
+    def add(self, url: Any = None, bulletin_id: Any = None):
+        if isinstance(url, str) and url:
+            self.urls.add(url)
+            if bulletin_id is None or pd.isna(bulletin_id) or bulletin_id == '':
+                bulletin_id = bulletin_id_from_url(url)
+
+        if bulletin_id is None or pd.isna(bulletin_id) or bulletin_id == '':
+            return
+
+        # В Excel номер объявления читается как число
+        self.bulletin_ids.add(str(int(bulletin_id)) if isinstance(bulletin_id, float) else str(bulletin_id))
+
+    def is_known(self, listing: Dict[str, Any]) -> bool:
+        """Объявление (из JSON-LD выдачи) уже встречалось в прошлых запусках"""
+        url = listing.get('url', '')
+        if url in self.urls:
+            return True
+        bulletin_id = bulletin_id_from_url(url)
+        return bulletin_id is not None and bulletin_id in self.bulletin_ids
+
+    def filter_new(self, listings: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return [listing for listing in listings if not self.is_known(listing)]
+
+    def __len__(self) -> int:
+        return len(self.urls)
+
+
+def load_known_listings(script_dir: str, exclude: Iterable[str] = ()) -> KnownListings:
+    """
+    Читает url/bulletin_id из файлов прошлых запусков в script_dir.
+    exclude - файлы текущего запуска (их строки не считаются известными).
+    """
+    known = KnownListings()
+    excluded = {os.path.abspath(path) for path in exclude}
+
+    paths: List[str] = []
+    for pattern in KNOWN_SOURCE_PATTERNS:
+        paths.extend(glob.glob(os.path.join(script_dir, pattern)))
+
+    for path in sorted(set(paths)):
+        if os.path.abspath(path) in excluded or 'backup' in os.path.basename(path):
+            continue
+
+        try:
+            # Нужны только две колонки; снимок прошлых результатов читается без разбора XLSX
+            data = read_excel_cached(path, columns=['url', 'bulletin_id'])
+        except Exception as e:
+            print(f"   ⚠️ Не удалось прочитать {os.path.basename(path)}: {e}")
+            continue
+
+        if 'url' not in data.columns:
+            continue
+
+        before = len(known)
+        bulletin_ids = data['bulletin_id'] if 'bulletin_id' in data.columns else [None] * len(data)
+        for url, bulletin_id in zip(data['url'], bulletin_ids):
+            known.add(url, bulletin_id)
+
+        print(f"   📚 {os.path.basename(path)}: +{len(known) - before:,} объявлений")
+
+    return known
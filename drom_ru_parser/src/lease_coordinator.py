@@ -0,0 +1,196 @@
+"""
+КООРДИНАЦИЯ НЕСКОЛЬКИХ ПРОЦЕССОВ ЧЕРЕЗ SQLITE
+- Исходная таблица делится на диапазоны строк, диапазоны лежат в SQLite
+- Процесс берет диапазон в аренду (lease), продлевает ее heartbeat'ом
+  и отмечает диапазон выполненным по завершении
+- Аренда, которую не продлили вовремя (процесс упал или завис),
+  забирается другим процессом
+- Работает с нескольких машин через общую файловую систему: используется
+  обычный журнал SQLite (не WAL, он требует общей памяти на одной машине)
+- Методы можно вызывать из потоков (asyncio.to_thread): ожидание блокировки
+  SQLite не останавливает event loop; обращения к соединению идут по одному
+"""
+
+import os
+import socket
+import sqlite3
+import threading
+import time
+from functools import wraps
+from typing import Dict, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ranges (
+    range_id INTEGER PRIMARY KEY,
+    start_idx INTEGER NOT NULL,
+    end_idx INTEGER NOT NULL,
+    status TEXT NOT NULL DEFAULT 'pending',
+    owner TEXT,
+    lease_expires REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    successful INTEGER NOT NULL DEFAULT 0,
+    failed INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _locked(method):
+    """Одно обращение к соединению за раз: транзакции из разных потоков не перемешиваются"""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
+
+def default_worker_id() -> str:
+    """Уникальное имя процесса: хост + PID"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class LeaseCoordinator:
+    """Аренда диапазонов строк исходной таблицы между процессами"""
+
+    def __init__(self, db_path: str, lease_ttl: float = 120.0, worker_id: Optional[str] = None):
+        self.db_path = db_path
+        self.lease_ttl = lease_ttl
+        self.worker_id = worker_id or default_worker_id()
+
+        # isolation_level=None: транзакции открываем сами через BEGIN IMMEDIATE
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, timeout=60, isolation_level=None, check_same_thread=False)
+        self._conn.executescript(SCHEMA)
+
+    def _transaction(self):
+        """BEGIN IMMEDIATE сразу берет блокировку записи - две аренды одного диапазона невозможны"""
+        self._conn.execute('BEGIN IMMEDIATE')
+
+    @_locked
+    def init_ranges(self, total_rows: int, range_size: int, first_index: int = 0) -> int:
+        """
+        Создает диапазоны [first_index, total_rows) по range_size строк, если их еще нет.
+        Границы диапазонов выровнены по range_size, чтобы совпадать с файлами
+        результатов; первый диапазон начинается ровно с first_index (строки до
+        него уже обработаны) и заканчивается на ближайшей границе.
+        Возвращает число диапазонов.
+        """
+        self._transaction()
+        try:
+            meta = dict(self._conn.execute('SELECT key, value FROM meta').fetchall())
+            if meta:
+                if int(meta['total_rows']) != total_rows or int(meta['range_size']) != range_size:
+                    raise ValueError(
+                        f"База аренды создана для {meta['total_rows']} строк по {meta['range_size']}, "
+                        f"а сейчас {total_rows} строк по {range_size}. Удалите {self.db_path} или укажите другую."
+                    )
+            else:
+                aligned_start = (first_index // range_size) * range_size
+                self._conn.executemany(
+                    'INSERT INTO ranges (range_id, start_idx, end_idx) VALUES (?, ?, ?)',
+                    [(range_start // range_size + 1, max(range_start, first_index),
+                      min(range_start + range_size, total_rows))
+                     for range_start in range(aligned_start, total_rows, range_size)]
+                )
+                self._conn.executemany('INSERT INTO meta (key, value) VALUES (?, ?)', [
+                    ('total_rows', str(total_rows)),
+                    ('range_size', str(range_size)),
+                ])
+            self._conn.execute('COMMIT')
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+
+        return self._conn.execute('SELECT COUNT(*) FROM ranges').fetchone()[0]
+
+    @_locked
+    def acquire(self) -> Optional[Tuple[int, int, int]]:
+        """
+        Берет в аренду первый свободный диапазон или диапазон с истекшей арендой.
+        Возвращает (range_id, start_idx, end_idx) или None, если работы не осталось.
+        """
+        now = time.time()
+        self._transaction()
+        try:
+            row = self._conn.execute(
+                """
+                SELECT range_id, start_idx, end_idx, owner FROM ranges
+                WHERE status = 'pending' OR (status = 'leased' AND lease_expires < ?)
+                ORDER BY range_id LIMIT 1
+                """,
+                (now,)
+            ).fetchone()
+
+            if row is None:
+                self._conn.execute('COMMIT')
+                return None
+
+            range_id, start_idx, end_idx, previous_owner = row
+            self._conn.execute(
+                """
+                UPDATE ranges SET status = 'leased', owner = ?, lease_expires = ?,
+                                  attempts = attempts + 1, updated_at = ?
+                WHERE range_id = ?
+                """,
+                (self.worker_id, now + self.lease_ttl, now, range_id)
+            )
+            self._conn.execute('COMMIT')
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+
+        if previous_owner and previous_owner != self.worker_id:
+            print(f"♻️  Диапазон #{range_id} забран у {previous_owner} (аренда истекла)")
+        return range_id, start_idx, end_idx
+
+    @_locked
+    def heartbeat(self, range_id: int) -> bool:
+        """Продлевает аренду. False - аренду уже забрал другой процесс"""
+        now = time.time()
+        cursor = self._conn.execute(
+            """
+            UPDATE ranges SET lease_expires = ?, updated_at = ?
+            WHERE range_id = ? AND owner = ? AND status = 'leased'
+            """,
+            (now + self.lease_ttl, now, range_id, self.worker_id)
+        )
+        return cursor.rowcount == 1
+
+    @_locked
+    def complete(self, range_id: int, successful: int = 0, failed: int = 0) -> bool:
+        """Отмечает диапазон выполненным. False - аренду успел забрать другой процесс"""
+        cursor = self._conn.execute(
+            """
+            UPDATE ranges SET status = 'done', lease_expires = NULL, successful = ?, failed = ?, updated_at = ?
+            WHERE range_id = ? AND owner = ? AND status = 'leased'
+            """,
+            (successful, failed, time.time(), range_id, self.worker_id)
+        )
+        return cursor.rowcount == 1
+
+    @_locked
+    def release(self, range_id: int):
+        """Возвращает диапазон в очередь (процесс останавливается, не закончив его)"""
+        self._conn.execute(
+            """
+            UPDATE ranges SET status = 'pending', owner = NULL, lease_expires = NULL, updated_at = ?
+            WHERE range_id = ? AND owner = ? AND status = 'leased'
+            """,
+            (time.time(), range_id, self.worker_id)
+        )
+
+    @_locked
+    def summary(self) -> Dict[str, int]:
+        """Число диапазонов по статусам"""
+        counts = {'pending': 0, 'leased': 0, 'done': 0}
+        for status, count in self._conn.execute('SELECT status, COUNT(*) FROM ranges GROUP BY status'):
+            counts[status] = count
+        return counts
+
+    @_locked
+    def close(self):
+        self._conn.close()
@@ -0,0 +1,292 @@
+"""
+ХРАНИЛИЩЕ ОБЪЯВЛЕНИЙ В SQLITE (WAL)
+- Одна таблица listings на все скрипты: поля выдачи (database_parser,
+  parse_skipped_models) и детальные поля (full_parser_with_retry)
+- Строка адресуется номером объявления (из URL, он же bulletin_id), а не
+  позицией в XLSX-файле: объявление, переехавшее в другой город (другой URL),
+  остается той же строкой; повтор ошибки - одна индексированная запись
+- Upsert: поля выдачи и детальные поля обновляются независимо, одно не затирает другое
+- Модели без объявлений и ошибки моделей - в таблице models (по search_url)
+- Запись пачками: одна транзакция на пачку; WAL - читатели не мешают записи
+  (WAL требует одной машины: для общей ФС есть lease_coordinator)
+- Импорт/экспорт XLSX: python src/listing_db.py import|export|stats
+
+Запуск: python src/listing_db.py import drom_scraped_data_progress.xlsx drom_full_scraper_*.xlsx
+        python src/listing_db.py export drom_listings.xlsx
+"""
+
+import argparse
+import glob
+import os
+import sqlite3
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+from known_listings import KnownListings, bulletin_id_from_url
+from result_buffer import DETAIL_COLUMNS
+
+DEFAULT_DB_FILE = 'drom_listings.sqlite'
+DEFAULT_BATCH_SIZE = 200  # Детальных записей в одной транзакции
+
+# Поля выдачи (как в drom_scraped_data_progress.xlsx)
+LISTING_COLUMNS = [
+    'brand', 'model', 'start_year', 'finish_year', 'search_url', 'status',
+    'car_name', 'year', 'price', 'currency', 'url', 'mileage', 'vin', 'image_url',
+]
+
+MODEL_COLUMNS = ['search_url', 'brand', 'model', 'start_year', 'finish_year', 'status', 'total_ads']
+
+# Колонки без объявленного типа: SQLite хранит значение как пришло (текст, число)
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS listings (
+    listing_key TEXT PRIMARY KEY,
+    {', '.join(LISTING_COLUMNS + DETAIL_COLUMNS)},
+    listed_at REAL,
+    detailed_at REAL
+);
+CREATE INDEX IF NOT EXISTS listings_url ON listings (url);
+CREATE INDEX IF NOT EXISTS listings_brand_model ON listings (brand, model);
+CREATE TABLE IF NOT EXISTS models (
+    search_url TEXT PRIMARY KEY,
+    brand, model, start_year, finish_year, status,
+    total_ads INTEGER,
+    updated_at REAL
+);
+"""
+
+
+def listing_key(url: Any, bulletin_id: Any = None) -> Optional[str]:
+    """Ключ строки: номер объявления из URL, иначе bulletin_id, иначе сам URL"""
+    has_url = isinstance(url, str) and url
+    if has_url:
+        from_url = bulletin_id_from_url(url)
+        if from_url:
+            return from_url
+
+    if bulletin_id is not None and not pd.isna(bulletin_id) and bulletin_id != '':
+        # В Excel номер объявления читается как число
+        return str(int(bulletin_id)) if isinstance(bulletin_id, float) else str(bulletin_id)
+    return url if has_url else None
+
+
+def sql_value(value: Any) -> Any:
+    """Значение ячейки pandas/numpy в тип, который понимает sqlite3 (NaN -> NULL)"""
+    if value is None:
+        return None
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+class ListingDB:
+    """Объявления и модели в SQLite с upsert по номеру объявления"""
+
+    def __init__(self, path: str, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.path = path
+        self.batch_size = batch_size
+
+        # isolation_level=None: транзакции открываем сами, одна на пачку
+        self._conn = sqlite3.connect(path, timeout=60, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+
+        # Детальные записи, еще не записанные в базу (url, details)
+        self._pending_details: List[tuple] = []
+
+    def _executemany(self, sql: str, rows: List[tuple]):
+        if not rows:
+            return
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            self._conn.executemany(sql, rows)
+            self._conn.execute('COMMIT')
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+
+    # ---------- Запись ----------
+
+    def upsert_listings(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Строки выдачи (колонки LISTING_COLUMNS) одной транзакцией; детальные поля не трогает"""
+        now = time.time()
+        values = []
+        for row in rows:
+            key = listing_key(row.get('url'))
+            if key is None:
+                continue
+            values.append((key, *(sql_value(row.get(column)) for column in LISTING_COLUMNS), now))
+
+        columns = ', '.join(LISTING_COLUMNS)
+        updates = ', '.join(f'{column} = excluded.{column}' for column in LISTING_COLUMNS)
+        self._executemany(
+            f"""
+            INSERT INTO listings (listing_key, {columns}, listed_at)
+            VALUES ({', '.join('?' * (len(LISTING_COLUMNS) + 2))})
+            ON CONFLICT (listing_key) DO UPDATE SET {updates}, listed_at = excluded.listed_at
+            """,
+            values
+        )
+        return len(values)
+
+    def upsert_models(self, rows: Iterable[Dict[str, Any]]) -> int:
+        """Статус моделей (найдено / нет объявлений / ошибка) по search_url"""
+        now = time.time()
+        values = [(*(sql_value(row.get(column)) for column in MODEL_COLUMNS), now) for row in rows]
+        updates = ', '.join(f'{column} = excluded.{column}' for column in MODEL_COLUMNS[1:])
+        self._executemany(
+            f"""
+            INSERT INTO models ({', '.join(MODEL_COLUMNS)}, updated_at)
+            VALUES ({', '.join('?' * (len(MODEL_COLUMNS) + 1))})
+            ON CONFLICT (search_url) DO UPDATE SET {updates}, updated_at = excluded.updated_at
+            """,
+            values
+        )
+        return len(values)
+
+    def add_details(self, url: str, details: Dict[str, Any]):
+        """Детальные поля объявления; пишутся пачкой по batch_size (или при flush)"""
+        self._pending_details.append((url, details))
+        if len(self._pending_details) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Записывает накопленные детальные поля одной транзакцией"""
+        if not self._pending_details:
+            return
+
+        now = time.time()
+        values = []
+        for url, details in self._pending_details:
+            key = listing_key(url, details.get('bulletin_id'))
+            if key is None:
+                continue
+            values.append((key, url, *(sql_value(details.get(column, '')) for column in DETAIL_COLUMNS), now))
+
+        columns = ', '.join(DETAIL_COLUMNS)
+        updates = ', '.join(f'{column} = excluded.{column}' for column in DETAIL_COLUMNS)
+        self._executemany(
+            f"""
+            INSERT INTO listings (listing_key, url, {columns}, detailed_at)
+            VALUES ({', '.join('?' * (len(DETAIL_COLUMNS) + 3))})
+            ON CONFLICT (listing_key) DO UPDATE SET {updates}, detailed_at = excluded.detailed_at
+            """,
+            values
+        )
+        self._pending_details = []
+
+    # ---------- Чтение ----------
+
+    def listings_frame(self, pending_details: bool = False) -> pd.DataFrame:
+        """
+        Объявления в порядке добавления (колонки как в XLSX).
+        pending_details=True - только найденные объявления без детальных полей
+        """
+        where = "WHERE status = 'Найдено' AND detailed_at IS NULL" if pending_details else ''
+        return pd.read_sql_query(
+            f"SELECT {', '.join(LISTING_COLUMNS + DETAIL_COLUMNS)} FROM listings {where} ORDER BY rowid",
+            self._conn
+        )
+
+    def models_frame(self) -> pd.DataFrame:
+        return pd.read_sql_query(f"SELECT {', '.join(MODEL_COLUMNS)} FROM models ORDER BY rowid", self._conn)
+
+    def detailed_urls(self) -> set:
+        """URL объявлений, у которых уже есть детальные поля"""
+        return {url for (url,) in self._conn.execute('SELECT url FROM listings WHERE detailed_at IS NOT NULL')}
+
+    def known_listings(self) -> KnownListings:
+        """Все объявления базы - для --incremental"""
+        known = KnownListings()
+        for url, bulletin_id in self._conn.execute('SELECT url, bulletin_id FROM listings'):
+            known.add(url, bulletin_id)
+        return known
+
+    def counts(self) -> Dict[str, int]:
+        listings, detailed = self._conn.execute(
+            'SELECT COUNT(*), COUNT(detailed_at) FROM listings').fetchone()
+        models = self._conn.execute('SELECT COUNT(*) FROM models').fetchone()[0]
+        return {'listings': listings, 'detailed': detailed, 'models': models}
+
+    # ---------- XLSX ----------
+
+    def import_excel(self, path: str) -> int:
+        """Переносит файл результатов (выдача и/или детали) в базу"""
+        df = pd.read_excel(path)
+        rows = df.to_dict('records')
+
+        listing_rows = [row for row in rows if isinstance(row.get('url'), str) and row['url']]
+        model_rows = [row for row in rows
+                      if not (isinstance(row.get('url'), str) and row['url']) and isinstance(row.get('search_url'), str)]
+        self.upsert_listings(listing_rows)
+        self.upsert_models(model_rows)
+
+        # Детальные поля - только у строк, где они заполнены
+        if 'bulletin_id' in df.columns:
+            for row in listing_rows:
+                if listing_key(None, row.get('bulletin_id')) is not None:
+                    self.add_details(row['url'], {column: row.get(column) for column in DETAIL_COLUMNS})
+            self.flush()
+
+        return len(listing_rows)
+
+    def export_excel(self, path: str):
+        self.listings_frame().to_excel(path, index=False)
+
+    def close(self):
+        self.flush()
+        self._conn.close()
+
+
+def add_db_arguments(parser: argparse.ArgumentParser):
+    """Добавляет флаг --db"""
+    parser.add_argument('--db', nargs='?', const=DEFAULT_DB_FILE, default=None,
+                        help=f'хранить объявления в SQLite (по умолчанию {DEFAULT_DB_FILE} рядом со скриптом)')
+
+
+def db_from_args(args: argparse.Namespace, script_dir: str) -> Optional[ListingDB]:
+    """Открывает базу по флагу --db (или None, если он не задан)"""
+    if not args.db:
+        return None
+
+    path = args.db if os.path.isabs(args.db) else os.path.join(script_dir, args.db)
+    db = ListingDB(path)
+    counts = db.counts()
+    print(f"🗃️  База объявлений: {path} | объявлений: {counts['listings']:,}, "
+          f"с деталями: {counts['detailed']:,}, моделей: {counts['models']:,}")
+    return db
+
+
+def main() -> int:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(description='База объявлений SQLite: импорт/экспорт XLSX')
+    parser.add_argument('command', choices=('import', 'export', 'stats'))
+    parser.add_argument('files', nargs='*', help='import: XLSX-файлы (маски), export: выходной XLSX')
+    parser.add_argument('--db', default=DEFAULT_DB_FILE, help=f'файл базы (по умолчанию {DEFAULT_DB_FILE})')
+    args = parser.parse_args()
+
+    db = db_from_args(args, script_dir)
+    try:
+        if args.command == 'import':
+            for pattern in args.files:
+                for path in sorted(glob.glob(pattern)):
+                    print(f"📥 {os.path.basename(path)}: {db.import_excel(path):,} объявлений")
+        elif args.command == 'export':
+            if len(args.files) != 1:
+                parser.error('export: укажите один выходной файл')
+            db.export_excel(args.files[0])
+            print(f"📤 Сохранено: {args.files[0]}")
+        print(f"📊 {db.counts()}")
+    finally:
+        db.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -92,6 +92,7 @@ try:
         file2_size = get_file_size_mb(os.path.join(SCRIPT_DIR, 'drom_full_scraper_2.xlsx'))
         file3_size = get_file_size_mb(os.path.join(SCRIPT_DIR, 'drom_full_scraper_3.xlsx'))
         file4_size = get_file_size_mb(os.path.join(SCRIPT_DIR, 'drom_full_scraper_4.xlsx'))
+        journal_size = get_file_size_mb(os.path.join(SCRIPT_DIR, 'drom_full_scraper_results.jsonl'))
 
         # Прогресс-бар
         progress_percent = (current_index / 196056) * 100
@@ -131,6 +132,9 @@ try:
             print(f"  drom_full_scraper_3.xlsx: {file3_size:.2f} MB")
         if file4_size > 0:
             print(f"  drom_full_scraper_4.xlsx: {file4_size:.2f} MB")
+        if journal_size > 0:
+            # XLSX собирается из журнала в конце прогона (или --materialize)
+            print(f"  drom_full_scraper_results.jsonl: {journal_size:.2f} MB")
 
         print(f"\n⏰ Последнее обновление: {datetime.now().strftime('%H:%M:%S')}")
         print(f"\n{'=' * 80}")
@@ -0,0 +1,199 @@
+"""
+РЕЗУЛЬТАТЫ В PARQUET С РАЗБИВКОЙ ПО БРЕНДАМ
+- Вместо drom_full_scraper_N.xlsx по 50 000 строк: папка в формате hive
+  brand=<бренд>/[crawl_date=<дата>/]<имя>.parquet
+- Колонки типизированы (годы, цена, номер объявления, просмотры - целые,
+  дата - date; нечисловое значение в целой колонке - предупреждение),
+  сжатие zstd; строки внутри файла отсортированы по модели и году, поэтому
+  статистика групп строк (min/max) позволяет пропускать ненужные группы
+- Читатель берет только нужные колонки и бренды (read_results): остальные
+  файлы и колонки с диска не читаются
+- Запись идемпотентна: новые строки сливаются с файлом раздела, повтор
+  объявления (по url) заменяет прежнюю строку
+- Нужна библиотека pyarrow: pip install pyarrow
+
+Запуск: python src/parquet_store.py convert "src/drom_full_scraper_*.xlsx"
+        python src/parquet_store.py stats
+"""
+
+import argparse
+import glob
+import os
+import sys
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+
+DEFAULT_PARQUET_DIR = 'drom_full_scraper_parquet'
+ROW_GROUP_SIZE = 10_000  # Строк в группе: единица пропуска по статистике
+COMPRESSION = 'zstd'
+
+# Типы колонок результата; все прочие колонки - строки. owners - строка:
+# на странице бывает не только число ("3 или более")
+INT_COLUMNS = {
+    'start_year': 'int16', 'finish_year': 'int16', 'year': 'int16',
+    'price': 'int64', 'bulletin_id': 'int64', 'views_count': 'int32',
+}
+DATE_COLUMNS = {'bulletin_date': '%d.%m.%Y'}
+SORT_COLUMNS = ['model', 'year']
+
+
+def require_pyarrow():
+    if pa is None:
+        print("❌ ОШИБКА: для Parquet установите библиотеку: pip install pyarrow")
+        exit(1)
+
+
+def _text(value: Any) -> str:
+    """Значение текстовой колонки: число из XLSX (2.0) - как на странице (2)"""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def typed_table(df: pd.DataFrame) -> 'pa.Table':
+    """Таблица с типами колонок; пустые строки - null"""
+    arrays = {}
+    for column in df.columns:
+        values = df[column]
+        if column in INT_COLUMNS:
+            numbers = pd.to_numeric(values, errors='coerce')
+            # Нечисловое значение в целой колонке стало бы null молча - сообщаем
+            lost = numbers.isna() & values.notna() & (values.astype(str).str.strip() != '')
+            if lost.any():
+                examples = ', '.join(repr(value) for value in values[lost].astype(str).unique()[:3])
+                print(f"⚠️  Parquet: {int(lost.sum())} нечисловых значений в колонке {column} "
+                      f"записаны как пустые ({examples})")
+            arrays[column] = pa.array(numbers.round(), type=getattr(pa, INT_COLUMNS[column])(), from_pandas=True)
+        elif column in DATE_COLUMNS:
+            dates = pd.to_datetime(values, format=DATE_COLUMNS[column], errors='coerce')
+            arrays[column] = pa.array(dates.dt.date, type=pa.date32(), from_pandas=True)
+        else:
+            text = values.where(values.notna() & (values.astype(str) != ''), None)
+            arrays[column] = pa.array([None if value is None else _text(value) for value in text], type=pa.string())
+    return pa.table(arrays)
+
+
+def _partition_dir(root: str, keys: Dict[str, Any]) -> str:
+    return os.path.join(root, *(f'{column}={value}' for column, value in keys.items()))
+
+
+def write_partitioned(df: pd.DataFrame, root: str, basename: str, crawl_date: Optional[date] = None) -> int:
+    """
+    Дописывает строки в разделы по бренду (и дате обхода, если задана).
+    Каждый раздел - один файл <basename>.parquet, его строки заменяются по url.
+    Возвращает число затронутых разделов
+    """
+    require_pyarrow()
+
+    df = df.copy()
+    partition_columns = ['brand']
+    if crawl_date is not None:
+        df['crawl_date'] = crawl_date.isoformat()
+        partition_columns.append('crawl_date')
+
+    partitions = 0
+    for keys, group in df.groupby(partition_columns, sort=True):
+        keys = dict(zip(partition_columns, keys if isinstance(keys, tuple) else (keys,)))
+        part_dir = _partition_dir(root, keys)
+        os.makedirs(part_dir, exist_ok=True)
+        file_path = os.path.join(part_dir, f'{basename}.parquet')
+
+        # Колонки раздела хранятся в имени папки, не в файле
+        group = group.drop(columns=partition_columns)
+        if os.path.exists(file_path):
+            existing = pq.read_table(file_path).to_pandas(date_as_object=False)
+            group = pd.concat([existing, group], ignore_index=True)
+        group = group.drop_duplicates('url', keep='last')
+        group = group.sort_values([column for column in SORT_COLUMNS if column in group.columns], kind='stable')
+
+        # Через временный файл: прерванная запись не портит прежний раздел
+        # (имя с точкой - читатель такие файлы пропускает)
+        tmp_path = os.path.join(part_dir, f'.{basename}.{os.getpid()}.tmp')
+        pq.write_table(typed_table(group.reset_index(drop=True)), tmp_path,
+                       compression=COMPRESSION, row_group_size=ROW_GROUP_SIZE, write_statistics=True)
+        os.replace(tmp_path, file_path)
+        partitions += 1
+
+    return partitions
+
+
+def results_dataset(root: str) -> 'ds.Dataset':
+    require_pyarrow()
+    return ds.dataset(root, format='parquet', partitioning='hive')
+
+
+def read_results(root: str, columns: Optional[List[str]] = None, brands: Optional[Iterable[str]] = None,
+                 crawl_dates: Optional[Iterable[str]] = None) -> pd.DataFrame:
+    """Результаты из папки Parquet: только нужные колонки и разделы"""
+    dataset = results_dataset(root)
+    condition = None
+    if brands is not None:
+        condition = ds.field('brand').isin(list(brands))
+    if crawl_dates is not None:
+        by_date = ds.field('crawl_date').isin([str(value) for value in crawl_dates])
+        condition = by_date if condition is None else condition & by_date
+    return dataset.to_table(columns=columns, filter=condition).to_pandas()
+
+
+def add_parquet_arguments(parser: argparse.ArgumentParser):
+    """Добавляет флаги --parquet и --partition-by-date"""
+    parser.add_argument('--parquet', nargs='?', const=DEFAULT_PARQUET_DIR, default=None,
+                        help=f'писать результаты в Parquet по брендам вместо XLSX '
+                             f'(по умолчанию папка {DEFAULT_PARQUET_DIR} рядом со скриптом)')
+    parser.add_argument('--partition-by-date', action='store_true',
+                        help='с --parquet: дополнительно разбивать по дате обхода')
+
+
+def parquet_dir_from_args(args: argparse.Namespace, script_dir: str) -> Optional[str]:
+    """Папка Parquet по флагу --parquet (или None, если он не задан)"""
+    if not args.parquet:
+        return None
+
+    require_pyarrow()
+    root = args.parquet if os.path.isabs(args.parquet) else os.path.join(script_dir, args.parquet)
+    print(f"🧱 Результаты в Parquet: {root}{' (по дате обхода)' if args.partition_by_date else ''}")
+    return root
+
+
+def main() -> int:
+    script_dir = os.path.dirname(os.path.abspath(__file__))
+
+    parser = argparse.ArgumentParser(description='Результаты в Parquet: перенос XLSX и статистика')
+    parser.add_argument('command', choices=('convert', 'stats'))
+    parser.add_argument('files', nargs='*', help='convert: XLSX-файлы результатов (маски)')
+    parser.add_argument('--dir', default=DEFAULT_PARQUET_DIR, help=f'папка Parquet (по умолчанию {DEFAULT_PARQUET_DIR})')
+    args = parser.parse_args()
+
+    require_pyarrow()
+    root = args.dir if os.path.isabs(args.dir) else os.path.join(script_dir, args.dir)
+
+    if args.command == 'convert':
+        for pattern in args.files:
+            for path in sorted(glob.glob(pattern)):
+                df = pd.read_excel(path)
+                # В XLSX-файлах есть и необработанные строки: переносим только с деталями
+                if 'bulletin_id' in df.columns:
+                    df = df[pd.to_numeric(df['bulletin_id'], errors='coerce').notna()]
+                basename = os.path.splitext(os.path.basename(path))[0]
+                partitions = write_partitioned(df, root, basename)
+                print(f"📥 {os.path.basename(path)}: {len(df):,} строк, разделов: {partitions}")
+
+    dataset = results_dataset(root)
+    rows = dataset.count_rows()
+    files = len(dataset.files)
+    size = sum(os.path.getsize(path) for path in dataset.files)
+    print(f"📊 {root}: строк {rows:,}, файлов {files:,}, {size / 1024 / 1024:.1f} МБ")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -3,8 +3,11 @@
 1. Исправляет search_url
 2. Парсит объявления в drom_scraped_data_progress_2.xlsx
 3. Парсит детальную информацию в drom_full_scraper_5.xlsx
+С флагом --db объявления и детали также пишутся в SQLite (listing_db.py),
+а объявления, уже имеющие детали в базе, повторно не запрашиваются
 """
 
+import argparse
 import pandas as pd
 import asyncio
 import aiohttp
@@ -13,9 +16,25 @@ import random
 import re
 import time
 import os
-from typing import Dict, Any, Optional, List, Tuple
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, Any, Optional, List, Tuple, Union
 import urllib.parse
 
+from concurrency_controller import AIMDController
+from detail_parser import (DEFAULT_EXTRACT_MODE, DEFAULT_PARSER_BACKEND, add_parser_arguments,
+                           backend_from_args, create_parse_executor, parse_detail_page_async,
+                           state_fallback_summary)
+from excel_cache import read_excel_cached
+from failure_ledger import DeadLedger, Failure, failure_from_exception, failure_from_status, load_ledger
+from json_ld import parse_car_listings
+from listing_db import ListingDB, add_db_arguments, db_from_args
+from rate_limiter import HostRateLimiter
+from response_store import ResponseStore, add_store_arguments, store_from_args
+from result_buffer import DETAIL_COLUMNS, ResultBuffer
+from work_plan import ListingPlan
+from worker_pool import run_worker_pool
+
 try:
     import brotli
     print("✅ Brotli установлен")
@@ -25,15 +44,41 @@ except ImportError:
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# Адрес сайта (--base-url переключает на локальную заглушку benchmarks/mock_drom_server.py)
+DROM_BASE_URL = 'https://auto.drom.ru'
+
 USER_AGENTS = [
     'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
     'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
     'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/121.0.0.0 Safari/537.36',
 ]
 
-CONCURRENT_REQUESTS = 5
+CONCURRENT_REQUESTS = 5  # Стартовое окно параллельных запросов
+MIN_CONCURRENT_REQUESTS = 1
+MAX_CONCURRENT_REQUESTS = 15
+REQUESTS_PER_SECOND = 15.0  # Бюджет запросов на хост
+REQUESTS_BURST = 5
+
+# Общий ограничитель: 429 ставит на паузу только свой хост, без sleep на весь процесс
+rate_limiter = HostRateLimiter(rate=REQUESTS_PER_SECOND, burst=REQUESTS_BURST)
+
+# Хранилище сырых страниц (--store-html / --replay), настраивается при запуске
+response_store: Optional[ResponseStore] = None
+
+# Движок разбора детальных страниц (--parser) и откуда брать данные (--extract)
+PARSER_BACKEND = DEFAULT_PARSER_BACKEND
+PARSER_EXTRACT = DEFAULT_EXTRACT_MODE
+
+# Пул процессов разбора (--parse-workers), создается при запуске; None - разбор в event loop
+parse_executor: Optional[ProcessPoolExecutor] = None
+
+# Реестр удаленных моделей и объявлений (404/410), общий для всех парсеров
+dead_ledger: Optional[DeadLedger] = None
 SAVE_BATCH_SIZE = 50
 
+# База объявлений (--db), настраивается при запуске
+listing_db: Optional[ListingDB] = None
+
 
 def create_search_url(brand: str, model: str, start_year: float, finish_year: float) -> str:
     """Создает правильный search_url из исправленных brand и model"""
@@ -42,7 +87,7 @@ def create_search_url(brand: str, model: str, start_year: float, finish_year: fl
     model_clean = str(model).lower().strip()
 
     # Формируем URL - используем значения как есть!
-    url = f"https://auto.drom.ru/{brand_clean}/{model_clean}/"
+    url = f"{DROM_BASE_URL}/{brand_clean}/{model_clean}/"
 
     # Добавляем года если они есть
     if pd.notna(start_year) and pd.notna(finish_year):
@@ -65,269 +110,193 @@ def get_headers():
     }
 
 
+async def fetch_html(session: aiohttp.ClientSession, url: str) -> Tuple[Optional[int], str]:
+    """Возвращает (status, html): из хранилища при --replay, иначе запросом через rate_limiter"""
+    if response_store is not None and response_store.replay:
+        return response_store.get(url) or (None, '')
+
+    await rate_limiter.wait_async(url)
+    async with session.get(url, headers=get_headers(), timeout=aiohttp.ClientTimeout(total=30)) as response:
+        if response.status == 429:
+            rate_limiter.penalize(url, response.headers.get('Retry-After'))
+            return response.status, ''
+
+        if response.status != 200:
+            # 5xx не сохраняем: это временная ошибка, а не содержимое страницы
+            if response_store is not None and response.status < 500:
+                response_store.put(url, response.status)
+            return response.status, ''
+
+        rate_limiter.record_success(url)
+
+        # aiohttp автоматически декодирует gzip/brotli
+        html = await response.text(encoding='windows-1251')
+        if response_store is not None:
+            response_store.put(url, response.status, html)
+        return response.status, html
+
+
+def status_row(brand: str, model: str, start_year: float, finish_year: float, url: str, status: str) -> Dict[str, Any]:
+    """Строка результата для модели без объявлений (пусто, ошибка, удалена)"""
+    return {
+        'brand': brand,
+        'model': model,
+        'start_year': start_year,
+        'finish_year': finish_year,
+        'search_url': url,
+        'status': status,
+        'car_name': '',
+        'year': '',
+        'price': '',
+        'currency': '',
+        'url': '',
+        'mileage': '',
+        'vin': '',
+        'image_url': ''
+    }
+
+
+def json_ld_cards(html: str) -> List[Dict[str, Any]]:
+    """Объявления из JSON-LD страницы выдачи (как в database_parser), без построения DOM"""
+    return [
+        {
+            'car_name': listing.get('name', ''),
+            'year': listing.get('year', ''),
+            'price': listing.get('price', ''),
+            'currency': listing.get('currency', 'RUB'),
+            'url': listing.get('url', ''),
+            'mileage': listing.get('mileage', ''),
+            'vin': listing.get('vin', ''),
+            'image_url': listing.get('image', ''),
+        }
+        for listing in parse_car_listings(html)
+    ]
+
+
+def parse_listing_cards(html: str) -> List[Dict[str, Any]]:
+    """Объявления из карточек bulls-list_bull (запасной путь для страниц без JSON-LD)"""
+    soup = BeautifulSoup(html, 'html.parser')
+    cards = []
+
+    # Основной контейнер с объявлениями - теперь это DIV, а не A!
+    for card in soup.find_all('div', {'data-ftid': 'bulls-list_bull'}):
+        try:
+            # Ищем ссылку внутри div
+            link_elem = card.find('a', href=True)
+            if not link_elem:
+                continue
+
+            listing_url = link_elem.get('href', '')
+            if not listing_url.startswith('http'):
+                listing_url = DROM_BASE_URL + listing_url
+
+            # Название машины - теперь это <a>, а не <span>!
+            title_elem = card.find('a', {'data-ftid': 'bull_title'})
+            car_name = title_elem.get_text(strip=True) if title_elem else ''
+
+            # Цена
+            price_elem = card.find('span', {'data-ftid': 'bull_price'})
+            price_text = price_elem.get_text(strip=True) if price_elem else ''
+
+            # Парсим цену
+            price = ''
+            currency = ''
+            if price_text:
+                price_match = re.search(r'([\d\s]+)', price_text.replace('\xa0', ' '))
+                if price_match:
+                    price = price_match.group(1).replace(' ', '')
+
+                if '₽' in price_text:
+                    currency = 'RUB'
+                elif '$' in price_text:
+                    currency = 'USD'
+                elif '€' in price_text:
+                    currency = 'EUR'
+
+            # Год
+            year_match = re.search(r'(\d{4})', car_name)
+            year = year_match.group(1) if year_match else ''
+
+            # Пробег
+            mileage_elem = card.find('span', string=re.compile(r'км', re.IGNORECASE))
+            mileage = mileage_elem.get_text(strip=True) if mileage_elem else ''
+
+            # Фото
+            img_elem = card.find('img', {'data-ftid': 'bull_img'})
+            image_url = img_elem.get('src', '') if img_elem else ''
+
+            cards.append({
+                'car_name': car_name,
+                'year': year,
+                'price': price,
+                'currency': currency,
+                'url': listing_url,
+                'mileage': mileage,
+                'vin': '',
+                'image_url': image_url
+            })
+
+        except Exception:
+            continue
+
+    return cards
+
+
 async def scrape_listing_page(session: aiohttp.ClientSession, url: str, brand: str, model: str, start_year: float, finish_year: float) -> List[Dict[str, Any]]:
     """Парсит страницу с объявлениями"""
+    # Модель уже признана удаленной - запрос не нужен
+    dead_entry = dead_ledger.model_entry(brand, model) if dead_ledger is not None else None
+    if dead_entry:
+        return [status_row(brand, model, start_year, finish_year, url, dead_entry['reason'])]
+
     try:
-        async with session.get(url, headers=get_headers(), timeout=aiohttp.ClientTimeout(total=30)) as response:
-            if response.status == 404:
-                return []
-
-            if response.status != 200:
-                return []
-
-            html = await response.text(encoding='windows-1251')
-            soup = BeautifulSoup(html, 'html.parser')
-
-            # Ищем объявления
-            listings = []
-
-            # Основной контейнер с объявлениями - теперь это DIV, а не A!
-            cards = soup.find_all('div', {'data-ftid': 'bulls-list_bull'})
-
-            for card in cards:
-                try:
-                    # Ищем ссылку внутри div
-                    link_elem = card.find('a', href=True)
-                    if not link_elem:
-                        continue
-
-                    listing_url = link_elem.get('href', '')
-                    if not listing_url.startswith('http'):
-                        listing_url = 'https://auto.drom.ru' + listing_url
-
-                    # Название машины - теперь это <a>, а не <span>!
-                    title_elem = card.find('a', {'data-ftid': 'bull_title'})
-                    car_name = title_elem.get_text(strip=True) if title_elem else ''
-
-                    # Цена
-                    price_elem = card.find('span', {'data-ftid': 'bull_price'})
-                    price_text = price_elem.get_text(strip=True) if price_elem else ''
-
-                    # Парсим цену
-                    price = ''
-                    currency = ''
-                    if price_text:
-                        price_match = re.search(r'([\d\s]+)', price_text.replace('\xa0', ' '))
-                        if price_match:
-                            price = price_match.group(1).replace(' ', '')
-
-                        if '₽' in price_text:
-                            currency = 'RUB'
-                        elif '$' in price_text:
-                            currency = 'USD'
-                        elif '€' in price_text:
-                            currency = 'EUR'
-
-                    # Год
-                    year_match = re.search(r'(\d{4})', car_name)
-                    year = year_match.group(1) if year_match else ''
-
-                    # Пробег
-                    mileage_elem = card.find('span', string=re.compile(r'км', re.IGNORECASE))
-                    mileage = mileage_elem.get_text(strip=True) if mileage_elem else ''
-
-                    # Фото
-                    img_elem = card.find('img', {'data-ftid': 'bull_img'})
-                    image_url = img_elem.get('src', '') if img_elem else ''
-
-                    listing = {
-                        'brand': brand,
-                        'model': model,
-                        'start_year': start_year,
-                        'finish_year': finish_year,
-                        'search_url': url,
-                        'status': 'Найдено',
-                        'car_name': car_name,
-                        'year': year,
-                        'price': price,
-                        'currency': currency,
-                        'url': listing_url,
-                        'mileage': mileage,
-                        'vin': '',
-                        'image_url': image_url
-                    }
-
-                    listings.append(listing)
-
-                except Exception as e:
-                    continue
-
-            if len(listings) == 0:
-                # Если не нашли объявлений
-                return [{
-                    'brand': brand,
-                    'model': model,
-                    'start_year': start_year,
-                    'finish_year': finish_year,
-                    'search_url': url,
-                    'status': 'Нет объявлений',
-                    'car_name': '',
-                    'year': '',
-                    'price': '',
-                    'currency': '',
-                    'url': '',
-                    'mileage': '',
-                    'vin': '',
-                    'image_url': ''
-                }]
-
-            return listings
+        status, html = await fetch_html(session, url)
+        if status != 200:
+            failure = failure_from_status(status)
+            if failure.is_permanent and dead_ledger is not None:
+                dead_ledger.mark_model(brand, model, failure)
+            return [status_row(brand, model, start_year, finish_year, url, failure.reason)]
+
+        # Объявления из JSON-LD; карточки разбираем, только если JSON-LD на странице нет
+        cards = json_ld_cards(html) or parse_listing_cards(html)
+
+        listings = [
+            {
+                'brand': brand,
+                'model': model,
+                'start_year': start_year,
+                'finish_year': finish_year,
+                'search_url': url,
+                'status': 'Найдено',
+                **card,
+            }
+            for card in cards
+        ]
+
+        if len(listings) == 0:
+            # Если не нашли объявлений
+            return [status_row(brand, model, start_year, finish_year, url, 'Нет объявлений')]
+
+        return listings
 
     except Exception as e:
-        return [{
-            'brand': brand,
-            'model': model,
-            'start_year': start_year,
-            'finish_year': finish_year,
-            'search_url': url,
-            'status': f'Ошибка: {str(e)[:50]}',
-            'car_name': '',
-            'year': '',
-            'price': '',
-            'currency': '',
-            'url': '',
-            'mileage': '',
-            'vin': '',
-            'image_url': ''
-        }]
-
-
-async def scrape_listing_details(session: aiohttp.ClientSession, url: str, idx: int) -> Tuple[int, Optional[Dict[str, Any]]]:
-    """Парсит детальную информацию об объявлении"""
+        return [status_row(brand, model, start_year, finish_year, url, f'Ошибка: {str(e)[:50]}')]
+
+
+async def scrape_listing_details(session: aiohttp.ClientSession, url: str, idx: int) -> Tuple[int, Union[Dict[str, Any], Failure]]:
+    """Парсит детальную информацию об объявлении. При ошибке вместо данных - Failure"""
     try:
-        async with session.get(url, headers=get_headers(), timeout=aiohttp.ClientTimeout(total=30)) as response:
-            if response.status != 200:
-                return (idx, None)
-
-            html = await response.text(encoding='windows-1251')
-            soup = BeautifulSoup(html, 'html.parser')
-
-            # Парсим таблицу характеристик
-            specs = {}
-            table = soup.find('table', {'class': 'i2nf564', 'data-ftid': 'bulletin-specifications'})
-
-            if table:
-                rows = table.find_all('tr')
-                for row in rows:
-                    property_cell = row.find('th', {'data-ftid': 'property'})
-                    value_cell = row.find('td', {'data-ftid': 'value'})
-
-                    if property_cell and value_cell:
-                        property_name = property_cell.get_text(strip=True)
-
-                        button = value_cell.find('button')
-                        if button:
-                            button.decompose()
-
-                        for link in value_cell.find_all('a'):
-                            link.replace_with(link.get_text(strip=True))
-
-                        value_text = value_cell.get_text(strip=True)
-                        value_text = re.sub(r'\s+', ' ', value_text)
-                        specs[property_name] = value_text
-
-            # VIN отчет
-            vin_full = ''
-            vin_report_items = []
-
-            vin_block = soup.find('div', {'data-ga-stats-name': 'gibdd_report'})
-            if vin_block:
-                vin_div = vin_block.find('div', class_='css-o8yr01')
-                if vin_div:
-                    vin_full = vin_div.get_text(strip=True)
-
-                report_items_divs = vin_block.find_all('div', class_=re.compile(r'css-13qo6o5|css-z05wok'))
-                for item_div in report_items_divs:
-                    button = item_div.find('button')
-                    if button:
-                        text = button.get_text(strip=True)
-                    else:
-                        text = item_div.get_text(strip=True)
-
-                    if text and len(text) > 3:
-                        vin_report_items.append(text)
-
-            # Описание
-            full_description = ''
-            exchange_possible = ''
-            city_from_description = ''
-
-            desc_block = soup.find('div', {'data-ftid': 'bulletin-description'})
-            if desc_block:
-                full_desc_div = desc_block.find('div', {'data-ftid': 'info-full'})
-                if full_desc_div:
-                    value_span = full_desc_div.find('span', {'data-ftid': 'value'})
-                    if value_span:
-                        for br in value_span.find_all('br'):
-                            br.replace_with('\n')
-
-                        description_text = value_span.get_text(strip=False)
-                        description_text = re.sub(r'\n\s*\n', '\n', description_text)
-                        full_description = description_text.strip()
-
-                trade_div = desc_block.find('div', {'data-ftid': 'trade'})
-                if trade_div:
-                    value_span = trade_div.find('span', {'data-ftid': 'value'})
-                    if value_span:
-                        exchange_possible = value_span.get_text(strip=True)
-
-                city_div = desc_block.find('div', {'data-ftid': 'city'})
-                if city_div:
-                    value_span = city_div.find('span', {'data-ftid': 'value'})
-                    if value_span:
-                        city_from_description = value_span.get_text(strip=True)
-
-            # Информация об объявлении
-            bulletin_id = ''
-            bulletin_date = ''
-            views_count = ''
-
-            info_block = soup.find('div', {'data-ftid': 'bull-page_bull-views'})
-            if info_block:
-                bulletin_text_div = info_block.find('div', class_='css-pxeubi')
-                if bulletin_text_div:
-                    text = bulletin_text_div.get_text(strip=True)
-                    match = re.search(r'Объявление\s+(\d+)\s+от\s+([\d.]+)', text)
-                    if match:
-                        bulletin_id = match.group(1)
-                        bulletin_date = match.group(2)
-
-                views_div = info_block.find('div', class_='css-14wh0pm')
-                if views_div:
-                    views_text = views_div.get_text(strip=True)
-                    views_match = re.search(r'(\d+)', views_text)
-                    if views_match:
-                        views_count = views_match.group(1)
-
-            result = {
-                'engine': specs.get('Двигатель', ''),
-                'power': specs.get('Мощность', ''),
-                'transmission': specs.get('Коробка передач', ''),
-                'drive': specs.get('Привод', ''),
-                'body_type': specs.get('Тип кузова', ''),
-                'color': specs.get('Цвет', ''),
-                'mileage_detail': specs.get('Пробег', ''),
-                'owners': specs.get('Владельцы', ''),
-                'wheel': specs.get('Руль', ''),
-                'generation': specs.get('Поколение', ''),
-                'complectation': specs.get('Комплектация', ''),
-                'vin_full': vin_full,
-                'vin_report_items': ' | '.join(vin_report_items),
-                'full_description': full_description,
-                'exchange_possible': exchange_possible,
-                'city_from_description': city_from_description,
-                'bulletin_id': bulletin_id,
-                'bulletin_date': bulletin_date,
-                'views_count': views_count
-            }
+        status, html = await fetch_html(session, url)
+        if status != 200:
+            return (idx, failure_from_status(status))
 
-            return (idx, result)
+        return (idx, await parse_detail_page_async(html, PARSER_BACKEND, PARSER_EXTRACT, parse_executor))
 
     except Exception as e:
         # Логируем ошибку для debugging
         import sys
         print(f"DEBUG: Error parsing {url}: {type(e).__name__}: {str(e)[:100]}", file=sys.stderr)
-        return (idx, None)
+        return (idx, failure_from_exception(e))
 
 
 async def main():
@@ -336,7 +305,7 @@ async def main():
     print(f"\n{'='*80}")
     print("ПАРСЕР ПРОПУЩЕННЫХ МОДЕЛЕЙ")
     print('='*80)
-    print(f"⚡ Параллельных запросов: {CONCURRENT_REQUESTS}")
+    print(f"⚡ Параллельных запросов: {CONCURRENT_REQUESTS} (адаптивно {MIN_CONCURRENT_REQUESTS}-{MAX_CONCURRENT_REQUESTS})")
 
     # Загружаем skipped_models.xlsx
     input_file = os.path.join(SCRIPT_DIR, 'skipped_models.xlsx')
@@ -346,7 +315,7 @@ async def main():
         return
 
     print(f"\n📂 Загружаем файл: skipped_models.xlsx")
-    df_skipped = pd.read_excel(input_file)
+    df_skipped = read_excel_cached(input_file)
     print(f"   Всего моделей: {len(df_skipped):,}")
 
     # Исправляем search_url
@@ -363,30 +332,41 @@ async def main():
     print("ЭТАП 1: ПАРСИНГ ОБЪЯВЛЕНИЙ")
     print(f"{'='*80}\n")
 
-    all_listings = []
+    listings_by_model: Dict[int, List[Dict[str, Any]]] = {}
     processed = 0
     found = 0
     not_found = 0
     errors = 0
 
-    connector = aiohttp.TCPConnector(limit=CONCURRENT_REQUESTS, limit_per_host=CONCURRENT_REQUESTS)
+    # Одно окно параллельности на оба этапа: подстраивается под 429/5xx и задержки
+    controller = AIMDController(
+        initial=CONCURRENT_REQUESTS,
+        min_limit=MIN_CONCURRENT_REQUESTS,
+        max_limit=MAX_CONCURRENT_REQUESTS,
+    )
+
+    connector = aiohttp.TCPConnector(limit=MAX_CONCURRENT_REQUESTS, limit_per_host=MAX_CONCURRENT_REQUESTS)
     timeout = aiohttp.ClientTimeout(total=30)
 
-    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-        for idx, row in df_skipped.iterrows():
-            brand = row['brand']
-            model = row['model']
-            start_year = row['start_year']
-            finish_year = row['finish_year']
-            url = row['search_url']
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                     trace_configs=[controller.trace_config()]) as session:
 
-            print(f"[{idx + 1}/{len(df_skipped)}] {brand} {model} - {url}")
+        async def fetch_model_listings(url: str, idx: int) -> Tuple[int, List[Dict[str, Any]]]:
+            row = df_skipped.loc[idx]
+            listings = await scrape_listing_page(session, url, row['brand'], row['model'],
+                                                 row['start_year'], row['finish_year'])
+            return (idx, listings)
 
-            listings = await scrape_listing_page(session, url, brand, model, start_year, finish_year)
+        def handle_model_listings(result: Tuple[int, List[Dict[str, Any]]]):
+            nonlocal processed, found, not_found, errors
 
-            for listing in listings:
-                all_listings.append(listing)
+            idx, listings = result
+            row = df_skipped.loc[idx]
+            listings_by_model[idx] = listings
 
+            print(f"[{idx + 1}/{len(df_skipped)}] {row['brand']} {row['model']} - {row['search_url']}")
+
+            for listing in listings:
                 if listing['status'] == 'Найдено':
                     found += 1
                 elif listing['status'] == 'Нет объявлений':
@@ -400,10 +380,19 @@ async def main():
                 print(f"   ✓ Найдено {len(listings)} объявлений")
             elif len(listings) > 0 and listings[0]['status'] == 'Нет объявлений':
                 print(f"   ○ Нет объявлений")
+            elif len(listings) > 0:
+                print(f"   ✗ {listings[0]['status']}")
             else:
                 print(f"   ✗ Ошибка")
 
-            await asyncio.sleep(random.uniform(0.5, 1.0))
+        model_tasks = [(idx, df_skipped.at[idx, 'search_url']) for idx in df_skipped.index]
+        await run_worker_pool(model_tasks, fetch_model_listings, handle_model_listings,
+                              MAX_CONCURRENT_REQUESTS, controller)
+
+    # Сохраняем исходный порядок моделей независимо от порядка ответов
+    all_listings = []
+    for idx in df_skipped.index:
+        all_listings.extend(listings_by_model.get(idx, []))
 
     # Сохраняем drom_scraped_data_progress_2.xlsx
     progress_2_file = os.path.join(SCRIPT_DIR, 'drom_scraped_data_progress_2.xlsx')
@@ -420,13 +409,23 @@ async def main():
     print(f"\n💾 Сохранено в: {progress_2_file}")
     print(f"   Всего строк: {len(df_progress_2):,}")
 
+    if listing_db is not None:
+        listing_db.upsert_listings(listing for listing in all_listings if listing['url'])
+        listing_db.upsert_models({
+            **df_skipped.loc[idx, ['search_url', 'brand', 'model', 'start_year', 'finish_year']].to_dict(),
+            'status': listings[0]['status'] if listings else 'Ошибка',
+            'total_ads': sum(1 for listing in listings if listing['url']),
+        } for idx, listings in listings_by_model.items())
+        print(f"🗃️  Объявления и статусы моделей записаны в базу")
+
     # ЭТАП 2: Парсинг детальной информации
     print(f"\n{'='*80}")
     print("ЭТАП 2: ПАРСИНГ ДЕТАЛЬНОЙ ИНФОРМАЦИИ")
     print(f"{'='*80}\n")
 
     # Берем только объявления со статусом "Найдено"
-    df_to_parse = df_progress_2[df_progress_2['status'] == 'Найдено'].copy()
+    # (индекс с нуля: строки результатов адресуются позицией)
+    df_to_parse = df_progress_2[df_progress_2['status'] == 'Найдено'].reset_index(drop=True)
     print(f"Объявлений для детального парсинга: {len(df_to_parse):,}")
 
     if len(df_to_parse) == 0:
@@ -434,76 +433,74 @@ async def main():
         return
 
     # Добавляем колонки для детальной информации
-    detail_columns = [
-        'engine', 'power', 'transmission', 'drive', 'body_type', 'color',
-        'mileage_detail', 'owners', 'wheel', 'generation', 'complectation',
-        'vin_full', 'vin_report_items', 'full_description', 'exchange_possible',
-        'city_from_description', 'bulletin_id', 'bulletin_date', 'views_count'
-    ]
-
-    for col in detail_columns:
+    for col in DETAIL_COLUMNS:
         if col not in df_to_parse.columns:
             df_to_parse[col] = ''
 
+    # URL и названия строк - массивами; детали копятся по колонкам и
+    # переносятся в таблицу разом перед сохранением
+    plan = ListingPlan(df_to_parse)
+    details_buffer = ResultBuffer()
+
     successful = 0
     failed = 0
+    gone = 0
 
     # Создаем connector и timeout для Stage 2
-    connector = aiohttp.TCPConnector(limit=CONCURRENT_REQUESTS, limit_per_host=CONCURRENT_REQUESTS)
+    connector = aiohttp.TCPConnector(limit=MAX_CONCURRENT_REQUESTS, limit_per_host=MAX_CONCURRENT_REQUESTS)
     timeout = aiohttp.ClientTimeout(total=30)
 
-    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
-        batch = []
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout,
+                                     trace_configs=[controller.trace_config()]) as session:
+
+        def handle_details(result: Tuple[int, Union[Dict[str, Any], Failure]]):
+            nonlocal successful, failed, gone
+
+            result_idx, details = result
+            if isinstance(details, Failure) and details.is_permanent:
+                dead_ledger.mark_url(plan.url(result_idx), details)
+                gone += 1
+                car_name = plan.name(result_idx)
+                print(f"[{successful + failed + gone}/{len(df_to_parse)}] 🪦 {car_name} | удалено ({details.reason})")
+            elif not isinstance(details, Failure):
+                details_buffer.add(result_idx, details)
+                if listing_db is not None:
+                    listing_db.add_details(plan.url(result_idx), details)
+                successful += 1
+
+                car_name = plan.name(result_idx)
+                vin = details.get('vin_full', '')[:8] if details.get('vin_full') else 'N/A'
+                print(f"[{successful + failed + gone}/{len(df_to_parse)}] ✓ {car_name} | VIN: {vin}... | Окно: {controller.window}")
+            else:
+                failed += 1
+                car_name = plan.name(result_idx)
+                print(f"[{successful + failed + gone}/{len(df_to_parse)}] ✗ {car_name} | {details.reason}")
 
-        for idx in df_to_parse.index:
-            url = df_to_parse.at[idx, 'url']
-            if not url:
-                continue
+        detail_tasks = [(idx, plan.url(idx)) for idx in plan.indices_between(0, len(df_to_parse))]
 
-            batch.append((idx, url))
-
-            if len(batch) >= CONCURRENT_REQUESTS:
-                # Обрабатываем батч
-                tasks = [scrape_listing_details(session, url, i) for i, url in batch]
-                results = await asyncio.gather(*tasks)
-
-                for result_idx, details in results:
-                    if details:
-                        for key, value in details.items():
-                            df_to_parse.at[result_idx, key] = value
-                        successful += 1
-
-                        car_name = df_to_parse.at[result_idx, 'car_name']
-                        vin = details.get('vin_full', '')[:8] if details.get('vin_full') else 'N/A'
-                        print(f"[{successful + failed}/{len(df_to_parse)}] ✓ {car_name} | VIN: {vin}...")
-                    else:
-                        failed += 1
-                        car_name = df_to_parse.at[result_idx, 'car_name']
-                        print(f"[{successful + failed}/{len(df_to_parse)}] ✗ {car_name}")
-
-                batch = []
-                await asyncio.sleep(random.uniform(0.5, 1.0))
-
-        # Обрабатываем остаток
-        if batch:
-            tasks = [scrape_listing_details(session, url, i) for i, url in batch]
-            results = await asyncio.gather(*tasks)
-
-            for result_idx, details in results:
-                if details:
-                    for key, value in details.items():
-                        df_to_parse.at[result_idx, key] = value
-                    successful += 1
-
-                    car_name = df_to_parse.at[result_idx, 'car_name']
-                    vin = details.get('vin_full', '')[:8] if details.get('vin_full') else 'N/A'
-                    print(f"[{successful + failed}/{len(df_to_parse)}] ✓ {car_name} | VIN: {vin}...")
-                else:
-                    failed += 1
-                    car_name = df_to_parse.at[result_idx, 'car_name']
-                    print(f"[{successful + failed}/{len(df_to_parse)}] ✗ {car_name}")
+        # Удаленные в прошлых запусках объявления не запрашиваем
+        dead_tasks = [(idx, url) for idx, url in detail_tasks if dead_ledger.is_dead_url(url)]
+        if dead_tasks:
+            gone += len(dead_tasks)
+            detail_tasks = [(idx, url) for idx, url in detail_tasks if not dead_ledger.is_dead_url(url)]
+            print(f"🪦 Пропускаем удаленных объявлений из реестра: {len(dead_tasks):,}")
+
+        if listing_db is not None:
+            # Детали этих объявлений уже есть в базе (прошлый запуск или full_parser --db)
+            detailed = listing_db.detailed_urls()
+            already = [(idx, url) for idx, url in detail_tasks if url in detailed]
+            if already:
+                detail_tasks = [(idx, url) for idx, url in detail_tasks if url not in detailed]
+                print(f"🗃️  Пропускаем объявлений с деталями в базе: {len(already):,}")
+
+        await run_worker_pool(detail_tasks, partial(scrape_listing_details, session), handle_details,
+                              MAX_CONCURRENT_REQUESTS, controller)
+
+    if listing_db is not None:
+        listing_db.flush()
 
     # Сохраняем drom_full_scraper_5.xlsx
+    details_buffer.apply_to(df_to_parse)
     scraper_5_file = os.path.join(SCRIPT_DIR, 'drom_full_scraper_5.xlsx')
     df_to_parse.to_excel(scraper_5_file, index=False)
 
@@ -515,7 +512,11 @@ async def main():
     print(f"{'='*80}")
     print(f"✓ Успешно обработано: {successful:,}")
     print(f"✗ Ошибок: {failed:,}")
+    print(f"🪦 Удаленных объявлений: {gone:,}")
     print(f"Success Rate: {(successful / (successful + failed) * 100) if (successful + failed) > 0 else 0:.1f}%")
+    state_summary = state_fallback_summary()
+    if state_summary:
+        print(f"🧾 --extract state: {state_summary}")
     print(f"\n💾 Сохранено в: {scraper_5_file}")
     print(f"   Всего строк: {len(df_to_parse):,}")
     print(f"\n⏱️  Общее время: {elapsed_hours:.2f} часов")
@@ -523,4 +524,26 @@ async def main():
 
 
 if __name__ == '__main__':
-    asyncio.run(main())
+    parser = argparse.ArgumentParser(description='Парсер пропущенных моделей')
+    parser.add_argument('--base-url', default=DROM_BASE_URL,
+                        help=f'адрес сайта (по умолчанию {DROM_BASE_URL})')
+    add_parser_arguments(parser)
+    add_store_arguments(parser)
+    add_db_arguments(parser)
+    args = parser.parse_args()
+
+    DROM_BASE_URL = args.base_url.rstrip('/')
+    PARSER_BACKEND = backend_from_args(args)
+    PARSER_EXTRACT = args.extract
+    response_store = store_from_args(args, SCRIPT_DIR)
+    listing_db = db_from_args(args, SCRIPT_DIR)
+    dead_ledger = load_ledger(SCRIPT_DIR)
+    parse_executor = create_parse_executor(args.parse_workers)
+
+    try:
+        asyncio.run(main())
+    finally:
+        if parse_executor is not None:
+            parse_executor.shutdown(cancel_futures=True)
+        if listing_db is not None:
+            listing_db.close()
@@ -0,0 +1,151 @@
+"""
+ОБЩИЙ ОГРАНИЧИТЕЛЬ ЧАСТОТЫ ЗАПРОСОВ (TOKEN BUCKET)
+- Отдельное "ведро" токенов на каждый хост со своим бюджетом
+- 429 + Retry-After ставит на паузу только этот хост, остальная работа продолжается
+- Работает и из синхронного кода (wait), и из корутин (wait_async)
+"""
+
+import asyncio
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Разбирает заголовок Retry-After: число секунд или HTTP-дата"""
+    if not value:
+        return None
+
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class _Bucket:
+    __slots__ = ('rate', 'burst', 'tokens', 'updated', 'blocked_until', 'penalties')
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self.penalties = 0
+
+
+class HostRateLimiter:
+    """
+    Token bucket на хост. reserve() сразу списывает токен и возвращает,
+    сколько нужно подождать, поэтому вызывающие выстраиваются в очередь
+    без активного ожидания.
+    """
+
+    def __init__(
+        self,
+        rate: float = 2.0,
+        burst: int = 5,
+        host_budgets: Optional[Dict[str, Tuple[float, int]]] = None,
+        default_cooldown: float = 30.0,
+        max_cooldown: float = 300.0,
+    ):
+        self.rate = rate
+        self.burst = burst
+        self.host_budgets = host_budgets or {}
+        self.default_cooldown = default_cooldown
+        self.max_cooldown = max_cooldown
+
+        self._buckets: Dict[str, _Bucket] = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, url: str) -> _Bucket:
+        host = urlsplit(url).hostname or url
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            rate, burst = self.host_budgets.get(host, (self.rate, self.burst))
+            bucket = self._buckets[host] = _Bucket(rate, burst)
+        return bucket
+
+    def reserve(self, url: str) -> float:
+        """Списывает токен для хоста и возвращает задержку в секундах"""
+        with self._lock:
+            bucket = self._bucket(url)
+            now = time.monotonic()
+
+            # Пополняем ведро (во время паузы updated находится в будущем)
+            if now > bucket.updated:
+                bucket.tokens = min(bucket.burst, bucket.tokens + (now - bucket.updated) * bucket.rate)
+                bucket.updated = now
+
+            bucket.tokens -= 1
+            ready_at = bucket.updated
+            if bucket.tokens < 0:
+                ready_at += -bucket.tokens / bucket.rate
+
+            return max(0.0, ready_at - now)
+
+    def is_blocked(self, url: str) -> bool:
+        """Хост сейчас на паузе после 429"""
+        with self._lock:
+            return self._bucket(url).blocked_until > time.monotonic()
+
+    def wait(self, url: str) -> float:
+        """Блокирующее ожидание токена (для синхронного кода)"""
+        waited = 0.0
+        while True:
+            delay = self.reserve(url)
+            if delay > 0:
+                time.sleep(delay)
+                waited += delay
+            # Пока ждали, хост мог получить 429 - тогда встаем в очередь заново
+            if not self.is_blocked(url):
+                return waited
+
+    async def wait_async(self, url: str) -> float:
+        """Ожидание токена без блокировки event loop"""
+        waited = 0.0
+        while True:
+            delay = self.reserve(url)
+            if delay > 0:
+                await asyncio.sleep(delay)
+                waited += delay
+            if not self.is_blocked(url):
+                return waited
+
+    def penalize(self, url: str, retry_after: Optional[str] = None) -> float:
+        """
+        Ставит хост на паузу после 429. Без Retry-After пауза растет
+        экспоненциально с каждым повтором подряд. Возвращает длительность паузы.
+        """
+        with self._lock:
+            bucket = self._bucket(url)
+            now = time.monotonic()
+
+            cooldown = parse_retry_after(retry_after)
+            if cooldown is None:
+                cooldown = self.default_cooldown * (2 ** bucket.penalties)
+            cooldown = min(cooldown, self.max_cooldown)
+
+            # Параллельные 429 в рамках одной паузы считаем одним повтором
+            if bucket.blocked_until <= now:
+                bucket.penalties += 1
+
+            # Не сокращаем уже назначенную паузу
+            if now + cooldown > bucket.blocked_until:
+                bucket.blocked_until = now + cooldown
+                bucket.updated = bucket.blocked_until
+                bucket.tokens = 0.0
+
+            return cooldown
+
+    def record_success(self, url: str):
+        """Сбрасывает счетчик пауз хоста после успешного ответа"""
+        with self._lock:
+            self._bucket(url).penalties = 0
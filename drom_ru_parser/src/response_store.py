@@ -0,0 +1,122 @@
+"""
+ХРАНИЛИЩЕ СЫРЫХ HTML-СТРАНИЦ
+- Тела ответов сжимаются gzip и лежат по sha256 содержимого (одинаковые страницы хранятся один раз)
+- index.jsonl связывает URL и время загрузки с хэшем и HTTP-статусом
+- В режиме --replay скрипты берут страницы отсюда и не ходят в сеть,
+  поэтому после правки селекторов поля можно пересобрать без повторного обхода
+"""
+
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import time
+from typing import Dict, List, Optional, Tuple
+
+DEFAULT_STORE_DIR = 'raw_html'
+
+
+class ResponseStore:
+    """Content-addressed хранилище ответов с индексом по URL и времени загрузки"""
+
+    def __init__(self, root: str, replay: bool = False):
+        self.root = root
+        self.replay = replay
+        self.blobs_dir = os.path.join(root, 'blobs')
+        self.index_file = os.path.join(root, 'index.jsonl')
+        os.makedirs(self.blobs_dir, exist_ok=True)
+
+        # url -> [(fetched_at, sha256, status), ...] по возрастанию времени
+        self._index: Dict[str, List[Tuple[float, str, int]]] = {}
+        self._load_index()
+
+    def _load_index(self):
+        if not os.path.exists(self.index_file):
+            return
+
+        with open(self.index_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # Недописанная строка после аварийной остановки
+                    continue
+                self._index.setdefault(entry['url'], []).append(
+                    (entry['fetched_at'], entry['sha256'], entry['status'])
+                )
+
+        for entries in self._index.values():
+            entries.sort()
+
+    def _blob_path(self, digest: str) -> str:
+        return os.path.join(self.blobs_dir, digest[:2], f'{digest}.html.gz')
+
+    def put(self, url: str, status: int, html: str = '') -> str:
+        """Сохраняет ответ и возвращает sha256 его тела"""
+        body = html.encode('utf-8')
+        digest = hashlib.sha256(body).hexdigest()
+        blob_path = self._blob_path(digest)
+
+        if not os.path.exists(blob_path):
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            tmp_path = f'{blob_path}.{os.getpid()}.tmp'
+            with open(tmp_path, 'wb') as f:
+                f.write(gzip.compress(body, compresslevel=6))
+            os.replace(tmp_path, blob_path)
+
+        fetched_at = time.time()
+        with open(self.index_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({
+                'url': url,
+                'fetched_at': fetched_at,
+                'sha256': digest,
+                'status': status
+            }, ensure_ascii=False) + '\n')
+
+        self._index.setdefault(url, []).append((fetched_at, digest, status))
+        return digest
+
+    def get(self, url: str, before: Optional[float] = None) -> Optional[Tuple[int, str]]:
+        """
+        Возвращает (status, html) последней загрузки URL, или загрузки
+        не позже before (unix time). None - страницы в хранилище нет.
+        """
+        entries = self._index.get(url)
+        if not entries:
+            return None
+
+        if before is not None:
+            entries = [entry for entry in entries if entry[0] <= before]
+            if not entries:
+                return None
+
+        _, digest, status = entries[-1]
+        with open(self._blob_path(digest), 'rb') as f:
+            return status, gzip.decompress(f.read()).decode('utf-8')
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+
+def add_store_arguments(parser: argparse.ArgumentParser):
+    """Добавляет флаги --store-html и --replay"""
+    parser.add_argument('--store-html', action='store_true',
+                        help='сохранять сырые HTML-ответы в хранилище')
+    parser.add_argument('--replay', action='store_true',
+                        help='не ходить в сеть, брать страницы из хранилища')
+    parser.add_argument('--store-dir', default=None,
+                        help=f'папка хранилища (по умолчанию {DEFAULT_STORE_DIR}/ рядом со скриптом)')
+
+
+def store_from_args(args: argparse.Namespace, script_dir: str) -> Optional[ResponseStore]:
+    """Создает хранилище по флагам командной строки (или None, если оно не нужно)"""
+    if not (args.store_html or args.replay):
+        return None
+
+    root = args.store_dir or os.path.join(script_dir, DEFAULT_STORE_DIR)
+    store = ResponseStore(root, replay=args.replay)
+
+    mode = 'REPLAY (без сети)' if args.replay else 'запись'
+    print(f"🗄️  Хранилище HTML: {root} | режим: {mode} | URL в индексе: {len(store):,}")
+    return store
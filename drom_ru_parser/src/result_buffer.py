@@ -0,0 +1,62 @@
+"""
+БУФЕР ДЕТАЛЬНЫХ РЕЗУЛЬТАТОВ ПО КОЛОНКАМ
+- Результат разбора страницы - 19 полей; вместо записи каждого поля в
+  DataFrame через .at (19 обращений к индексу pandas на строку) значения
+  копятся в списках по колонкам
+- apply_to переносит буфер в таблицу одним присваиванием на колонку,
+  to_frame отдает его отдельной таблицей (для Parquet)
+- Строки адресуются позицией в таблице (0..len-1); повтор позиции - в
+  таблице остается последнее значение
+"""
+
+from typing import Any, Dict, List
+
+import numpy as np
+import pandas as pd
+
+# Детальные поля объявления (порядок колонок в drom_full_scraper_N.xlsx)
+DETAIL_COLUMNS = [
+    'engine', 'power', 'transmission', 'drive', 'body_type', 'color',
+    'mileage_detail', 'owners', 'wheel', 'generation', 'complectation',
+    'vin_full', 'vin_report_items', 'full_description', 'exchange_possible',
+    'city_from_description', 'bulletin_id', 'bulletin_date', 'views_count',
+]
+
+
+class ResultBuffer:
+    """Детальные поля строк в списках по колонкам"""
+
+    __slots__ = ('positions', 'values')
+
+    def __init__(self):
+        self.positions: List[int] = []
+        self.values: Dict[str, List[Any]] = {column: [] for column in DETAIL_COLUMNS}
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def add(self, position: int, details: Dict[str, Any]):
+        self.positions.append(position)
+        for column, values in self.values.items():
+            values.append(details.get(column, ''))
+
+    def apply_to(self, df: pd.DataFrame):
+        """Записывает буфер в таблицу: по одному присваиванию на колонку"""
+        if not self.positions:
+            return
+
+        positions = np.asarray(self.positions)
+        for column, values in self.values.items():
+            # object: в колонке XLSX без значений pandas видит float (NaN)
+            column_values = (df[column].to_numpy(dtype=object, copy=True) if column in df.columns
+                             else np.full(len(df), '', dtype=object))
+            column_values[positions] = values
+            df[column] = column_values
+
+    def to_frame(self) -> pd.DataFrame:
+        """Буфер отдельной таблицей (строки в порядке добавления)"""
+        return pd.DataFrame(self.values)
+
+    def clear(self):
+        self.positions = []
+        self.values = {column: [] for column in DETAIL_COLUMNS}
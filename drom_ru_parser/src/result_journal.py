@@ -0,0 +1,81 @@
+"""
+ЖУРНАЛ РЕЗУЛЬТАТОВ (APPEND-ONLY)
+- Каждый результат - одна строка JSON {"idx": ..., "data": {...}} в конце файла:
+  уже записанное не переписывается, цена записи не растет с размером chunk
+- fsync группами: после group_size записей или через group_interval секунд,
+  и обязательно перед сохранением прогресса (sync)
+- Недописанная последняя строка после аварийной остановки при чтении пропускается
+- Повторная запись того же idx (повтор ошибки, перезапуск) перекрывает прежнюю;
+  idx - номер строки или другой ключ (имя бренда в прогрессе database_parser)
+- XLSX собирается из журнала один раз (в конце прогона или по запросу), после
+  чего журнал можно очистить (reset)
+"""
+
+import json
+import os
+import time
+from typing import Any, Dict, Iterator, Tuple, Union
+
+JournalKey = Union[int, str]
+
+DEFAULT_GROUP_SIZE = 20  # fsync не чаще чем раз в N записей...
+DEFAULT_GROUP_INTERVAL = 1.0  # ...или раз в N секунд
+
+
+class ResultJournal:
+    """Дописываемый журнал успешных результатов с групповым fsync"""
+
+    def __init__(self, path: str, group_size: int = DEFAULT_GROUP_SIZE,
+                 group_interval: float = DEFAULT_GROUP_INTERVAL):
+        self.path = path
+        self.group_size = group_size
+        self.group_interval = group_interval
+        self._file = open(path, 'a', encoding='utf-8')
+        self._pending = 0
+        self._synced_at = time.monotonic()
+
+    def append(self, idx: JournalKey, details: Dict[str, Any]):
+        self._file.write(json.dumps({'idx': idx, 'data': details}, ensure_ascii=False, default=str) + '\n')
+        self._pending += 1
+        if self._pending >= self.group_size or time.monotonic() - self._synced_at >= self.group_interval:
+            self.sync()
+
+    def sync(self):
+        """Сбрасывает записанное на диск"""
+        if self._pending:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._pending = 0
+        self._synced_at = time.monotonic()
+
+    def reset(self):
+        """Очищает журнал (записи уже перенесены в XLSX)"""
+        self._file.seek(0)
+        self._file.truncate()
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._pending = 0
+
+    def close(self):
+        self.sync()
+        self._file.close()
+
+
+def read_journal(path: str) -> Iterator[Tuple[JournalKey, Dict[str, Any]]]:
+    """Записи журнала (idx, данные) в порядке записи; битые строки пропускаются"""
+    if not os.path.exists(path):
+        return
+
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                # Недописанная строка после аварийной остановки
+                continue
+            yield entry['idx'], entry['data']
+
+
+def latest_entries(path: str) -> Dict[JournalKey, Dict[str, Any]]:
+    """Последняя запись по каждому ключу"""
+    return dict(read_journal(path))
@@ -0,0 +1,115 @@
+"""
+ПЛАНИРОВЩИК ПОВТОРОВ С ЭКСПОНЕНЦИАЛЬНОЙ ЗАДЕРЖКОЙ
+- Очередь с приоритетом по времени следующей попытки (heapq)
+- У каждой строки свой счетчик попыток и своя задержка: base, 2*base, 4*base...
+- Время попыток хранится как unix time, поэтому очередь переживает перезапуск
+  через файл прогресса (to_list / from_list)
+"""
+
+import heapq
+import random
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class RetryScheduler:
+    """Очередь повторов: строки возвращаются в работу, когда наступило их время"""
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay: float = 30.0,
+        max_delay: float = 900.0,
+        jitter: float = 0.2,
+    ):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+
+        # idx -> {'url', 'attempts', 'due_at'}; в куче могут остаться устаревшие записи,
+        # актуальной считается та, у которой due_at совпадает с entries[idx]
+        self._entries: Dict[int, Dict[str, Any]] = {}
+        self._heap: List[Tuple[float, int]] = []
+
+    def schedule(self, idx: int, url: str, attempts: int) -> Optional[float]:
+        """
+        Ставит строку в очередь после attempts неудачных попыток.
+        Возвращает задержку в секундах или None, если попытки исчерпаны.
+        """
+        if attempts >= self.max_attempts:
+            self._entries.pop(idx, None)
+            return None
+
+        delay = min(self.max_delay, self.base_delay * (2 ** (attempts - 1)))
+        delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+
+        self._push(idx, url, attempts, time.time() + delay)
+        return delay
+
+    def _push(self, idx: int, url: str, attempts: int, due_at: float):
+        self._entries[idx] = {'url': url, 'attempts': attempts, 'due_at': due_at}
+        heapq.heappush(self._heap, (due_at, idx))
+
+    def discard(self, idx: int):
+        """Убирает строку из очереди (например, после успешной попытки)"""
+        self._entries.pop(idx, None)
+
+    def attempts(self, idx: int) -> int:
+        """Сколько попыток уже сделано для строки, стоящей в очереди"""
+        entry = self._entries.get(idx)
+        return entry['attempts'] if entry else 0
+
+    def _drop_stale(self):
+        while self._heap:
+            due_at, idx = self._heap[0]
+            entry = self._entries.get(idx)
+            if entry is not None and entry['due_at'] == due_at:
+                return
+            heapq.heappop(self._heap)
+
+    def pop_due(self, now: Optional[float] = None) -> Optional[Tuple[int, str]]:
+        """
+        Возвращает (idx, url) строки, чье время наступило, или None.
+        Строка остается в _entries до результата попытки - так ее счетчик
+        попыток не теряется и попадает в сохраненный прогресс.
+        """
+        self._drop_stale()
+        if not self._heap or self._heap[0][0] > (now if now is not None else time.time()):
+            return None
+
+        _, idx = heapq.heappop(self._heap)
+        entry = self._entries[idx]
+        entry['due_at'] = None
+        return idx, entry['url']
+
+    def next_due_in(self) -> Optional[float]:
+        """Секунд до ближайшей попытки (None - очередь пуста)"""
+        self._drop_stale()
+        if not self._heap:
+            return None
+        return max(0.0, self._heap[0][0] - time.time())
+
+    def pending(self) -> int:
+        """Сколько строк ждут своего времени в очереди"""
+        return sum(1 for entry in self._entries.values() if entry['due_at'] is not None)
+
+    def to_list(self) -> List[Dict[str, Any]]:
+        """Снимок очереди для файла прогресса"""
+        return [
+            {'idx': idx, 'url': entry['url'], 'attempts': entry['attempts'],
+             # Выданные в работу строки после перезапуска повторяем сразу
+             'due_at': entry['due_at'] if entry['due_at'] is not None else time.time()}
+            for idx, entry in sorted(self._entries.items())
+        ]
+
+    def load(self, items: List[Dict[str, Any]]):
+        """Восстанавливает очередь из файла прогресса"""
+        for item in items:
+            self._push(int(item['idx']), item['url'], int(item['attempts']), float(item['due_at']))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, idx: int) -> bool:
+        return idx in self._entries
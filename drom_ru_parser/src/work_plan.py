@@ -0,0 +1,87 @@
+"""
+ПЛАН ОБХОДА ИСХОДНОЙ ТАБЛИЦЫ
+- Считается одним векторным проходом по DataFrame при запуске: циклы обхода
+  берут готовые массивы и не трогают DataFrame на каждой строке
+- ListingPlan (full_parser_with_retry): номера строк к загрузке по порядку,
+  URL и название объявления по номеру строки (для журналов и повторов),
+  число пропущенных строк в диапазоне
+- ModelPlan (database_parser): строки моделей списком словарей и непрерывные
+  блоки строк одного бренда (бренд -> диапазон строк)
+"""
+
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+FOUND_STATUS = 'Найдено'
+
+
+def _text_column(df: pd.DataFrame, column: str, default: str) -> np.ndarray:
+    """Колонка строками (object), пустые и отсутствующие значения - default"""
+    if column not in df.columns:
+        return np.full(len(df), default, dtype=object)
+    values = df[column]
+    text = values.astype(str).where(values.notna(), default)
+    return text.where(text != '', default).to_numpy(dtype=object)
+
+
+class ListingPlan:
+    """Объявления к загрузке: строки со статусом 'Найдено' и непустым URL"""
+
+    def __init__(self, source_df: pd.DataFrame):
+        self.total_rows = len(source_df)
+        self.urls = _text_column(source_df, 'url', '')
+        self.names = _text_column(source_df, 'car_name', 'N/A')
+
+        if 'status' in source_df.columns:
+            found = (source_df['status'] == FOUND_STATUS).to_numpy()
+        else:
+            found = np.zeros(self.total_rows, dtype=bool)
+        self.indices = np.flatnonzero(found & (self.urls != ''))
+
+    @property
+    def fetch_count(self) -> int:
+        return len(self.indices)
+
+    def indices_between(self, first_index: int, end_index: int) -> List[int]:
+        """Номера строк к загрузке в [first_index, end_index) по возрастанию"""
+        lo, hi = np.searchsorted(self.indices, [first_index, end_index])
+        return self.indices[lo:hi].tolist()
+
+    def url(self, idx: int) -> str:
+        return self.urls[idx]
+
+    def name(self, idx: int) -> str:
+        return self.names[idx]
+
+
+class ModelPlan:
+    """Строки списка моделей и непрерывные блоки строк одного бренда"""
+
+    def __init__(self, df: pd.DataFrame):
+        self.rows: List[Dict[str, Any]] = df.to_dict('records')
+
+        brands = df['brand'].to_numpy(dtype=object)
+        if len(brands):
+            starts = np.flatnonzero(np.r_[True, brands[1:] != brands[:-1]])
+            ends = np.append(starts[1:], len(brands))
+        else:
+            starts = ends = np.zeros(0, dtype=np.int64)
+        self.runs: List[Tuple[str, int, int]] = [
+            (brands[start], int(start), int(end)) for start, end in zip(starts, ends)
+        ]
+        # Конец блока бренда для каждой строки
+        self.run_end = np.repeat(ends, ends - starts)
+
+    def brand_rows(self, idx: int) -> List[Dict[str, Any]]:
+        """Строки бренда строки idx: от нее до конца ее блока"""
+        return self.rows[idx:int(self.run_end[idx])]
+
+    def brand_groups(self, first_index: int) -> List[Tuple[str, List[Tuple[int, Dict[str, Any]]]]]:
+        """Блоки брендов начиная со строки first_index: (бренд, [(номер строки, строка)])"""
+        return [
+            (brand, [(idx, self.rows[idx]) for idx in range(max(start, first_index), end)])
+            for brand, start, end in self.runs
+            if end > first_index
+        ]
@@ -0,0 +1,90 @@
+"""
+ПУЛ ВОРКЕРОВ СО СКОЛЬЗЯЩИМ ОКНОМ
+- Задачи подаются через очередь, новый запрос стартует сразу как освобождается слот
+- Результаты передаются отдельному потребителю в порядке готовности
+- Нет барьера asyncio.gather: медленный запрос не задерживает остальные
+- Опционально число активных воркеров ограничивает AIMD-контроллер
+"""
+
+import asyncio
+from typing import Any, AsyncIterable, Awaitable, Callable, Iterable, Optional, Tuple, Union
+
+from concurrency_controller import AIMDController
+
+_DONE = object()
+
+
+async def run_worker_pool(
+    tasks: Union[Iterable[Tuple[int, str]], AsyncIterable[Tuple[int, str]]],
+    worker: Callable[[str, int], Awaitable[Any]],
+    consumer: Callable[[Any], None],
+    concurrency: int,
+    controller: Optional[AIMDController] = None,
+) -> None:
+    """
+    Прогоняет задачи (idx, url) через пул из concurrency воркеров.
+
+    worker(url, idx) выполняет запрос, consumer(result) обрабатывает результат
+    синхронно в отдельной корутине. Итератор задач читается лениво, поэтому
+    генератор может считать пропуски по мере продвижения. Асинхронный
+    итератор может ждать (например, время повтора), не останавливая воркеров.
+
+    Если передан controller, concurrency - это верхняя граница воркеров,
+    а реально одновременно выполняется не больше controller.window запросов.
+    """
+    task_queue: asyncio.Queue = asyncio.Queue(maxsize=concurrency * 2)
+    result_queue: asyncio.Queue = asyncio.Queue()
+
+    async def produce():
+        if hasattr(tasks, '__aiter__'):
+            async for task in tasks:
+                await task_queue.put(task)
+        else:
+            for task in tasks:
+                await task_queue.put(task)
+        for _ in range(concurrency):
+            await task_queue.put(_DONE)
+
+    async def work():
+        while True:
+            task = await task_queue.get()
+            if task is _DONE:
+                await result_queue.put(_DONE)
+                return
+            idx, url = task
+            if controller is None:
+                await result_queue.put(await worker(url, idx))
+                continue
+
+            await controller.acquire()
+            try:
+                result = await worker(url, idx)
+            finally:
+                await controller.release()
+            await result_queue.put(result)
+
+    async def consume():
+        finished_workers = 0
+        while finished_workers < concurrency:
+            result = await result_queue.get()
+            if result is _DONE:
+                finished_workers += 1
+                continue
+            consumer(result)
+
+    running = [asyncio.ensure_future(produce())]
+    running += [asyncio.ensure_future(work()) for _ in range(concurrency)]
+    consumer_task = asyncio.ensure_future(consume())
+
+    try:
+        # Ждем потребителя; если упал любой воркер - прерываем весь пул
+        done, _ = await asyncio.wait(running + [consumer_task], return_when=asyncio.FIRST_EXCEPTION)
+        for task in done:
+            if task.exception() is not None:
+                raise task.exception()
+        await consumer_task
+    finally:
+        for task in running + [consumer_task]:
+            if not task.done():
+                task.cancel()
+        await asyncio.gather(*running, consumer_task, return_exceptions=True)